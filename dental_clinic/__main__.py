@@ -0,0 +1,10 @@
+"""``python -m dental_clinic <command>``; see cli.py."""
+import os
+import sys
+
+# Modules import each other as top-level packages (services.*, ui.*), as when app.py runs as a script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+sys.exit(main())
@@ -0,0 +1,62 @@
+"""Full backups vs deduplicating incremental snapshots of a changing database.
+
+	python benchmarks/bench_incremental_backup.py [--patients 50000] [--treatments 100000] [--rounds 3]
+
+Between backups some patients are edited and some treatments added, like a
+day at the front desk.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import scratch_database, seed_patients, seed_treatments, treatment_rows
+from services.backup_service import CHUNK_PAGES, backup_database, incremental_backup
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--patients", type=int, default=50000)
+	parser.add_argument("--treatments", type=int, default=100000)
+	parser.add_argument("--edits", type=int, default=200, help="patient edits between backups")
+	parser.add_argument("--added", type=int, default=300, help="new treatments between backups")
+	parser.add_argument("--rounds", type=int, default=3)
+	parser.add_argument("--chunk-pages", type=int, default=CHUNK_PAGES)
+	args = parser.parse_args(argv)
+
+	with scratch_database() as db:
+		seed_patients(db, args.patients)
+		seed_treatments(db, args.treatments, args.patients)
+		folder = os.path.dirname(db.db_path)
+		store = os.path.join(folder, "store")
+		rng = random.Random(2)
+		print(f"{args.patients} patients, {args.treatments} treatments; {args.chunk_pages}-page chunks")
+		for round_no in range(args.rounds + 1):
+			if round_no:
+				with db.transaction():
+					for patient_id in rng.sample(range(1, args.patients + 1), args.edits):
+						db.execute("UPDATE patients SET phone=?, updated_at=datetime('now') WHERE id=?", (f"07{rng.randint(10000000, 99999999)}", patient_id))
+				db.bulk_insert("treatments", ("patient_id", "date", "type", "description", "cost"), treatment_rows(args.added, args.patients, seed=round_no + 10))
+
+			start = time.perf_counter()
+			path = backup_database(db, os.path.join(folder, "full.db"))
+			full_s = time.perf_counter() - start
+			full_mb = os.path.getsize(path) / 1e6
+
+			start = time.perf_counter()
+			snapshot = incremental_backup(db, store, chunk_pages=args.chunk_pages)
+			incremental_s = time.perf_counter() - start
+			label = "first" if round_no == 0 else f"after edits {round_no}"
+			print(
+				f"  {label:15} full {full_mb:5.1f} MB in {full_s:5.2f} s   "
+				f"incremental {snapshot.bytes_written / 1e6:5.2f} MB in {incremental_s:5.2f} s "
+				f"({snapshot.new_chunks} of {len(snapshot.chunks)} chunks new)"
+			)
+
+
+if __name__ == "__main__":
+	main()
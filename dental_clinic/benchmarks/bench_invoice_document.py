@@ -0,0 +1,64 @@
+"""Invoice PDFs: one file per invoice vs a single document with a shared letterhead form.
+
+	python benchmarks/bench_invoice_document.py [--invoices 400] [--workers 1]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import TREATMENT_TYPES, scratch_database, seed_patients
+from services.invoice_service import InvoiceService
+
+PAGE = re.compile(rb"/Type /Page\b(?!s)")
+
+
+def pdf_pages(paths: List[str]) -> int:
+	pages = 0
+	for path in paths:
+		with open(path, "rb") as f:
+			pages += len(PAGE.findall(f.read()))
+	return pages
+
+
+def megabytes(paths: List[str]) -> float:
+	return sum(os.path.getsize(p) for p in paths) / 1e6
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--invoices", type=int, default=400)
+	parser.add_argument("--max-items", type=int, default=60, help="items per invoice are 1..N; long invoices run over a page")
+	parser.add_argument("--workers", type=int, default=1, help="processes for the per-invoice files")
+	args = parser.parse_args(argv)
+
+	with scratch_database() as db:
+		seed_patients(db, 1000)
+		service = InvoiceService(db)
+		rng = random.Random(3)
+		for n in range(args.invoices):
+			items = [(f"{rng.choice(TREATMENT_TYPES)} on tooth {rng.randint(11, 48)}", round(rng.uniform(20, 400), 2)) for _ in range(rng.randint(1, args.max_items))]
+			service.create_invoice(rng.randint(1, 1000), items, f"2025-{n % 12 + 1:02d}-{n % 28 + 1:02d}")
+		folder = os.path.dirname(db.db_path)
+
+		start = time.perf_counter()
+		result = service.export_invoices_pdf(os.path.join(folder, "files"), date_from="2000-01-01", workers=args.workers)
+		files_s = time.perf_counter() - start
+		pages = pdf_pages(result.written)
+		print(f"{args.invoices} invoices")
+		print(f"  {f'per-invoice files, {args.workers} worker(s)':32} {files_s:5.2f} s, {pages} pages, {pages / files_s:5.0f} pages/s, {megabytes(result.written):.2f} MB")
+
+		path = os.path.join(folder, "all.pdf")
+		start = time.perf_counter()
+		_invoices, pages = service.export_invoices_document(path, date_from="2000-01-01")
+		document_s = time.perf_counter() - start
+		print(f"  {'single document':32} {document_s:5.2f} s, {pages} pages, {pages / document_s:5.0f} pages/s, {megabytes([path]):.2f} MB")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,65 @@
+"""Listing patients: sqlite3.Row copied into a dataclass vs tuples mapped onto slotted models.
+
+	python benchmarks/bench_mapping.py [--patients 50000]
+"""
+import argparse
+from dataclasses import dataclass
+import gc
+import os
+import sys
+import tracemalloc
+from typing import Any, Callable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import scratch_database, seed_patients, timed
+from services.patient_service import PatientService
+
+
+@dataclass
+class RowPatient:
+	"""The model as it was before slots: a plain dataclass filled from sqlite3.Row."""
+	id: Optional[int]
+	name: str
+	age: Optional[int]
+	gender: Optional[str]
+	phone: Optional[str]
+	address: Optional[str]
+
+
+def memory(fn: Callable[[], Any]) -> Tuple[float, float]:
+	"""(peak MB while ``fn`` runs, MB still held by its result)."""
+	gc.collect()
+	tracemalloc.start()
+	result = fn()
+	retained, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	del result
+	return peak / 1e6, retained / 1e6
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--patients", type=int, default=50000)
+	parser.add_argument("--runs", type=int, default=5)
+	args = parser.parse_args(argv)
+
+	with scratch_database() as db:
+		seed_patients(db, args.patients)
+		service = PatientService(db)
+
+		def rows() -> List[RowPatient]:
+			return [
+				RowPatient(id=r["id"], name=r["name"], age=r["age"], gender=r["gender"], phone=r["phone"], address=r["address"])
+				for r in db.query("SELECT * FROM patients ORDER BY name ASC")
+			]
+
+		print(f"Listing {args.patients} patients (ORDER BY name), mean of {args.runs} runs")
+		for label, fn in (("Row -> dataclass copy", rows), ("tuple -> slotted model", service.list_patients)):
+			ms, _ = timed(fn, args.runs)
+			peak, retained = memory(fn)
+			print(f"  {label:24} {ms:7.1f} ms   peak {peak:5.1f} MB   retained {retained:5.1f} MB")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,47 @@
+"""Patient search: the old LIKE scan vs the FTS5 index.
+
+	python benchmarks/bench_search.py [--patients 120000] [--query TEXT ...]
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import scratch_database, seed_patients, timed
+from services.patient_service import PatientService
+
+QUERIES = ["Karim Nasser", "Elodie", "0712", "Khoury 1199"]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--patients", type=int, default=120000)
+	parser.add_argument("--runs", type=int, default=5)
+	parser.add_argument("--query", nargs="+", default=QUERIES)
+	args = parser.parse_args(argv)
+
+	with scratch_database() as db:
+		seed_patients(db, args.patients)
+		service = PatientService(db)
+		if not db.has_table("patients_fts"):
+			raise SystemExit("this SQLite build has no FTS5")
+
+		def like(text: str) -> list:
+			pattern = f"%{text}%"
+			return db.query("SELECT * FROM patients WHERE name LIKE ? OR phone LIKE ? ORDER BY name ASC", (pattern, pattern))
+
+		print(f"{args.patients} patients, mean of {args.runs} runs")
+		for text in args.query:
+			like_ms, like_rows = timed(lambda: like(text), args.runs)
+			fts_ms, fts_rows = timed(lambda: service.list_patients(text), args.runs)
+			page_ms, _ = timed(lambda: service.page_patients(text), args.runs)
+			print(
+				f"  {text!r:16} LIKE {like_ms:6.1f} ms ({len(like_rows)} rows)"
+				f"  ->  FTS5 {fts_ms:6.1f} ms ({len(fts_rows)} rows), first page {page_ms:5.1f} ms"
+			)
+
+
+if __name__ == "__main__":
+	main()
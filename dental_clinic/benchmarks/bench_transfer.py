@@ -0,0 +1,68 @@
+"""Bulk patient import (deferred vs per-row FTS indexing) and JSON Lines export.
+
+	python benchmarks/bench_transfer.py [--patients 500000] [--skip-per-row]
+
+The per-row run imports the same file with the FTS insert trigger left in
+place, i.e. without PatientService.deferred_search_index.
+"""
+import argparse
+from contextlib import nullcontext
+import csv
+import os
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import patient_rows, scratch_database
+from services.appointment_service import AppointmentService
+from services.database import Database
+from services.invoice_service import InvoiceService
+from services.patient_service import PatientService
+from services.transfer_service import TransferService
+from services.treatment_service import TreatmentService
+
+
+def transfer_service(db: Database) -> TransferService:
+	return TransferService(PatientService(db), AppointmentService(db), TreatmentService(db), InvoiceService(db))
+
+
+def run_import(path: str, deferred: bool) -> None:
+	with scratch_database() as db:
+		service = transfer_service(db)
+		if not deferred:
+			service.patient_service.deferred_search_index = nullcontext
+		result = service.import_file("patients", path)
+		label = "deferred FTS index" if deferred else "per-row FTS trigger"
+		check = db.scalar("SELECT count(*) FROM patients_fts WHERE patients_fts MATCH 'Nasser'")
+		print(f"  {'import, ' + label:28} {result.seconds:6.1f} s ({result.inserted / result.seconds:8,.0f} rows/s), 'Nasser' matches {check}")
+		if deferred:
+			out = os.path.join(os.path.dirname(db.db_path), "patients.jsonl")
+			start = time.perf_counter()
+			count = service.export_file("patients", out)
+			seconds = time.perf_counter() - start
+			print(f"  {'export to JSON Lines':28} {seconds:6.1f} s ({count / seconds:8,.0f} rows/s), {os.path.getsize(out) / 1e6:.0f} MB")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--patients", type=int, default=500000)
+	parser.add_argument("--skip-per-row", action="store_true", help="only time the deferred import (the per-row run is slow)")
+	args = parser.parse_args(argv)
+
+	with scratch_database() as scratch:
+		path = os.path.join(os.path.dirname(scratch.db_path), "patients.csv")
+		with open(path, "w", newline="", encoding="utf-8") as f:
+			writer = csv.writer(f)
+			writer.writerow(("id", "name", "age", "gender", "phone", "address"))
+			for i, row in enumerate(patient_rows(args.patients), 1):
+				writer.writerow((i, *row))
+		print(f"{args.patients} patients from CSV")
+		run_import(path, deferred=True)
+		if not args.skip_per_row:
+			run_import(path, deferred=False)
+
+
+if __name__ == "__main__":
+	main()
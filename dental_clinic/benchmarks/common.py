@@ -0,0 +1,81 @@
+"""Shared setup for the benchmark scripts: a scratch database and seeded data.
+
+Every script is run from the dental_clinic directory, e.g.
+
+	python benchmarks/bench_mapping.py --patients 50000
+
+and prints its figures; nothing is written outside a temporary directory.
+Scripts put dental_clinic/ on sys.path before importing this module, so the
+repo's script-style imports (services.*, models) resolve.
+"""
+from contextlib import contextmanager
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Iterator, List, Tuple
+
+from services.database import Database
+
+FIRST_NAMES = ["Karim", "Elodie", "Maya", "Omar", "Lina", "Hugo", "Sara", "Nadia", "Jad", "Chloe", "Rami", "Ines", "Yara", "Leo", "Zeina"]
+LAST_NAMES = ["Nasser", "Khoury", "Haddad", "Martin", "Dubois", "Saliba", "Aoun", "Bernard", "Frem", "Petit", "Gemayel", "Moreau"]
+STREETS = ["Rue Hamra", "Rue de la Paix", "Avenue Charles Helou", "Rue Monnot", "Boulevard Saint-Michel", "Rue Gouraud"]
+
+
+@contextmanager
+def scratch_database(profile: str = "bulk_load") -> Iterator[Database]:
+	"""A fresh, migrated database in a temporary directory."""
+	with tempfile.TemporaryDirectory() as folder:
+		db = Database(os.path.join(folder, "bench.db"), profile=profile)
+		db.initialize_schema()
+		yield db
+
+
+def patient_rows(count: int, seed: int = 1) -> Iterator[Tuple[Any, ...]]:
+	"""(name, age, gender, phone, address) tuples, reproducible for a given seed."""
+	rng = random.Random(seed)
+	for _ in range(count):
+		yield (
+			f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+			rng.randint(1, 95),
+			rng.choice(("Male", "Female", "Other")),
+			f"07{rng.randint(10000000, 99999999)}",
+			f"{rng.randint(1, 2000)} {rng.choice(STREETS)}",
+		)
+
+
+def seed_patients(db: Database, count: int, seed: int = 1) -> None:
+	db.bulk_insert("patients", ("name", "age", "gender", "phone", "address"), patient_rows(count, seed))
+
+
+TREATMENT_TYPES = ["Cleaning", "Filling", "Extraction", "Root Canal", "Crown", "Whitening", "X-Ray", "Checkup"]
+
+
+def treatment_rows(count: int, patients: int, seed: int = 1) -> Iterator[Tuple[Any, ...]]:
+	"""(patient_id, date, type, description, cost) tuples spread over 2020-2025."""
+	rng = random.Random(seed)
+	for _ in range(count):
+		kind = rng.choice(TREATMENT_TYPES)
+		yield (
+			rng.randint(1, patients),
+			f"{rng.randint(2020, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+			kind,
+			f"{kind} on tooth {rng.randint(11, 48)}",
+			round(rng.uniform(20, 900), 2),
+		)
+
+
+def seed_treatments(db: Database, count: int, patients: int, seed: int = 1) -> None:
+	db.bulk_insert("treatments", ("patient_id", "date", "type", "description", "cost"), treatment_rows(count, patients, seed))
+
+
+def timed(fn: Callable[[], Any], runs: int = 5) -> Tuple[float, Any]:
+	"""(mean milliseconds over ``runs`` calls, result of the last call)."""
+	samples: List[float] = []
+	result = None
+	for _ in range(runs):
+		start = time.perf_counter()
+		result = fn()
+		samples.append((time.perf_counter() - start) * 1000)
+	return statistics.mean(samples), result
@@ -0,0 +1,387 @@
+"""Headless command line over the services, for scripts and cron jobs.
+
+	python -m dental_clinic <command> [options]     (from the repository root)
+	python cli.py <command> [options]               (from this directory)
+
+Each command names the modules it needs and only those are imported when
+it runs, so maintenance jobs never load tkinter, matplotlib or ReportLab.
+``budgets`` measures every command's imports in a fresh interpreter and
+checks them against the budget declared here.
+"""
+import argparse
+from dataclasses import dataclass
+import importlib
+import os
+import subprocess
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(BASE_DIR, "dental_clinic.db")
+
+# Slow to import and unnecessary for maintenance; each command declares which it may pull in
+HEAVY_MODULES = ("tkinter", "ttkbootstrap", "PIL", "matplotlib", "reportlab")
+
+BUDGET_RUNS = 3  # best of, to smooth out a cold disk cache
+
+# transfer_service.ENTITIES in import order, repeated here so building the parser imports nothing
+TRANSFER_ENTITIES = ("patients", "appointments", "treatments", "invoices", "invoice_items")
+SHOWN_BAD_ROWS = 20
+
+
+@dataclass
+class Command:
+	name: str
+	help: str
+	run: Callable[[argparse.Namespace, Any], int]  # (args, Database or None) -> exit code
+	imports: Tuple[str, ...]
+	budget_ms: float
+	arguments: Optional[Callable[[argparse.ArgumentParser], None]] = None
+	profile: Optional[str] = "interactive"  # connection profile; None for commands without a database
+	heavy: Tuple[str, ...] = ()  # HEAVY_MODULES this command may load
+
+
+def _batch_arguments(parser: argparse.ArgumentParser) -> None:
+	parser.add_argument("--ids", type=int, nargs="+", help="invoice ids")
+	parser.add_argument("--from", dest="date_from", help="first invoice date (YYYY-MM-DD)")
+	parser.add_argument("--to", dest="date_to", help="last invoice date (YYYY-MM-DD)")
+
+
+def _transfer_arguments(parser: argparse.ArgumentParser) -> None:
+	parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+
+
+def _import_arguments(parser: argparse.ArgumentParser) -> None:
+	for entity in TRANSFER_ENTITIES:
+		parser.add_argument(f"--{entity.replace('_', '-')}", dest=entity, metavar="FILE")
+	parser.add_argument("--rejects", metavar="DIR", help="write <entity>.rejects.csv files for skipped rows")
+	_transfer_arguments(parser)
+
+
+def _transfer_service(db: Any) -> Any:
+	from services.appointment_service import AppointmentService
+	from services.invoice_service import InvoiceService
+	from services.patient_service import PatientService
+	from services.transfer_service import TransferService
+	from services.treatment_service import TreatmentService
+	return TransferService(PatientService(db), AppointmentService(db), TreatmentService(db), InvoiceService(db))
+
+
+def _require_batch(args: argparse.Namespace) -> None:
+	if not args.ids and not (args.date_from or args.date_to):
+		raise SystemExit("give --ids or a --from/--to date range")
+
+
+def _print_progress(done: int, total: int) -> None:
+	print(f"\r{done}/{total} pages", end="" if done < total else "\n", file=sys.stderr)
+
+
+# Commands ---------------------------------------------------------------------
+
+def _gui(args: argparse.Namespace, db: Any) -> int:
+	if args.verbose or args.exit_after_paint:
+		import logging
+		logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+	import app
+	within_budget = app.main(args.db, exit_after_paint=args.exit_after_paint, query_cache=args.query_cache)
+	return 0 if within_budget or not args.exit_after_paint else 1
+
+
+def _migrate(args: argparse.Namespace, db: Any) -> int:
+	from services.migrations import LATEST_VERSION, schema_version
+	print(f"schema version {schema_version(db)} (latest {LATEST_VERSION})")
+	return 0
+
+
+def _backup(args: argparse.Namespace, db: Any) -> int:
+	from services.backup_service import backup_database
+	path = backup_database(db, args.destination, progress=_print_progress if args.progress else None)
+	print(f"{path}: {os.path.getsize(path)} bytes")
+	return 0
+
+
+def _restore(args: argparse.Namespace, db: Any) -> int:
+	from services.backup_service import restore_database
+	try:
+		restore_database(db, args.source, progress=_print_progress if args.progress else None)
+	except (OSError, ValueError) as e:
+		raise SystemExit(f"restore failed: {e}")
+	print(f"restored {args.source}")
+	return 0
+
+
+def _snapshot(args: argparse.Namespace, db: Any) -> int:
+	from services.backup_service import incremental_backup
+	s = incremental_backup(db, args.store)
+	print(f"{s.id}: {len(s.chunks)} chunks, {s.new_chunks} new, {s.bytes_written} bytes written")
+	return 0
+
+
+def _snapshots(args: argparse.Namespace, db: Any) -> int:
+	from services.backup_service import list_snapshots
+	for s in list_snapshots(args.store):
+		print(f"{s.id}  {s.created}  {s.size} bytes")
+	return 0
+
+
+def _restore_snapshot(args: argparse.Namespace, db: Any) -> int:
+	from services.backup_service import restore_snapshot
+	try:
+		restore_snapshot(db, args.store, args.snapshot_id)
+	except (OSError, ValueError) as e:
+		raise SystemExit(f"restore failed: {e}")
+	print(f"restored snapshot {args.snapshot_id}")
+	return 0
+
+
+def _prune(args: argparse.Namespace, db: Any) -> int:
+	from services.backup_service import collect_garbage, prune_snapshots
+	removed = prune_snapshots(args.store, args.keep)
+	chunks, freed = collect_garbage(args.store)
+	print(f"removed {len(removed)} snapshots and {chunks} chunks ({freed} bytes)")
+	return 0
+
+
+def _export_invoices(args: argparse.Namespace, db: Any) -> int:
+	from services.invoice_service import InvoiceService
+	_require_batch(args)
+	result = InvoiceService(db).export_invoices_pdf(
+		args.out, invoice_ids=args.ids, date_from=args.date_from, date_to=args.date_to, workers=args.workers,
+	)
+	print(result.summary())
+	return 1 if result.failures else 0
+
+
+def _export_document(args: argparse.Namespace, db: Any) -> int:
+	from services.invoice_service import InvoiceService
+	_require_batch(args)
+	invoices, pages = InvoiceService(db).export_invoices_document(args.output, args.ids, args.date_from, args.date_to)
+	print(f"{args.output}: {invoices} invoices, {pages} pages")
+	return 0
+
+
+def _summaries(args: argparse.Namespace, db: Any) -> int:
+	from services.summary_service import SummaryService
+	summaries = SummaryService(db)
+	if args.action == "rebuild":
+		summaries.rebuild()
+	mismatches = summaries.verify()
+	for table, keys in mismatches.items():
+		print(f"{table}: {'ok' if not keys else 'mismatch at ' + ', '.join(keys)}")
+	return 1 if any(mismatches.values()) else 0
+
+
+def _audit(args: argparse.Namespace, db: Any) -> int:
+	from services.query_audit import audit_query_plans
+	report = audit_query_plans(db)
+	for label, scans in report.items():
+		print(f"{label}: {'ok' if not scans else ''}")
+		for scan in scans:
+			print(f"  {scan}")
+	return 1 if any(report.values()) else 0
+
+
+def _aging(args: argparse.Namespace, db: Any) -> int:
+	from services.invoice_service import InvoiceService
+	for bucket, invoices, cents in InvoiceService(db).aging_report(args.as_of):
+		print(f"{bucket:>6} days  {invoices:6d} invoices  {cents / 100:12.2f}")
+	return 0
+
+
+def _import(args: argparse.Namespace, db: Any) -> int:
+	from services.transfer_service import write_bad_rows
+	files = [(entity, getattr(args, entity)) for entity in TRANSFER_ENTITIES if getattr(args, entity)]
+	if not files:
+		raise SystemExit("give at least one of " + ", ".join(f"--{e.replace('_', '-')}" for e in TRANSFER_ENTITIES))
+	# One session, parents first, so later files can refer to the ids in earlier ones
+	transfer = _transfer_service(db)
+	rejected = 0
+	for entity, path in files:
+		progress = (lambda n: print(f"\r{n} rows", end="", file=sys.stderr)) if sys.stderr.isatty() else None
+		result = transfer.import_file(entity, path, args.format, progress=progress)
+		if progress:
+			print("\r", end="", file=sys.stderr)
+		print(result.summary())
+		for bad in result.bad_rows[:SHOWN_BAD_ROWS]:
+			print(f"  line {bad.line}: {bad.error}")
+		if len(result.bad_rows) > SHOWN_BAD_ROWS:
+			print(f"  ... {len(result.bad_rows) - SHOWN_BAD_ROWS} more")
+		if args.rejects and result.bad_rows:
+			os.makedirs(args.rejects, exist_ok=True)
+			write_bad_rows(os.path.join(args.rejects, f"{entity}.rejects.csv"), result.bad_rows)
+		rejected += len(result.bad_rows)
+	return 1 if rejected else 0
+
+
+def _export(args: argparse.Namespace, db: Any) -> int:
+	transfer = _transfer_service(db)
+	if args.output == "-":
+		count = transfer.export(args.entity, sys.stdout, args.format or "csv")
+	else:
+		count = transfer.export_file(args.entity, args.output, args.format)
+	print(f"{count} {args.entity} rows", file=sys.stderr)
+	return 0
+
+
+def _report(args: argparse.Namespace, db: Any) -> int:
+	from services.summary_service import SummaryService
+	summaries = SummaryService(db)
+	revenue = summaries.revenue_by_month()
+	patients = dict(summaries.new_patients_by_month())
+	for ym, amount in revenue:
+		print(f"{ym}  revenue {amount:12.2f}  new patients {patients.get(ym, 0)}")
+	if args.chart:
+		# Only this option needs matplotlib
+		try:
+			import matplotlib
+		except ImportError:
+			raise SystemExit("--chart needs matplotlib")
+		matplotlib.use("Agg")
+		from matplotlib.figure import Figure
+		fig = Figure(figsize=(8, 4), dpi=100)
+		ax = fig.add_subplot(111)
+		ax.plot([r[0] for r in revenue], [r[1] for r in revenue], marker="o", color="#f28e2b")
+		ax.set_title("Revenue / Month")
+		ax.tick_params(axis="x", rotation=45)
+		fig.tight_layout()
+		fig.savefig(args.chart)
+		print(f"chart saved to {args.chart}")
+	return 0
+
+
+def _budgets(args: argparse.Namespace, db: Any) -> int:
+	over = 0
+	for command in COMMANDS.values():
+		try:
+			ms, heavy = measure_imports(command)
+		except RuntimeError as e:
+			print(f"{command.name:18} unavailable: {e}")
+			continue
+		stray = [m for m in heavy if m not in command.heavy]
+		ok = ms <= command.budget_ms and not stray
+		over += not ok
+		extra = f"  unexpected: {', '.join(stray)}" if stray else ""
+		print(f"{command.name:18} {ms:7.1f} ms  budget {command.budget_ms:6.0f} ms  {'ok' if ok else 'OVER'}{extra}")
+	return 1 if over else 0
+
+
+SERVICES = ("services.database",)
+
+COMMANDS: Dict[str, Command] = {c.name: c for c in [
+	Command("gui", "start the desktop application", _gui, ("app",), 600,
+		lambda p: (
+			p.add_argument("--exit-after-paint", action="store_true", help="time startup, then close; exit status 1 if over budget"),
+			p.add_argument("--verbose", action="store_true", help="log the connection profile and startup timings"),
+			p.add_argument("--query-cache", action="store_true", help="cache read query results until a write touches their tables"),
+		),
+		profile=None, heavy=("tkinter", "ttkbootstrap", "PIL"),
+	),
+	Command("migrate", "create or upgrade the schema", _migrate, SERVICES + ("services.migrations",), 100),
+	Command(
+		"backup", "online backup to a file", _backup, SERVICES + ("services.backup_service",), 100,
+		lambda p: (p.add_argument("destination"), p.add_argument("--progress", action="store_true")),
+	),
+	Command(
+		"restore", "replace the database with a backup", _restore, SERVICES + ("services.backup_service",), 100,
+		lambda p: (p.add_argument("source"), p.add_argument("--progress", action="store_true")), profile="bulk_load",
+	),
+	Command("snapshot", "incremental backup into a chunk store", _snapshot, SERVICES + ("services.backup_service",), 100, lambda p: p.add_argument("store")),
+	Command("snapshots", "list snapshots in a chunk store", _snapshots, SERVICES + ("services.backup_service",), 100, lambda p: p.add_argument("store")),
+	Command(
+		"restore-snapshot", "restore a snapshot from a chunk store", _restore_snapshot, SERVICES + ("services.backup_service",), 100,
+		lambda p: (p.add_argument("store"), p.add_argument("snapshot_id")), profile="bulk_load",
+	),
+	Command(
+		"prune", "keep the newest snapshots and delete unreferenced chunks", _prune, SERVICES + ("services.backup_service",), 100,
+		lambda p: (p.add_argument("store"), p.add_argument("--keep", type=int, required=True)),
+	),
+	Command(
+		"export-invoices", "render invoice PDFs in parallel", _export_invoices,
+		SERVICES + ("services.invoice_service", "reportlab.pdfgen.canvas"), 400,
+		lambda p: (p.add_argument("--out", required=True), p.add_argument("--workers", type=int), _batch_arguments(p)),
+		profile="reporting", heavy=("reportlab", "PIL"),
+	),
+	Command(
+		"export-document", "render invoices into one PDF", _export_document,
+		SERVICES + ("services.invoice_service", "reportlab.pdfgen.canvas"), 400,
+		lambda p: (p.add_argument("output"), _batch_arguments(p)), profile="reporting", heavy=("reportlab", "PIL"),
+	),
+	Command(
+		"summaries", "verify (or rebuild, then verify) the report summary tables", _summaries,
+		SERVICES + ("services.summary_service",), 100, lambda p: p.add_argument("action", choices=["verify", "rebuild"]),
+	),
+	Command("audit", "report queries that scan a table without an index", _audit, SERVICES + ("services.query_audit",), 150),
+	Command(
+		"aging", "receivables aging buckets", _aging, SERVICES + ("services.invoice_service",), 150,
+		lambda p: p.add_argument("--as-of", help="YYYY-MM-DD, default today"), profile="reporting",
+	),
+	Command(
+		"report", "monthly revenue and new patients (--chart needs matplotlib)", _report,
+		SERVICES + ("services.summary_service",), 100, lambda p: p.add_argument("--chart", metavar="PNG"), profile="reporting",
+	),
+	Command(
+		"import", "load patients, appointments, treatments and invoices from CSV or JSON Lines", _import,
+		SERVICES + ("services.transfer_service",), 150, _import_arguments, profile="bulk_load",
+	),
+	Command(
+		"export", "write one entity to CSV or JSON Lines ('-' for stdout)", _export, SERVICES + ("services.transfer_service",), 150,
+		lambda p: (p.add_argument("entity", choices=TRANSFER_ENTITIES), p.add_argument("output"), _transfer_arguments(p)),
+	),
+	Command("budgets", "measure each command's import time against its budget", _budgets, (), 60, profile=None),
+]}
+
+
+def load_command(name: str) -> Command:
+	"""Import everything ``name`` needs; nothing else is loaded up front."""
+	command = COMMANDS[name]
+	for module in command.imports:
+		importlib.import_module(module)
+	return command
+
+
+def measure_imports(command: Command) -> Tuple[float, List[str]]:
+	"""(milliseconds to import the command's modules, heavy modules loaded) in a fresh interpreter."""
+	code = (
+		"import sys, time\n"
+		f"sys.path.insert(0, {BASE_DIR!r})\n"
+		"start = time.perf_counter()\n"
+		"import cli\n"
+		f"cli.load_command({command.name!r})\n"
+		"ms = (time.perf_counter() - start) * 1000\n"
+		"print(ms, ','.join(m for m in cli.HEAVY_MODULES if m in sys.modules))\n"
+	)
+	best = None
+	heavy: List[str] = []
+	for _ in range(BUDGET_RUNS):
+		proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+		if proc.returncode != 0:
+			raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+		ms_text, _, modules = proc.stdout.strip().partition(" ")
+		best = float(ms_text) if best is None else min(best, float(ms_text))
+		heavy = [m for m in modules.split(",") if m]
+	return best or 0.0, heavy
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+	parser = argparse.ArgumentParser(prog="dental_clinic", description="Dental clinic maintenance and reporting.")
+	parser.add_argument("--db", default=DEFAULT_DB, help="database file")
+	sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+	for command in COMMANDS.values():
+		command_parser = sub.add_parser(command.name, help=command.help)
+		# Also accepted after the command name, e.g. from export_invoices.py
+		command_parser.add_argument("--db", default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+		if command.arguments:
+			command.arguments(command_parser)
+	args = parser.parse_args(argv)
+
+	command = load_command(args.command)
+	db = None
+	if command.profile is not None:
+		from services.database import Database
+		db = Database(args.db, profile=command.profile)
+		db.initialize_schema()
+	return command.run(args, db)
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,11 @@
+"""Batch-export invoice PDFs without starting the UI; shorthand for ``cli.py export-invoices``.
+
+	python export_invoices.py --out pdfs --ids 12 13 14
+	python export_invoices.py --out pdfs --from 2024-05-01 --to 2024-05-31 --workers 4
+"""
+import sys
+
+from cli import main
+
+if __name__ == "__main__":
+	sys.exit(main(["export-invoices", *sys.argv[1:]]))
@@ -1,8 +1,8 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Patient:
 	id: Optional[int]
 	name: str
@@ -12,7 +12,7 @@ class Patient:
 	address: Optional[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class Appointment:
 	id: Optional[int]
 	patient_id: int
@@ -23,7 +23,23 @@ class Appointment:
 	notes: Optional[str]
 
 
-@dataclass
+@dataclass(slots=True)
+class AppointmentSeries:
+	id: Optional[int]
+	patient_id: int
+	start_date: str  # YYYY-MM-DD, first occurrence
+	time: str  # HH:MM 24h
+	duration_minutes: int
+	doctor: str
+	notes: Optional[str]
+	frequency: str  # daily | weekly | monthly
+	interval: int = 1
+	count: Optional[int] = None
+	until: Optional[str] = None  # YYYY-MM-DD inclusive
+	exceptions: List[str] = field(default_factory=list)  # dates to skip
+
+
+@dataclass(slots=True)
 class Treatment:
 	id: Optional[int]
 	patient_id: int
@@ -33,7 +49,7 @@ class Treatment:
 	cost: float
 
 
-@dataclass
+@dataclass(slots=True)
 class Invoice:
 	id: Optional[int]
 	patient_id: int
@@ -42,9 +58,19 @@ class Invoice:
 	paid: float
 
 
-@dataclass
+@dataclass(slots=True)
 class InvoiceItem:
 	id: Optional[int]
 	invoice_id: int
 	description: str
-	amount: float
\ No newline at end of file
+	amount: float
+
+
+@dataclass(slots=True)
+class Payment:
+	id: Optional[int]
+	invoice_id: int
+	date: str
+	amount_cents: int
+	method: Optional[str] = None
+	note: Optional[str] = None
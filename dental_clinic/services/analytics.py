@@ -0,0 +1,281 @@
+"""Columnar, in-memory analytics for the Reports tab.
+
+``AnalyticsService.load`` reads treatments, appointments, invoices and
+patient sign-up dates once into NumPy arrays sorted by day: dates are day
+numbers since 1970-01-01, money is integer cents and treatment types and
+doctors are small integer codes. Each table (and each type or doctor within
+it) is kept sorted by day with running totals of its money columns, so any
+date range, month or group total is two ``searchsorted`` lookups and a
+subtraction. Changing a filter therefore costs well under a millisecond per
+group however many rows are loaded.
+"""
+from datetime import date as date_cls
+from itertools import chain
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.database import Database
+
+EPOCH = date_cls(1970, 1, 1).toordinal()
+MISSING_DAY = -(2 ** 31)  # stands in for dates SQLite cannot parse; such rows are dropped
+
+
+def to_day(value: Any) -> int:
+	"""Day number of a ``date`` or ``YYYY-MM-DD`` string."""
+	if isinstance(value, str):
+		value = date_cls.fromisoformat(value[:10])
+	return value.toordinal() - EPOCH
+
+
+def month_label(month: int) -> str:
+	"""``YYYY-MM`` for a month number counted from 1970-01."""
+	return f"{1970 + month // 12:04d}-{month % 12 + 1:02d}"
+
+
+def month_of(value: str) -> int:
+	"""Month number (from 1970-01) of a ``YYYY-MM-DD`` string."""
+	return (int(value[:4]) - 1970) * 12 + int(value[5:7]) - 1
+
+
+def month_start(month: int) -> int:
+	return to_day(date_cls(1970 + month // 12, month % 12 + 1, 1))
+
+
+def _month_edges(m0: int, m1: int, first_day: int, last_day: int) -> Any:
+	"""Day numbers where months m0..m1 start, plus the day after m1, clipped to the range."""
+	edges = np.arange(m0, m1 + 2).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+	edges[0] = max(edges[0], first_day)
+	edges[-1] = min(edges[-1], last_day + 1)
+	return edges
+
+
+def _day_sql(column: str) -> str:
+	return f"IFNULL(CAST(julianday({column}) - 2440587.5 AS INTEGER), {MISSING_DAY})"
+
+
+def _code_sql(column: str, count: int) -> str:
+	# Values missing from the code list (added after it was read) share the last code
+	branches = " ".join(f"WHEN ? THEN {i}" for i in range(count))
+	return f"CASE {column} {branches} ELSE {count} END" if count else "0"
+
+
+def rolling_average(values: Any, window: int) -> Any:
+	"""Trailing mean over ``window`` points; the first points average what is available."""
+	values = np.asarray(values, dtype=np.float64)
+	if not len(values):
+		return values
+	sums = np.cumsum(values)
+	sums[window:] = sums[window:] - sums[:-window]
+	counts = np.minimum(np.arange(1, len(values) + 1), window)
+	return sums / counts
+
+
+class DayIndex:
+	"""Rows sorted by day, with running totals so range sums need no scan."""
+
+	__slots__ = ("day", "totals")
+
+	def __init__(self, day: Any, **values: Any) -> None:
+		order = np.argsort(day, kind="stable")
+		self.day = day[order]
+		# totals[name][i] is the sum of the first i rows
+		self.totals = {name: np.concatenate(([0], np.cumsum(column[order]))) for name, column in values.items()}
+
+	def __len__(self) -> int:
+		return len(self.day)
+
+	@property
+	def first_day(self) -> Optional[int]:
+		return int(self.day[0]) if len(self.day) else None
+
+	@property
+	def last_day(self) -> Optional[int]:
+		return int(self.day[-1]) if len(self.day) else None
+
+	def counts(self, edges: Any) -> Any:
+		"""Rows in each [edges[i], edges[i + 1]) day interval."""
+		return np.diff(np.searchsorted(self.day, edges))
+
+	def sums(self, name: str, edges: Any) -> Any:
+		return np.diff(self.totals[name][np.searchsorted(self.day, edges)])
+
+
+def _grouped(codes: Any, count: int, day: Any, **values: Any) -> List[DayIndex]:
+	"""One DayIndex per code 0..count-1."""
+	order = np.argsort(codes, kind="stable")
+	bounds = np.searchsorted(codes[order], np.arange(count + 1))
+	groups = []
+	for start, stop in zip(bounds[:-1], bounds[1:]):
+		rows = order[start:stop]
+		groups.append(DayIndex(day[rows], **{name: column[rows] for name, column in values.items()}))
+	return groups
+
+
+class AnalyticsSnapshot:
+	"""Reports over one load of the data; all date bounds are inclusive ``YYYY-MM-DD`` or None."""
+
+	def __init__(
+		self,
+		treatments: List[DayIndex],
+		appointments: List[DayIndex],
+		invoices: DayIndex,
+		patients: DayIndex,
+		types: List[str],
+		doctors: List[str],
+	) -> None:
+		self.treatments = treatments  # one index per type, with "cents" totals
+		self.appointments = appointments  # one index per doctor
+		self.invoices = invoices
+		self.patients = patients
+		self.types = types
+		self.doctors = doctors
+
+	@property
+	def row_count(self) -> int:
+		return sum(map(len, self.treatments)) + sum(map(len, self.appointments)) + len(self.invoices) + len(self.patients)
+
+	@staticmethod
+	def _days(date_from: Optional[str], date_to: Optional[str]) -> Tuple[int, int]:
+		first = to_day(date_from) if date_from else MISSING_DAY
+		last = to_day(date_to) if date_to else 2 ** 31 - 1
+		return first, last
+
+	def _types(self, types: Optional[Sequence[str]]) -> List[DayIndex]:
+		if not types:
+			return self.treatments
+		return [self.treatments[self.types.index(t)] for t in types if t in self.types]
+
+	@staticmethod
+	def _months(indexes: Sequence[DayIndex], date_from: Optional[str], date_to: Optional[str]) -> Optional[Tuple[int, Any]]:
+		"""(first month, month edges) covering the range, or the data when a bound is open."""
+		firsts = [i.first_day for i in indexes if len(i)]
+		lasts = [i.last_day for i in indexes if len(i)]
+		first, last = AnalyticsSnapshot._days(date_from, date_to)
+		if date_from:
+			m0 = month_of(date_from)
+		elif firsts:
+			m0 = _day_month(max(min(firsts), first))
+		else:
+			return None
+		if date_to:
+			m1 = month_of(date_to)
+		elif lasts:
+			m1 = _day_month(min(max(lasts), last))
+		else:
+			return None
+		if m1 < m0:
+			return None
+		return m0, _month_edges(m0, m1, first, last)
+
+	def _by_month(self, indexes: Sequence[DayIndex], name: Optional[str], date_from: Optional[str], date_to: Optional[str]) -> Tuple[int, Any]:
+		"""(first month, per-month totals of ``name`` or row counts); months without rows are zeros."""
+		months = self._months(indexes, date_from, date_to)
+		if months is None:
+			return 0, np.zeros(0, dtype=np.int64)
+		m0, edges = months
+		total = np.zeros(len(edges) - 1, dtype=np.int64)
+		for index in indexes:
+			total += index.sums(name, edges) if name else index.counts(edges)
+		return m0, total
+
+	def revenue_by_month(self, date_from: Optional[str] = None, date_to: Optional[str] = None, types: Optional[Sequence[str]] = None) -> List[Tuple[str, float]]:
+		m0, cents = self._by_month(self._types(types), "cents", date_from, date_to)
+		return [(month_label(m0 + i), c / 100.0) for i, c in enumerate(cents.tolist())]
+
+	def new_patients_by_month(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Tuple[str, int]]:
+		m0, counts = self._by_month([self.patients], None, date_from, date_to)
+		return [(month_label(m0 + i), n) for i, n in enumerate(counts.tolist())]
+
+	def invoiced_by_month(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Tuple[str, float, float]]:
+		"""(month, invoiced, paid so far) by invoice date."""
+		m0, totals = self._by_month([self.invoices], "total_cents", date_from, date_to)
+		_m0, paid = self._by_month([self.invoices], "paid_cents", date_from, date_to)
+		return [(month_label(m0 + i), t / 100.0, p / 100.0) for i, (t, p) in enumerate(zip(totals.tolist(), paid.tolist()))]
+
+	def visits_per_doctor(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Tuple[str, int]]:
+		edges = np.array(self._days(date_from, date_to), dtype=np.int64) + (0, 1)
+		visits = [(doctor, int(index.counts(edges)[0])) for doctor, index in zip(self.doctors, self.appointments)]
+		return sorted((v for v in visits if v[1]), key=lambda v: -v[1])
+
+	def treatment_mix(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Tuple[str, int, float]]:
+		"""(type, treatments, revenue), highest revenue first."""
+		edges = np.array(self._days(date_from, date_to), dtype=np.int64) + (0, 1)
+		mix = [
+			(name, int(index.counts(edges)[0]), int(index.sums("cents", edges)[0]) / 100.0)
+			for name, index in zip(self.types, self.treatments)
+		]
+		return sorted((m for m in mix if m[1]), key=lambda m: -m[2])
+
+	def year_over_year(
+		self, date_from: Optional[str] = None, date_to: Optional[str] = None, types: Optional[Sequence[str]] = None,
+	) -> List[Tuple[str, float, float, Optional[float]]]:
+		"""(month, revenue, revenue twelve months earlier, % change or None when there was none)."""
+		indexes = self._types(types)
+		m0, current = self._by_month(indexes, "cents", date_from, date_to)
+		if not len(current):
+			return []
+		m1 = m0 + len(current) - 1
+		# The same months one year back, bounded by whole months
+		_p0, prior = self._by_month(indexes, "cents", month_label(m0 - 12) + "-01", _month_end(m1 - 12))
+		result = []
+		for i, (cur, old) in enumerate(zip(current.tolist(), prior.tolist())):
+			change = (cur - old) / old * 100 if old else None
+			result.append((month_label(m0 + i), cur / 100.0, old / 100.0, change))
+		return result
+
+
+def _day_month(day: int) -> int:
+	return int(np.datetime64(day, "D").astype("datetime64[M]").astype(np.int64))
+
+
+def _month_end(month: int) -> str:
+	return date_cls.fromordinal(EPOCH + month_start(month + 1) - 1).isoformat()
+
+
+class AnalyticsService:
+	def __init__(self, db: Database) -> None:
+		self.db = db
+
+	def _columns(self, sql: str, params: Sequence[Any], columns: Sequence[Tuple[str, Any]]) -> Dict[str, Any]:
+		"""Integer result columns as arrays, without rows whose date did not parse."""
+		width = len(columns)
+		parts = [
+			np.fromiter(chain.from_iterable(chunk), dtype=np.int64, count=len(chunk) * width)
+			for chunk in self.db.iter_chunks(sql, params)
+		]
+		matrix = (np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)).reshape(-1, width)
+		matrix = matrix[matrix[:, 0] != MISSING_DAY]
+		return {name: matrix[:, i].astype(dtype) for i, (name, dtype) in enumerate(columns)}
+
+	def load(self) -> AnalyticsSnapshot:
+		"""Read everything the reports need (worker thread; seconds for millions of rows)."""
+		# Type names come from the small summary table rather than a scan of treatments
+		types = [r[0] for r in self.db.query("SELECT DISTINCT type FROM revenue_by_month_type ORDER BY type")]
+		doctors = [r[0] for r in self.db.query("SELECT DISTINCT doctor FROM appointments ORDER BY doctor")]
+		treatments = self._columns(
+			f"SELECT {_day_sql('date')}, CAST(round(cost * 100) AS INTEGER), {_code_sql('type', len(types))} FROM treatments",
+			types, (("day", np.int32), ("cents", np.int64), ("type", np.int16)),
+		)
+		appointments = self._columns(
+			f"SELECT {_day_sql('date')}, {_code_sql('doctor', len(doctors))} FROM appointments",
+			doctors, (("day", np.int32), ("doctor", np.int16)),
+		)
+		invoices = self._columns(
+			f"SELECT {_day_sql('invoice_date')}, IFNULL(total_cents, 0), paid_cents FROM invoices",
+			(), (("day", np.int32), ("total_cents", np.int64), ("paid_cents", np.int64)),
+		)
+		patients = self._columns(f"SELECT {_day_sql('substr(created_at, 1, 10)')} FROM patients", (), (("day", np.int32),))
+		# Rows written between reading the code lists and the tables share one extra code
+		if len(treatments["type"]) and int(treatments["type"].max()) == len(types):
+			types.append("(other)")
+		if len(appointments["doctor"]) and int(appointments["doctor"].max()) == len(doctors):
+			doctors.append("(other)")
+		return AnalyticsSnapshot(
+			_grouped(treatments["type"], len(types), treatments["day"], cents=treatments["cents"]),
+			_grouped(appointments["doctor"], len(doctors), appointments["day"]),
+			DayIndex(invoices["day"], total_cents=invoices["total_cents"], paid_cents=invoices["paid_cents"]),
+			DayIndex(patients["day"]),
+			types,
+			doctors,
+		)
@@ -1,98 +1,354 @@
-from typing import List, Optional, Tuple
+import calendar
+from dataclasses import dataclass, field
+from datetime import date as date_cls, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from services.database import Database
-from models import Appointment
+from models import Appointment, AppointmentSeries
+from services.events import DELETED, INSERTED, RELOAD, UPDATED, Observable
+from services.pagination import DEFAULT_PAGE_SIZE, Page, decode_token, encode_token
 
+APPOINTMENT_COLUMNS = "id, patient_id, date, time, duration_minutes, doctor, notes"
+APPOINTMENT_COLUMNS_QUALIFIED = "a.id, a.patient_id, a.date, a.time, a.duration_minutes, a.doctor, a.notes"
 
-class AppointmentService:
+# Longest bookable slot; bounds the backwards reach of every conflict range scan
+MAX_DURATION_MINUTES = 24 * 60
+
+_EPOCH_ORDINAL = date_cls(1970, 1, 1).toordinal()
+
+DEFAULT_WORKING_HOURS = ("09:00", "17:00")
+
+# Safety cap for series without a count (e.g. "weekly until 2030")
+MAX_SERIES_OCCURRENCES = 366
+
+
+def to_minutes(t: str) -> int:
+	"""Convert HH:MM to minutes after midnight."""
+	parts = t.split(":")
+	return int(parts[0]) * 60 + int(parts[1])
+
+
+def slot_range(date: str, start_time: str, duration_minutes: int) -> Tuple[int, int]:
+	"""(start, end) of a slot in minutes since 1970-01-01 00:00."""
+	duration = int(duration_minutes)
+	if duration <= 0 or duration > MAX_DURATION_MINUTES:
+		raise ValueError(f"Duration must be between 1 and {MAX_DURATION_MINUTES} minutes.")
+	start = (date_cls.fromisoformat(date).toordinal() - _EPOCH_ORDINAL) * 1440 + to_minutes(start_time)
+	return start, start + duration
+
+
+def expand_series(series: AppointmentSeries) -> List[str]:
+	"""Occurrence dates of a series, honouring count/until and skipping exceptions.
+
+	Monthly series keep the start day of month, clamped to the last day of
+	shorter months. ``count`` counts generated dates, including skipped ones.
+	"""
+	if series.frequency not in ("daily", "weekly", "monthly"):
+		raise ValueError(f"Unsupported frequency: {series.frequency}")
+	if series.count is None and not series.until:
+		raise ValueError("A series needs a count or an until date.")
+	interval = int(series.interval or 1)
+	if interval <= 0:
+		raise ValueError("Interval must be positive.")
+	start = date_cls.fromisoformat(series.start_date)
+	until = date_cls.fromisoformat(series.until) if series.until else None
+	limit = min(series.count, MAX_SERIES_OCCURRENCES) if series.count is not None else MAX_SERIES_OCCURRENCES
+	skip = set(series.exceptions)
+	dates: List[str] = []
+	for n in range(limit):
+		if series.frequency == "monthly":
+			months = start.month - 1 + n * interval
+			year, month = start.year + months // 12, months % 12 + 1
+			current = date_cls(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+		else:
+			step = 7 if series.frequency == "weekly" else 1
+			current = start + timedelta(days=n * interval * step)
+		if until is not None and current > until:
+			break
+		iso = current.isoformat()
+		if iso not in skip:
+			dates.append(iso)
+	return dates
+
+
+def _slot(start_min: int, free_minutes: int) -> Tuple[str, str, int]:
+	day, minute = divmod(start_min, 1440)
+	return date_cls.fromordinal(day + _EPOCH_ORDINAL).isoformat(), f"{minute // 60:02d}:{minute % 60:02d}", free_minutes
+
+
+@dataclass
+class SeriesResult:
+	series_id: Optional[int]
+	created: List[Tuple[int, str]] = field(default_factory=list)  # (appointment id, date)
+	conflicts: Dict[str, List[Appointment]] = field(default_factory=dict)  # date -> clashing bookings
+
+
+class AppointmentService(Observable):
 	def __init__(self, db: Database) -> None:
+		super().__init__("appointment")
 		self.db = db
 
-	def _overlaps(self, date: str, start_time: str, duration_minutes: int, doctor: str, exclude_id: Optional[int] = None) -> bool:
-		# Convert HH:MM to minutes
-		def to_minutes(t: str) -> int:
-			parts = t.split(":")
-			return int(parts[0]) * 60 + int(parts[1])
-
-		start = to_minutes(start_time)
-		end = start + int(duration_minutes)
+	def find_conflicts(self, date: str, start_time: str, duration_minutes: int, doctor: str, exclude_id: Optional[int] = None) -> List[Appointment]:
+		"""Appointments of ``doctor`` that overlap the proposed slot."""
+		start, end = slot_range(date, start_time, duration_minutes)
+		# start_min is bounded below so the scan is a range on idx_appointments_doctor_range
+		sql = f"""
+			SELECT {APPOINTMENT_COLUMNS} FROM appointments
+			WHERE doctor=? AND start_min > ? AND start_min < ? AND end_min > ?
+		"""
+		params: List[Any] = [doctor, start - MAX_DURATION_MINUTES, end, start]
+		if exclude_id is not None:
+			sql += " AND id<>?"
+			params.append(exclude_id)
+		return self.db.query_models(Appointment, sql + " ORDER BY start_min", params, cache=False)
 
-		params: List = [date, doctor]
-		sql = "SELECT id, time, duration_minutes FROM appointments WHERE date=? AND doctor=?"
+	def _overlaps(self, date: str, start_time: str, duration_minutes: int, doctor: str, exclude_id: Optional[int] = None) -> bool:
+		start, end = slot_range(date, start_time, duration_minutes)
+		sql = "SELECT 1 FROM appointments WHERE doctor=? AND start_min > ? AND start_min < ? AND end_min > ?"
+		params: List[Any] = [doctor, start - MAX_DURATION_MINUTES, end, start]
 		if exclude_id is not None:
 			sql += " AND id<>?"
 			params.append(exclude_id)
+		return self.db.scalar(sql + " LIMIT 1", params, cache=False) is not None
 
-		rows = self.db.query(sql, tuple(params))
-		for r in rows:
-			other_start = to_minutes(r["time"]) 
-			other_end = other_start + int(r["duration_minutes"]) 
-			if not (end <= other_start or start >= other_end):
-				return True
-		return False
+	def find_conflicts_batch(self, slots: Sequence[Appointment]) -> Dict[int, List[Appointment]]:
+		"""Check many proposed slots against existing bookings in one joined query.
 
-	def create_appointment(self, appt: Appointment) -> int:
-		if self._overlaps(appt.date, appt.time, appt.duration_minutes, appt.doctor):
-			raise ValueError("Overlapping appointment for this doctor at the selected time.")
-		return self.db.execute(
+		Returns conflicting appointments keyed by the slot's position in ``slots``;
+		slots without conflicts are absent. A slot's own ``id`` is ignored so
+		existing appointments can be checked for rescheduling.
+		"""
+		if not slots:
+			return {}
+		rows = []
+		for i, s in enumerate(slots):
+			start, end = slot_range(s.date, s.time, s.duration_minutes)
+			rows.append((i, s.doctor, start, end, s.id))
+		conflicts: Dict[int, List[Appointment]] = {}
+		# Deferred: the TEMP table is connection-local, so a preview never takes the write lock
+		with self.db.transaction(immediate=False) as conn:
+			conn.execute(
+				"CREATE TEMP TABLE IF NOT EXISTS proposed_slots(idx INTEGER, doctor TEXT, start_min INTEGER, end_min INTEGER, exclude_id INTEGER)"
+			)
+			conn.execute("DELETE FROM proposed_slots")
+			conn.executemany("INSERT INTO proposed_slots VALUES(?,?,?,?,?)", rows)
+			cur = conn.execute(
+				f"""
+				SELECT p.idx, {APPOINTMENT_COLUMNS_QUALIFIED}
+				FROM proposed_slots p
+				JOIN appointments a
+					ON a.doctor = p.doctor
+					AND a.start_min > p.start_min - {MAX_DURATION_MINUTES}
+					AND a.start_min < p.end_min
+					AND a.end_min > p.start_min
+					AND a.id IS NOT p.exclude_id
+				ORDER BY p.idx, a.start_min
+				"""
+			)
+			for r in cur:
+				conflicts.setdefault(r[0], []).append(Appointment(*tuple(r)[1:]))
+			conn.execute("DELETE FROM proposed_slots")
+		return conflicts
+
+	def find_free_slots(
+		self,
+		doctor: str,
+		start_date: str,
+		end_date: str,
+		duration: int,
+		working_hours: Tuple[str, str] = DEFAULT_WORKING_HOURS,
+		limit: int = 10,
+	) -> List[Tuple[str, str, int]]:
+		"""First ``limit`` gaps of at least ``duration`` minutes in ``doctor``'s days.
+
+		Scans start_date..end_date inclusive within ``working_hours`` and returns
+		``(date, "HH:MM", free_minutes)`` for the start of each gap. All bookings
+		for the range come from one indexed query and are swept in start order.
+		"""
+		duration = int(duration)
+		if duration <= 0:
+			raise ValueError("Duration must be positive.")
+		open_min, close_min = to_minutes(working_hours[0]), to_minutes(working_hours[1])
+		first_day = date_cls.fromisoformat(start_date).toordinal() - _EPOCH_ORDINAL
+		last_day = date_cls.fromisoformat(end_date).toordinal() - _EPOCH_ORDINAL
+		busy = self.db.query(
 			"""
-			INSERT INTO appointments(patient_id, date, time, duration_minutes, doctor, notes)
-			VALUES(?,?,?,?,?,?)
+			SELECT start_min, end_min FROM appointments
+			WHERE doctor=? AND start_min > ? AND start_min < ?
+			ORDER BY start_min
 			""",
-			(appt.patient_id, appt.date, appt.time, appt.duration_minutes, appt.doctor, appt.notes),
+			(doctor, first_day * 1440 + open_min - MAX_DURATION_MINUTES, last_day * 1440 + close_min),
 		)
+		intervals = [(r[0], r[1]) for r in busy]
+
+		slots: List[Tuple[str, str, int]] = []
+		i = 0
+		for day in range(first_day, last_day + 1):
+			cursor = day * 1440 + open_min
+			day_close = day * 1440 + close_min
+			# Bookings that ended before today's opening can never matter again
+			while i < len(intervals) and intervals[i][1] <= cursor:
+				i += 1
+			j = i
+			while j < len(intervals) and intervals[j][0] < day_close:
+				busy_start, busy_end = intervals[j]
+				if busy_start - cursor >= duration:
+					slots.append(_slot(cursor, busy_start - cursor))
+					if len(slots) >= limit:
+						return slots
+				cursor = max(cursor, busy_end)
+				j += 1
+			if day_close - cursor >= duration:
+				slots.append(_slot(cursor, day_close - cursor))
+				if len(slots) >= limit:
+					return slots
+		return slots
+
+	def _series_slots(self, series: AppointmentSeries) -> List[Appointment]:
+		return [
+			Appointment(None, series.patient_id, d, series.time, series.duration_minutes, series.doctor, series.notes)
+			for d in expand_series(series)
+		]
+
+	def preview_series(self, series: AppointmentSeries) -> Dict[str, List[Appointment]]:
+		"""Conflicts each occurrence would hit, keyed by date, without booking anything."""
+		slots = self._series_slots(series)
+		return {slots[i].date: clashes for i, clashes in self.find_conflicts_batch(slots).items()}
+
+	def create_series(self, series: AppointmentSeries) -> SeriesResult:
+		"""Book every free occurrence of ``series`` in one transaction.
+
+		All occurrences are checked against existing bookings in a single pass;
+		conflicting ones are skipped and reported per date rather than aborting
+		the series.
+		"""
+		slots = self._series_slots(series)
+		if not slots:
+			raise ValueError("The series has no occurrences.")
+		with self.db.transaction():
+			clashes = self.find_conflicts_batch(slots)
+			if len(clashes) == len(slots):
+				# Nothing to book: no series row either
+				return SeriesResult(series_id=None, conflicts={slots[i].date: c for i, c in clashes.items()})
+			series_id = self.db.execute(
+				"""
+				INSERT INTO appointment_series(patient_id, start_date, time, duration_minutes, doctor, notes, frequency, interval, count, until, exceptions)
+				VALUES(?,?,?,?,?,?,?,?,?,?,?)
+				""",
+				(
+					series.patient_id, series.start_date, series.time, series.duration_minutes, series.doctor, series.notes,
+					series.frequency, series.interval, series.count, series.until, ",".join(series.exceptions) or None,
+				),
+			)
+			rows = []
+			for i, s in enumerate(slots):
+				if i in clashes:
+					continue
+				start, end = slot_range(s.date, s.time, s.duration_minutes)
+				rows.append((s.patient_id, s.date, s.time, s.duration_minutes, s.doctor, s.notes, start, end, series_id))
+			self.db.bulk_insert(
+				"appointments",
+				("patient_id", "date", "time", "duration_minutes", "doctor", "notes", "start_min", "end_min", "series_id"),
+				rows,
+			)
+			created = [(r[0], r[1]) for r in self.db.query("SELECT id, date FROM appointments WHERE series_id=? ORDER BY start_min", (series_id,))]
+		series.id = series_id
+		# One reload rather than an insert event (and a view refresh) per occurrence
+		self._notify(RELOAD)
+		return SeriesResult(series_id=series_id, created=created, conflicts={slots[i].date: c for i, c in clashes.items()})
+
+	def delete_series(self, series_id: int, from_date: Optional[str] = None) -> None:
+		"""Delete a series' occurrences, or only those on/after ``from_date``."""
+		with self.db.transaction():
+			if from_date is None:
+				self.db.execute("DELETE FROM appointments WHERE series_id=?", (series_id,))
+				self.db.execute("DELETE FROM appointment_series WHERE id=?", (series_id,))
+			else:
+				self.db.execute("DELETE FROM appointments WHERE series_id=? AND date>=?", (series_id, from_date))
+		self._notify(RELOAD)
+
+	def create_appointment(self, appt: Appointment) -> int:
+		start, end = slot_range(appt.date, appt.time, appt.duration_minutes)
+		with self.db.transaction():
+			if self._overlaps(appt.date, appt.time, appt.duration_minutes, appt.doctor):
+				raise ValueError("Overlapping appointment for this doctor at the selected time.")
+			appt_id = self.db.execute(
+				"""
+				INSERT INTO appointments(patient_id, date, time, duration_minutes, doctor, notes, start_min, end_min)
+				VALUES(?,?,?,?,?,?,?,?)
+				""",
+				(appt.patient_id, appt.date, appt.time, appt.duration_minutes, appt.doctor, appt.notes, start, end),
+			)
+		self._notify(INSERTED, appt_id)
+		return appt_id
 
 	def update_appointment(self, appt: Appointment) -> None:
 		assert appt.id is not None, "Appointment ID required"
-		if self._overlaps(appt.date, appt.time, appt.duration_minutes, appt.doctor, exclude_id=appt.id):
-			raise ValueError("Overlapping appointment for this doctor at the selected time.")
-		self.db.execute(
-			"""
-			UPDATE appointments
-			SET patient_id=?, date=?, time=?, duration_minutes=?, doctor=?, notes=?, updated_at=datetime('now')
-			WHERE id=?
-			""",
-			(appt.patient_id, appt.date, appt.time, appt.duration_minutes, appt.doctor, appt.notes, appt.id),
-		)
+		start, end = slot_range(appt.date, appt.time, appt.duration_minutes)
+		with self.db.transaction():
+			if self._overlaps(appt.date, appt.time, appt.duration_minutes, appt.doctor, exclude_id=appt.id):
+				raise ValueError("Overlapping appointment for this doctor at the selected time.")
+			self.db.execute(
+				"""
+				UPDATE appointments
+				SET patient_id=?, date=?, time=?, duration_minutes=?, doctor=?, notes=?, start_min=?, end_min=?, updated_at=datetime('now')
+				WHERE id=?
+				""",
+				(appt.patient_id, appt.date, appt.time, appt.duration_minutes, appt.doctor, appt.notes, start, end, appt.id),
+			)
+		self._notify(UPDATED, appt.id)
 
 	def delete_appointment(self, appt_id: int) -> None:
 		self.db.execute("DELETE FROM appointments WHERE id=?", (appt_id,))
+		self._notify(DELETED, appt_id)
 
-	def list_appointments(self, upcoming_only: Optional[bool] = None) -> List[Appointment]:
-		sql = "SELECT * FROM appointments"
+	def get_appointment(self, appt_id: int) -> Optional[Appointment]:
+		rows = self.db.query_models(Appointment, f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE id=?", (appt_id,))
+		return rows[0] if rows else None
+
+	def _list_sql(self, upcoming_only: Optional[bool]) -> str:
+		sql = f"SELECT {APPOINTMENT_COLUMNS} FROM appointments"
 		if upcoming_only is True:
 			sql += " WHERE date >= date('now')"
 		elif upcoming_only is False:
 			sql += " WHERE date < date('now')"
-		sql += " ORDER BY date ASC, time ASC"
-		rows = self.db.query(sql)
-		return [
-			Appointment(
-				id=r["id"],
-				patient_id=r["patient_id"],
-				date=r["date"],
-				time=r["time"],
-				duration_minutes=r["duration_minutes"],
-				doctor=r["doctor"],
-				notes=r["notes"],
-			)
-			for r in rows
-		]
+		return sql + " ORDER BY date ASC, time ASC"
+
+	def page_appointments(self, upcoming_only: Optional[bool] = None, page_token: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE) -> Page[Appointment]:
+		"""One page of list_appointments, seeking on (date, time, id) after ``page_token``."""
+		where: List[str] = []
+		params: List[Any] = []
+		if upcoming_only is True:
+			where.append("date >= date('now')")
+		elif upcoming_only is False:
+			where.append("date < date('now')")
+		if page_token:
+			where.append("(date, time, id) > (?, ?, ?)")
+			params += list(decode_token("appointments", page_token))
+		sql = f"SELECT {APPOINTMENT_COLUMNS} FROM appointments"
+		if where:
+			sql += " WHERE " + " AND ".join(where)
+		sql += " ORDER BY date ASC, time ASC, id ASC LIMIT ?"
+		params.append(page_size + 1)
+		rows = self.db.query_models(Appointment, sql, params)
+		page: Page[Appointment] = Page(items=rows[:page_size])
+		if len(rows) > page_size:
+			last = page.items[-1]
+			page.next_token = encode_token("appointments", (last.date, last.time, last.id))
+		if page_token is None and upcoming_only is None:
+			page.estimated_total = self.db.estimate_rows("appointments")
+		return page
+
+	def list_appointments(self, upcoming_only: Optional[bool] = None) -> List[Appointment]:
+		return self.db.query_models(Appointment, self._list_sql(upcoming_only))
+
+	def iter_appointments(self, upcoming_only: Optional[bool] = None, chunk_size: int = 500) -> Iterator[Appointment]:
+		"""Like list_appointments, but fetched lazily ``chunk_size`` rows at a time."""
+		return self.db.iter_query_models(Appointment, self._list_sql(upcoming_only), (), chunk_size)
 
 	def list_appointments_for_patient(self, patient_id: int) -> List[Appointment]:
-		rows = self.db.query(
-			"SELECT * FROM appointments WHERE patient_id=? ORDER BY date DESC, time DESC",
+		return self.db.query_models(
+			Appointment,
+			f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE patient_id=? ORDER BY date DESC, time DESC",
 			(patient_id,),
-		)
-		return [
-			Appointment(
-				id=r["id"],
-				patient_id=r["patient_id"],
-				date=r["date"],
-				time=r["time"],
-				duration_minutes=r["duration_minutes"],
-				doctor=r["doctor"],
-				notes=r["notes"],
-			)
-			for r in rows
-		]
\ No newline at end of file
+		)
\ No newline at end of file
@@ -1,14 +1,263 @@
-import shutil
+"""Online backup and restore through SQLite's backup API.
+
+Pages are copied in batches and the source is unlocked between batches,
+so the clinic can keep working while a backup runs. Both directions write
+to a side file first; a backup is renamed into place once complete, a
+restore is copied into the live file in one locked step.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+import hashlib
+import json
 import os
+import sqlite3
+import zlib
+from typing import Callable, List, Optional, Tuple
+
 from services.database import Database
 
+Progress = Callable[[int, int], None]  # (pages copied, total pages)
+
+PAGES_PER_STEP = 256
+STEP_SLEEP_S = 0.005  # pause between batches, lets writers take the lock
+
+
+def _copy(source: sqlite3.Connection, target: sqlite3.Connection, progress: Optional[Progress], pages: int) -> None:
+	def report(_status: int, remaining: int, total: int) -> None:
+		if progress:
+			progress(total - remaining, total)
+
+	source.backup(target, pages=pages, progress=report, sleep=STEP_SLEEP_S)
+	# Self-contained file: readable without a -wal sidecar
+	target.execute("PRAGMA journal_mode=DELETE")
+
+
+def _check_integrity(conn: sqlite3.Connection) -> None:
+	problems = [r[0] for r in conn.execute("PRAGMA integrity_check")]
+	if problems != ["ok"]:
+		raise ValueError("Backup failed integrity check: " + "; ".join(problems[:5]))
+
 
-def backup_database(db: Database, destination_path: str) -> str:
-	os.makedirs(os.path.dirname(destination_path), exist_ok=True)
-	shutil.copyfile(db.db_path, destination_path)
+def _copy_file(source_path: str, target_path: str, progress: Optional[Progress], pages: int, check: bool) -> None:
+	source = sqlite3.connect(source_path, isolation_level=None)
+	try:
+		target = sqlite3.connect(target_path)
+		try:
+			# Pin one read snapshot for the whole copy. Under WAL, writers carry on
+			# beside it, and the copy no longer restarts each time they commit.
+			source.execute("BEGIN")
+			source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+			_copy(source, target, progress, pages)
+			source.execute("COMMIT")
+			if check:
+				_check_integrity(target)
+		finally:
+			target.close()
+	except BaseException:
+		if os.path.exists(target_path):
+			os.remove(target_path)
+		raise
+	finally:
+		source.close()
+
+
+def backup_database(db: Database, destination_path: str, progress: Optional[Progress] = None, pages: int = PAGES_PER_STEP) -> str:
+	"""Consistent copy of the live database; safe while other threads keep writing."""
+	folder = os.path.dirname(destination_path)
+	if folder:
+		os.makedirs(folder, exist_ok=True)
+	partial = destination_path + ".part"
+	_copy_file(db.db_path, partial, progress, pages, check=False)
+	os.replace(partial, destination_path)
 	return destination_path
 
 
-def restore_database(db: Database, source_path: str) -> None:
-	# Close current connection if exists by recreating db wrapper (simple approach)
-	shutil.copyfile(source_path, db.db_path)
\ No newline at end of file
+def restore_database(db: Database, source_path: str, progress: Optional[Progress] = None, pages: int = PAGES_PER_STEP) -> None:
+	"""Replace the live database's contents with the backup at ``source_path``.
+
+	The backup is copied next to the live file and integrity-checked before
+	anything is touched. It is then written into the live file with the
+	backup API in a single step, under SQLite's own write lock, so every
+	other connection (in this process or another) sees either the old or the
+	restored database on its next read. Older backups are migrated to the
+	current schema.
+	"""
+	if not os.path.isfile(source_path):
+		raise FileNotFoundError(f"{source_path} does not exist")
+	staging = db.db_path + ".restore"
+	try:
+		_copy_file(source_path, staging, progress, pages, check=True)
+	except sqlite3.DatabaseError as e:
+		raise ValueError(f"{source_path} is not a usable database backup ({e})") from e
+	try:
+		source = sqlite3.connect(staging, isolation_level=None)
+		try:
+			live = sqlite3.connect(db.db_path, isolation_level=None)
+			try:
+				page_size = live.execute("PRAGMA page_size").fetchone()[0]
+				if source.execute("PRAGMA page_size").fetchone()[0] != page_size:
+					# A WAL database cannot change its page size, so the copy adopts the live one
+					source.execute(f"PRAGMA page_size={int(page_size)}")
+					source.execute("VACUUM")
+				# pages=-1 copies everything in one step, retrying while other writers hold the lock
+				source.backup(live, pages=-1)
+			finally:
+				live.close()
+		finally:
+			source.close()
+	finally:
+		os.remove(staging)
+	db.contents_replaced()
+	db.initialize_schema()
+
+
+# Incremental backups ---------------------------------------------------------
+#
+# A store directory holds content-addressed chunks and one manifest per
+# snapshot:
+#
+#   <store>/chunks/ab/abcdef...   zlib-compressed chunk, named by SHA-256 of its raw bytes
+#   <store>/snapshots/<id>.json   page size, file size and the ordered chunk hashes
+#
+# Chunks are runs of whole pages, so an edit to one page changes one chunk
+# and a snapshot only writes the chunks that differ from every earlier one.
+
+CHUNK_PAGES = 4  # 16 KiB chunks at the default 4 KiB page size; larger chunks dedupe worse
+
+
+@dataclass(slots=True)
+class Snapshot:
+	id: str
+	created: str
+	size: int
+	chunks: List[str]
+	page_size: int
+	new_chunks: int = 0
+	bytes_written: int = 0  # compressed chunk bytes plus the manifest
+
+
+def _chunk_path(store_dir: str, digest: str) -> str:
+	return os.path.join(store_dir, "chunks", digest[:2], digest)
+
+
+def _manifest_path(store_dir: str, snapshot_id: str) -> str:
+	return os.path.join(store_dir, "snapshots", f"{snapshot_id}.json")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	partial = path + ".part"
+	with open(partial, "wb") as f:
+		f.write(data)
+	os.replace(partial, path)
+
+
+def incremental_backup(db: Database, store_dir: str, progress: Optional[Progress] = None, chunk_pages: int = CHUNK_PAGES) -> Snapshot:
+	"""Snapshot the live database into ``store_dir``, storing only chunks not already there."""
+	scratch = os.path.join(store_dir, "tmp")
+	os.makedirs(scratch, exist_ok=True)
+	created = datetime.now()
+	snapshot_id = created.strftime("%Y%m%dT%H%M%S%f")
+	image = os.path.join(scratch, f"{snapshot_id}.db")
+	# A consistent image first; the live file may have pages still in the WAL
+	_copy_file(db.db_path, image, progress, PAGES_PER_STEP, check=False)
+	try:
+		with open(image, "rb") as f:
+			page_size = int.from_bytes(f.read(18)[16:18], "big")
+			page_size = 65536 if page_size == 1 else page_size
+			f.seek(0)
+			chunk_size = page_size * chunk_pages
+			snapshot = Snapshot(id=snapshot_id, created=created.isoformat(timespec="seconds"), size=0, chunks=[], page_size=page_size)
+			while True:
+				data = f.read(chunk_size)
+				if not data:
+					break
+				digest = hashlib.sha256(data).hexdigest()
+				path = _chunk_path(store_dir, digest)
+				if not os.path.exists(path):
+					packed = zlib.compress(data, 1)
+					_write_atomic(path, packed)
+					snapshot.new_chunks += 1
+					snapshot.bytes_written += len(packed)
+				snapshot.chunks.append(digest)
+				snapshot.size += len(data)
+	finally:
+		os.remove(image)
+	manifest = json.dumps({
+		"id": snapshot.id, "created": snapshot.created, "size": snapshot.size,
+		"page_size": snapshot.page_size, "chunks": snapshot.chunks,
+	}).encode()
+	_write_atomic(_manifest_path(store_dir, snapshot.id), manifest)
+	snapshot.bytes_written += len(manifest)
+	return snapshot
+
+
+def list_snapshots(store_dir: str) -> List[Snapshot]:
+	"""Snapshots in the store, oldest first."""
+	folder = os.path.join(store_dir, "snapshots")
+	if not os.path.isdir(folder):
+		return []
+	snapshots = []
+	for name in sorted(os.listdir(folder)):
+		if name.endswith(".json"):
+			with open(os.path.join(folder, name), "rb") as f:
+				m = json.load(f)
+			snapshots.append(Snapshot(id=m["id"], created=m["created"], size=m["size"], chunks=m["chunks"], page_size=m["page_size"]))
+	return snapshots
+
+
+def _get_snapshot(store_dir: str, snapshot_id: str) -> Snapshot:
+	for snapshot in list_snapshots(store_dir):
+		if snapshot.id == snapshot_id:
+			return snapshot
+	raise ValueError(f"No snapshot {snapshot_id} in {store_dir}")
+
+
+def restore_snapshot(db: Database, store_dir: str, snapshot_id: str, progress: Optional[Progress] = None) -> None:
+	"""Reassemble a snapshot from its chunks, verify each one, then restore it like a full backup."""
+	snapshot = _get_snapshot(store_dir, snapshot_id)
+	scratch = os.path.join(store_dir, "tmp")
+	os.makedirs(scratch, exist_ok=True)
+	image = os.path.join(scratch, f"restore-{snapshot.id}.db")
+	try:
+		with open(image, "wb") as out:
+			for digest in snapshot.chunks:
+				with open(_chunk_path(store_dir, digest), "rb") as f:
+					data = zlib.decompress(f.read())
+				if hashlib.sha256(data).hexdigest() != digest:
+					raise ValueError(f"Chunk {digest} is corrupt")
+				out.write(data)
+		restore_database(db, image, progress)
+	finally:
+		if os.path.exists(image):
+			os.remove(image)
+
+
+def prune_snapshots(store_dir: str, keep: int) -> List[str]:
+	"""Drop all but the newest ``keep`` snapshots; returns the removed ids. Run collect_garbage() after."""
+	snapshots = list_snapshots(store_dir)
+	doomed = snapshots[:max(len(snapshots) - keep, 0)]
+	for snapshot in doomed:
+		os.remove(_manifest_path(store_dir, snapshot.id))
+	return [s.id for s in doomed]
+
+
+def collect_garbage(store_dir: str) -> Tuple[int, int]:
+	"""Delete chunks no manifest references; returns (chunks removed, bytes freed).
+
+	Do not run while an incremental_backup() into the same store is in progress.
+	"""
+	live = {digest for snapshot in list_snapshots(store_dir) for digest in snapshot.chunks}
+	removed = freed = 0
+	root = os.path.join(store_dir, "chunks")
+	if not os.path.isdir(root):
+		return 0, 0
+	for prefix in os.listdir(root):
+		folder = os.path.join(root, prefix)
+		for name in os.listdir(folder):
+			if name not in live:
+				path = os.path.join(folder, name)
+				freed += os.path.getsize(path)
+				os.remove(path)
+				removed += 1
+	return removed, freed
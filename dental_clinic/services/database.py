@@ -1,23 +1,118 @@
 import sqlite3
-from typing import Any, Iterable, Optional
+from contextlib import contextmanager
+from itertools import chain
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Type, TypeVar
 import threading
 
+from services.mapping import mapper_for
+from services.migrations import migrate
+from services.query_cache import ALL_TABLES, QueryCache
+
+# Authorizer actions that change the schema; any of them invalidates every cached result
+_SCHEMA_ACTIONS = {
+	sqlite3.SQLITE_CREATE_INDEX, sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_CREATE_TRIGGER, sqlite3.SQLITE_CREATE_VIEW,
+	sqlite3.SQLITE_DROP_INDEX, sqlite3.SQLITE_DROP_TABLE, sqlite3.SQLITE_DROP_TRIGGER, sqlite3.SQLITE_DROP_VIEW,
+	sqlite3.SQLITE_ALTER_TABLE,
+}
+_WRITE_ACTIONS = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+
+Footprint = Tuple[FrozenSet[str], FrozenSet[str]]  # (tables read, tables written)
+
+
+class MappedRows(NamedTuple):
+	"""A query_models result as cached: cursor tuples and their model mapper."""
+	mapper: Callable[[Sequence[Any]], Any]
+	rows: List[Tuple[Any, ...]]
+
+T = TypeVar("T")
+
+
+# Named connection profiles. Every pragma is applied to each new per-thread
+# connection; the values SQLite actually accepted are read back afterwards.
+PROFILES: Dict[str, Dict[str, Any]] = {
+	# Front-desk use: short transactions, readers never block the writer.
+	"interactive": {
+		"journal_mode": "WAL",
+		"synchronous": "NORMAL",
+		"cache_size": -16000,  # KiB (~16 MB)
+		"mmap_size": 64 * 1024 * 1024,
+		"temp_store": "MEMORY",
+		"busy_timeout": 5000,  # ms
+	},
+	# Long read-only aggregations: bigger cache and map, more patience for locks.
+	"reporting": {
+		"journal_mode": "WAL",
+		"synchronous": "NORMAL",
+		"cache_size": -65536,
+		"mmap_size": 256 * 1024 * 1024,
+		"temp_store": "MEMORY",
+		"busy_timeout": 15000,
+	},
+	# Imports and restores: durability traded for throughput.
+	"bulk_load": {
+		"journal_mode": "WAL",
+		"synchronous": "OFF",
+		"cache_size": -131072,
+		"mmap_size": 256 * 1024 * 1024,
+		"temp_store": "MEMORY",
+		"busy_timeout": 30000,
+	},
+}
+
+DEFAULT_PROFILE = "interactive"
+
 
 class Database:
 	"""Thread-safe SQLite database wrapper with schema initialization."""
 
-	def __init__(self, db_path: str) -> None:
+	def __init__(self, db_path: str, profile: str = DEFAULT_PROFILE) -> None:
+		if profile not in PROFILES:
+			raise ValueError(f"Unknown connection profile: {profile}")
 		self.db_path = db_path
+		self.profile = profile
 		self._local = threading.local()
+		self._pragmas: Dict[str, Any] = {}
+		self._cache: Optional[QueryCache] = None
+		self._footprints: Dict[str, Footprint] = {}
+		# Commits made through this object, counted just before each one lands
+		self._write_seq = 0
+		self._seq_lock = threading.Lock()
+		self._watch: Optional[sqlite3.Connection] = None  # never writes; sees every other connection's commits
+		self._seen: Tuple[int, int] = (0, 0)  # (_write_seq, data_version) at the last check
 
 	def _get_connection(self) -> sqlite3.Connection:
 		conn = getattr(self._local, "conn", None)
 		if conn is None:
-			conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+			# Autocommit mode: single statements commit on their own, transaction() groups them
+			conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None)
 			conn.row_factory = sqlite3.Row
-			setattr(self._local, "conn", conn)
+			self._pragmas = self._apply_profile(conn)
+			self._local.conn = conn
+			self._local.tx_depth = 0
 		return conn
 
+	def contents_replaced(self) -> None:
+		"""Forget learned footprints and cached results after the file's contents were swapped (restore)."""
+		self._footprints.clear()
+		self.invalidate()
+
+	def _apply_profile(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+		settings = PROFILES[self.profile]
+		for name, value in settings.items():
+			conn.execute(f"PRAGMA {name}={value}")
+		# Report what took effect; e.g. journal_mode stays "memory" for :memory: databases
+		effective: Dict[str, Any] = {}
+		for name in settings:
+			row = conn.execute(f"PRAGMA {name}").fetchone()
+			effective[name] = row[0] if row else None
+		return effective
+
+	def effective_pragmas(self) -> Dict[str, Any]:
+		"""Pragmas in effect for the active profile, as reported by SQLite."""
+		if not self._pragmas:
+			self._get_connection()
+		return dict(self._pragmas)
+
 	def initialize_schema(self) -> None:
 		conn = self._get_connection()
 		cur = conn.cursor()
@@ -100,24 +195,289 @@ class Database:
 		)
 
 		conn.commit()
+		migrate(self)
+		self.invalidate()
+
+	def enable_cache(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024) -> None:
+		"""Cache results of query/query_models/scalar until a write touches their tables.
+
+		Off by default. Reads inside a transaction always go to SQLite, and a
+		commit by a writer outside this object (another process or Database)
+		drops every entry; see _check_foreign_writes.
+		"""
+		self._watch = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+		self._seen = (self._write_seq, self._watch.execute("PRAGMA data_version").fetchone()[0])
+		self._cache = QueryCache(max_entries, max_bytes)
+
+	def cache_stats(self) -> Dict[str, int]:
+		return self._cache.stats() if self._cache is not None else {}
+
+	def invalidate(self, tables: Iterable[str] = (ALL_TABLES,)) -> None:
+		"""Drop cached results for writes made outside execute()/executemany()."""
+		if self._cache is not None:
+			self._cache.bump(tables)
+
+	def _footprint(self, conn: sqlite3.Connection, sql: str, params: Any) -> Footprint:
+		"""Tables a statement reads and writes, triggers included, found once per SQL text.
+
+		The statement is compiled under EXPLAIN (not run) with an authorizer
+		recording every table access SQLite checks.
+		"""
+		footprint = self._footprints.get(sql)
+		if footprint is not None:
+			return footprint
+		reads: set = set()
+		writes: set = set()
+
+		def authorizer(action: int, arg1: Optional[str], arg2: Optional[str], db_name: Optional[str], source: Optional[str]) -> int:
+			if action == sqlite3.SQLITE_READ and arg1:
+				reads.add(arg1)
+			elif action in _WRITE_ACTIONS and arg1:
+				writes.add(arg1)
+			elif action in _SCHEMA_ACTIONS:
+				writes.add(ALL_TABLES)
+			return sqlite3.SQLITE_OK
+
+		conn.set_authorizer(authorizer)
+		try:
+			conn.execute(f"EXPLAIN {sql}", params)
+		except sqlite3.Error:
+			writes.add(ALL_TABLES)
+		finally:
+			conn.set_authorizer(None)
+		footprint = (frozenset(reads), frozenset(writes))
+		self._footprints[sql] = footprint
+		return footprint
+
+	def _note_writes(self, tables: FrozenSet[str]) -> None:
+		if self._cache is None or not tables:
+			return
+		self._cache.bump(tables)
+		if self.in_transaction():
+			# Bumped again at COMMIT/ROLLBACK so results cached mid-transaction do not outlive it
+			self._local.tx_writes |= tables
+
+	def _will_commit(self) -> None:
+		if self._cache is not None:
+			with self._seq_lock:
+				self._write_seq += 1
+
+	def _check_foreign_writes(self) -> None:
+		"""Drop every cached entry when a writer outside this object has committed.
+
+		``_watch`` never writes, so its data_version changes on every commit by
+		any other connection, this object's per-thread ones included. Those are
+		counted by _will_commit before they land; a change with no new commit
+		of ours can only come from a foreign writer. Our own commits keep their
+		per-table invalidation. A foreign commit landing between the same two
+		checks as one of ours cannot be told apart from it and is missed.
+		"""
+		with self._seq_lock:
+			seq = self._write_seq
+			version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+			last_seq, last_version = self._seen
+			self._seen = (seq, version)
+		if version != last_version and seq == last_seq:
+			self._cache.bump((ALL_TABLES,))
+
+	def _cached(self, key: Tuple[Any, ...], sql: str, params: Tuple[Any, ...], run: Callable[[], Any], cache: bool = True) -> Any:
+		if self._cache is None or not cache or self.in_transaction():
+			# A transaction must see its own and other writers' latest rows, e.g. for conflict checks
+			return run()
+		lowered = sql.lstrip().lower()
+		if not lowered.startswith(("select", "with")) or "'now'" in lowered or "random(" in lowered:
+			return run()
+		try:
+			hash(params)
+		except TypeError:
+			return run()
+		conn = self._get_connection()
+		self._check_foreign_writes()
+		found, value = self._cache.get(key)
+		if not found:
+			reads, writes = self._footprint(conn, sql, params)
+			if writes:  # footprint unknown (statement failed to compile) or not a pure read
+				return run()
+			snapshot = self._cache.snapshot(reads)
+			value = run()
+			self._cache.put(key, reads, snapshot, value)
+		# Copy the list; the rows themselves (sqlite3.Row, tuples) are immutable
+		return list(value) if isinstance(value, list) else value
+
+	def has_table(self, name: str) -> bool:
+		return self.scalar("SELECT 1 FROM sqlite_master WHERE name=?", (name,)) is not None
+
+	@contextmanager
+	def transaction(self, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+		"""Group writes into one commit; nested blocks become savepoints.
+
+		The outermost block takes the write lock up front (BEGIN IMMEDIATE) and
+		commits on exit. Inner blocks roll back only their own work when they
+		raise, leaving the enclosing transaction usable. ``immediate=False``
+		starts a deferred transaction instead, for reads that need one snapshot
+		(or scratch TEMP tables) without blocking other writers.
+		"""
+		conn = self._get_connection()
+		depth = getattr(self._local, "tx_depth", 0)
+		savepoint = f"sp_{depth}"
+		if depth == 0:
+			conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+		else:
+			conn.execute(f"SAVEPOINT {savepoint}")
+		self._local.tx_depth = depth + 1
+		if depth == 0:
+			self._local.tx_writes = set()
+		try:
+			yield conn
+		except BaseException:
+			if depth == 0:
+				conn.execute("ROLLBACK")
+			else:
+				conn.execute(f"ROLLBACK TO {savepoint}")
+				conn.execute(f"RELEASE {savepoint}")
+			raise
+		else:
+			if depth == 0:
+				if immediate or self._local.tx_writes:
+					self._will_commit()
+				conn.execute("COMMIT")
+			else:
+				conn.execute(f"RELEASE {savepoint}")
+		finally:
+			self._local.tx_depth = depth
+			if depth == 0:
+				self.invalidate(self._local.tx_writes)
+
+	def in_transaction(self) -> bool:
+		return getattr(self._local, "tx_depth", 0) > 0
 
 	def execute(self, sql: str, params: Iterable[Any] = ()) -> int:
 		conn = self._get_connection()
+		params = tuple(params)
+		writes = self._footprint(conn, sql, params)[1] if self._cache is not None else frozenset()
+		if writes and not self.in_transaction():
+			# Autocommit: this statement is its own commit
+			self._will_commit()
 		cur = conn.cursor()
-		cur.execute(sql, tuple(params))
-		conn.commit()
+		cur.execute(sql, params)
+		self._note_writes(writes)
 		return cur.lastrowid
 
-	def query(self, sql: str, params: Iterable[Any] = ()) -> list[sqlite3.Row]:
+	def executemany(self, sql: str, seq_of_params: Iterable[Sequence[Any]]) -> int:
+		"""Run one statement for many parameter rows on a single cursor and commit."""
+		rows = iter(seq_of_params)
+		first = next(rows, None)
+		if first is None:
+			return 0
+		with self.transaction() as conn:
+			# The first row compiles the statement for its footprint, so placeholders match whatever their style
+			writes = self._footprint(conn, sql, first)[1] if self._cache is not None else frozenset()
+			cur = conn.cursor()
+			cur.executemany(sql, chain((first,), rows))
+			self._note_writes(writes)
+			return cur.rowcount
+
+	def bulk_insert(self, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+		placeholders = ",".join("?" for _ in columns)
+		sql = f"INSERT INTO {table}({', '.join(columns)}) VALUES({placeholders})"
+		return self.executemany(sql, rows)
+
+	def query(self, sql: str, params: Iterable[Any] = (), cache: bool = True) -> list[sqlite3.Row]:
+		params = tuple(params)
+
+		def run() -> list[sqlite3.Row]:
+			conn = self._get_connection()
+			cur = conn.cursor()
+			cur.execute(sql, params)
+			return cur.fetchall()
+
+		return self._cached(("query", sql, params), sql, params, run, cache)
+
+	def iter_query(self, sql: str, params: Iterable[Any] = (), chunk_size: int = 500) -> Iterator[sqlite3.Row]:
+		"""Yield rows lazily, pulling ``chunk_size`` rows from SQLite at a time."""
 		conn = self._get_connection()
 		cur = conn.cursor()
 		cur.execute(sql, tuple(params))
-		rows = cur.fetchall()
-		return rows
+		try:
+			while True:
+				rows = cur.fetchmany(chunk_size)
+				if not rows:
+					break
+				yield from rows
+		finally:
+			cur.close()
 
-	def scalar(self, sql: str, params: Iterable[Any] = ()) -> Optional[Any]:
+	def iter_chunks(self, sql: str, params: Iterable[Any] = (), chunk_size: int = 65536) -> Iterator[List[Tuple[Any, ...]]]:
+		"""Yield lists of plain tuples, for callers that convert whole chunks at once (e.g. to arrays)."""
 		conn = self._get_connection()
 		cur = conn.cursor()
+		cur.row_factory = None
 		cur.execute(sql, tuple(params))
-		row = cur.fetchone()
-		return row[0] if row else None
\ No newline at end of file
+		try:
+			while True:
+				rows = cur.fetchmany(chunk_size)
+				if not rows:
+					break
+				yield rows
+		finally:
+			cur.close()
+
+	def iter_query_models(self, model: Type[T], sql: str, params: Iterable[Any] = (), chunk_size: int = 500) -> Iterator[T]:
+		conn = self._get_connection()
+		cur = conn.cursor()
+		cur.row_factory = None
+		cur.execute(sql, tuple(params))
+		mapper = mapper_for(model, cur.description)
+		try:
+			while True:
+				rows = cur.fetchmany(chunk_size)
+				if not rows:
+					break
+				for row in rows:
+					yield mapper(row)
+		finally:
+			cur.close()
+
+	def query_models(self, model: Type[T], sql: str, params: Iterable[Any] = (), cache: bool = True) -> List[T]:
+		"""Run a query and build ``model`` instances directly from the cursor tuples.
+
+		``cache=False`` always reads from SQLite, even with the cache enabled.
+		"""
+		params = tuple(params)
+
+		def run() -> MappedRows:
+			conn = self._get_connection()
+			cur = conn.cursor()
+			cur.row_factory = None
+			cur.execute(sql, params)
+			return MappedRows(mapper_for(model, cur.description), cur.fetchall())
+
+		# Models are mutable, so only the tuples are cached and every call builds its own instances
+		result = self._cached(("models", model, sql, params), sql, params, run, cache)
+		return [result.mapper(row) for row in result.rows]
+
+	def estimate_rows(self, table: str) -> int:
+		"""Cheap row-count estimate: ANALYZE statistics if present, else max(rowid)."""
+		try:
+			stat = self.scalar("SELECT stat FROM sqlite_stat1 WHERE tbl=? LIMIT 1", (table,))
+		except sqlite3.OperationalError:  # ANALYZE never ran
+			stat = None
+		if stat:
+			return int(str(stat).split()[0])
+		return int(self.scalar(f"SELECT max(rowid) FROM {table}") or 0)
+
+	def query_plan(self, sql: str, params: Iterable[Any] = ()) -> List[str]:
+		"""EXPLAIN QUERY PLAN detail lines for ``sql``."""
+		return [r[3] for r in self.query(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+	def scalar(self, sql: str, params: Iterable[Any] = (), cache: bool = True) -> Optional[Any]:
+		params = tuple(params)
+
+		def run() -> Optional[Any]:
+			conn = self._get_connection()
+			cur = conn.cursor()
+			cur.execute(sql, params)
+			row = cur.fetchone()
+			return row[0] if row else None
+
+		return self._cached(("scalar", sql, params), sql, params, run, cache)
\ No newline at end of file
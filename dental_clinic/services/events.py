@@ -0,0 +1,44 @@
+"""Change notifications from the services to whoever displays their rows."""
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+INSERTED = "inserted"
+UPDATED = "updated"
+DELETED = "deleted"
+# Many rows changed at once (bulk insert, series removal); listeners should re-query
+RELOAD = "reload"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+	entity: str  # "patient", "appointment", "treatment"
+	kind: str
+	id: Optional[int] = None
+
+
+Listener = Callable[[ChangeEvent], None]
+
+
+class Observable:
+	"""Mixin for services: listeners are called synchronously after each committed write."""
+
+	def __init__(self, entity: str) -> None:
+		self._entity = entity
+		self._listeners: List[Listener] = []
+
+	def subscribe(self, listener: Listener) -> Callable[[], None]:
+		self._listeners.append(listener)
+		return lambda: self._listeners.remove(listener) if listener in self._listeners else None
+
+	def notify_reload(self) -> None:
+		"""Tell listeners the rows changed outside this service (e.g. a restore)."""
+		self._notify(RELOAD)
+
+	def _notify(self, kind: str, row_id: Optional[int] = None) -> None:
+		event = ChangeEvent(self._entity, kind, row_id)
+		for listener in list(self._listeners):
+			try:
+				listener(event)
+			except Exception:
+				# A failing view must not undo or mask a write that already committed
+				pass
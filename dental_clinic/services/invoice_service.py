@@ -1,9 +1,46 @@
-from typing import List, Tuple
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from itertools import chain, groupby
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from datetime import date as date_cls
 from decimal import Decimal, ROUND_HALF_UP
+import json
 import os
+import time
 
 from services.database import Database
-from models import Invoice, InvoiceItem
+from models import Invoice, InvoiceItem, Payment
+
+INVOICE_COLUMNS = "id, patient_id, invoice_date, total, paid"
+INVOICE_ITEM_COLUMNS = "id, invoice_id, description, amount"
+PAYMENT_COLUMNS = "id, invoice_id, date, amount_cents, method, note"
+
+AGING_BUCKETS = ("0-30", "31-60", "61-90", "90+")
+
+
+def to_cents(amount: Any) -> int:
+	return int(Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) * 100)
+
+
+@dataclass(slots=True)
+class InvoiceBundle:
+	invoice: Invoice
+	patient_name: str
+	items: Iterable[InvoiceItem]  # a list from prefetch_invoices, a one-shot generator from iter_invoice_bundles
+
+
+@dataclass(slots=True)
+class BatchExportResult:
+	written: List[str] = field(default_factory=list)
+	failures: Dict[int, str] = field(default_factory=dict)
+	seconds: float = 0.0
+
+	def summary(self) -> str:
+		rate = len(self.written) / self.seconds if self.seconds else 0.0
+		text = f"{len(self.written)} PDFs in {self.seconds:.2f}s ({rate:.1f}/s), {len(self.failures)} failed"
+		for invoice_id, error in sorted(self.failures.items()):
+			text += f"\n  invoice {invoice_id}: {error}"
+		return text
 
 
 class InvoiceService:
@@ -13,77 +50,304 @@ class InvoiceService:
 	def create_invoice(self, patient_id: int, items: List[Tuple[str, float]], invoice_date: str) -> int:
 		"""Create invoice and items, compute total."""
 		total = float(sum(Decimal(str(a)) for _, a in items))
-		invoice_id = self.db.execute(
-			"INSERT INTO invoices(patient_id, invoice_date, total, paid) VALUES(?,?,?,0)",
-			(patient_id, invoice_date, total),
-		)
-		for desc, amount in items:
-			self.db.execute(
-				"INSERT INTO invoice_items(invoice_id, description, amount) VALUES(?,?,?)",
-				(invoice_id, desc, float(Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))),
+		with self.db.transaction():
+			invoice_id = self.db.execute(
+				"INSERT INTO invoices(patient_id, invoice_date, total, paid) VALUES(?,?,?,0)",
+				(patient_id, invoice_date, total),
+			)
+			self.db.bulk_insert(
+				"invoice_items",
+				("invoice_id", "description", "amount"),
+				(
+					(invoice_id, desc, float(Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)))
+					for desc, amount in items
+				),
 			)
 		return invoice_id
 
+	def delete_invoice(self, invoice_id: int) -> None:
+		with self.db.transaction():
+			self.db.execute("DELETE FROM invoice_items WHERE invoice_id=?", (invoice_id,))
+			self.db.execute("DELETE FROM payments WHERE invoice_id=?", (invoice_id,))
+			self.db.execute("DELETE FROM invoices WHERE id=?", (invoice_id,))
+
+	def record_payment(self, invoice_id: int, amount: Any, date: str, method: Optional[str] = None, note: Optional[str] = None) -> int:
+		"""Add a (possibly partial) payment; the invoice balance follows via triggers."""
+		cents = to_cents(amount)
+		if cents <= 0:
+			raise ValueError("Payment amount must be positive")
+		with self.db.transaction():
+			balance = self.balance_cents(invoice_id)
+			if cents > balance:
+				raise ValueError(f"Payment of {cents / 100:.2f} exceeds the outstanding balance of {balance / 100:.2f}")
+			return self.db.execute(
+				"INSERT INTO payments(invoice_id, date, amount_cents, method, note) VALUES(?,?,?,?,?)",
+				(invoice_id, date, cents, method, note),
+			)
+
+	def delete_payment(self, payment_id: int) -> None:
+		self.db.execute("DELETE FROM payments WHERE id=?", (payment_id,))
+
+	def list_payments(self, invoice_id: int) -> List[Payment]:
+		return self.db.query_models(
+			Payment, f"SELECT {PAYMENT_COLUMNS} FROM payments WHERE invoice_id=? ORDER BY date, id", (invoice_id,)
+		)
+
+	def balance_cents(self, invoice_id: int) -> int:
+		balance = self.db.scalar("SELECT total_cents - paid_cents FROM invoices WHERE id=?", (invoice_id,))
+		if balance is None:
+			raise ValueError(f"Invoice {invoice_id} not found")
+		return int(balance)
+
+	def list_outstanding(self, limit: int = 100) -> List[Tuple[int, int, str, int]]:
+		"""(invoice id, patient id, invoice date, balance in cents) for unpaid invoices, oldest first."""
+		rows = self.db.query(
+			"""
+			SELECT id, patient_id, invoice_date, total_cents - paid_cents FROM invoices
+			WHERE total_cents > paid_cents ORDER BY invoice_date LIMIT ?
+			""",
+			(limit,),
+		)
+		return [(r[0], r[1], r[2], r[3]) for r in rows]
+
+	def aging_report(self, as_of: Optional[str] = None) -> List[Tuple[str, int, int]]:
+		"""Receivables by days past invoice date: (bucket, invoices, balance in cents) per AGING_BUCKETS.
+
+		One aggregate over the partial index of open invoices; fully paid
+		history is never read.
+		"""
+		as_of = as_of or date_cls.today().isoformat()
+		row = self.db.query(
+			"""
+			SELECT
+				SUM(age <= 30), SUM(CASE WHEN age <= 30 THEN balance ELSE 0 END),
+				SUM(age BETWEEN 31 AND 60), SUM(CASE WHEN age BETWEEN 31 AND 60 THEN balance ELSE 0 END),
+				SUM(age BETWEEN 61 AND 90), SUM(CASE WHEN age BETWEEN 61 AND 90 THEN balance ELSE 0 END),
+				SUM(age > 90), SUM(CASE WHEN age > 90 THEN balance ELSE 0 END)
+			FROM (
+				SELECT CAST(julianday(?) - julianday(invoice_date) AS INTEGER) AS age, total_cents - paid_cents AS balance
+				FROM invoices WHERE total_cents > paid_cents
+			)
+			""",
+			(as_of,),
+		)[0]
+		return [(bucket, int(row[2 * i] or 0), int(row[2 * i + 1] or 0)) for i, bucket in enumerate(AGING_BUCKETS)]
+
 	def list_invoice_items(self, invoice_id: int) -> List[InvoiceItem]:
-		rows = self.db.query("SELECT * FROM invoice_items WHERE invoice_id=?", (invoice_id,))
-		return [
-			InvoiceItem(id=r["id"], invoice_id=r["invoice_id"], description=r["description"], amount=r["amount"]) for r in rows
-		]
+		return self.db.query_models(
+			InvoiceItem, f"SELECT {INVOICE_ITEM_COLUMNS} FROM invoice_items WHERE invoice_id=?", (invoice_id,)
+		)
 
 	def get_invoice(self, invoice_id: int) -> Invoice:
-		row = self.db.query("SELECT * FROM invoices WHERE id=?", (invoice_id,))[0]
-		return Invoice(
-			id=row["id"], patient_id=row["patient_id"], invoice_date=row["invoice_date"], total=row["total"], paid=row["paid"]
+		return self.db.query_models(Invoice, f"SELECT {INVOICE_COLUMNS} FROM invoices WHERE id=?", (invoice_id,))[0]
+
+	def prefetch_invoices(
+		self, invoice_ids: Optional[Sequence[int]] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+	) -> List[InvoiceBundle]:
+		"""Invoices with patient names and items for a batch, in two queries.
+
+		Select by explicit ids or by an inclusive ``invoice_date`` range.
+		"""
+		where, params = self._batch_filter(invoice_ids, date_from, date_to)
+		rows = self.db.query(
+			f"""
+			SELECT i.id, i.patient_id, i.invoice_date, i.total, i.paid, p.name
+			FROM invoices i LEFT JOIN patients p ON p.id = i.patient_id
+			WHERE {where} ORDER BY i.id
+			""",
+			params,
 		)
+		bundles = {r[0]: InvoiceBundle(Invoice(r[0], r[1], r[2], r[3], r[4]), r[5] or "", []) for r in rows}
+		if bundles:
+			items = self.db.query_models(
+				InvoiceItem,
+				f"""
+				SELECT {INVOICE_ITEM_COLUMNS} FROM invoice_items
+				WHERE invoice_id IN (SELECT value FROM json_each(?)) ORDER BY invoice_id, id
+				""",
+				(json.dumps(list(bundles)),),
+			)
+			for item in items:
+				bundles[item.invoice_id].items.append(item)
+		return list(bundles.values())
+
+	@staticmethod
+	def _batch_filter(invoice_ids: Optional[Sequence[int]], date_from: Optional[str], date_to: Optional[str]) -> Tuple[str, List[Any]]:
+		if invoice_ids is not None:
+			return "i.id IN (SELECT value FROM json_each(?))", [json.dumps(list(invoice_ids))]
+		return "i.invoice_date BETWEEN ? AND ?", [date_from or "0000-00-00", date_to or "9999-99-99"]
+
+	def iter_invoice_bundles(
+		self, invoice_ids: Optional[Sequence[int]] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+	) -> Iterator[InvoiceBundle]:
+		"""Like prefetch_invoices, but streamed from one ordered join.
+
+		Each bundle's items are a generator over the shared cursor; consume
+		them before advancing to the next bundle.
+		"""
+		where, params = self._batch_filter(invoice_ids, date_from, date_to)
+		rows = self.db.iter_query(
+			f"""
+			SELECT i.id, i.patient_id, i.invoice_date, i.total, i.paid, p.name, it.id, it.description, it.amount
+			FROM invoices i
+			LEFT JOIN patients p ON p.id = i.patient_id
+			LEFT JOIN invoice_items it ON it.invoice_id = i.id
+			WHERE {where} ORDER BY i.id, it.id
+			""",
+			params,
+		)
+		for invoice_id, group in groupby(rows, key=lambda r: r[0]):
+			first = next(group)
+			items = (InvoiceItem(r[6], invoice_id, r[7], r[8]) for r in chain((first,), group) if r[6] is not None)
+			yield InvoiceBundle(Invoice(invoice_id, first[1], first[2], first[3], first[4]), first[5] or "", items)
+
+	def export_invoices_document(
+		self, output_path: str, invoice_ids: Optional[Sequence[int]] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+	) -> Tuple[int, int]:
+		"""All selected invoices in one PDF; returns (invoices, pages)."""
+		return render_invoices_document(self.iter_invoice_bundles(invoice_ids, date_from, date_to), output_path)
 
 	def export_invoice_pdf(self, invoice_id: int, output_path: str, patient_name: str) -> str:
-		from reportlab.lib.pagesizes import A4
-		from reportlab.pdfgen import canvas
-		from reportlab.lib.units import mm
-		from reportlab.lib import colors
-
-		invoice = self.get_invoice(invoice_id)
-		items = self.list_invoice_items(invoice_id)
-
-		os.makedirs(os.path.dirname(output_path), exist_ok=True)
-		c = canvas.Canvas(output_path, pagesize=A4)
-		width, height = A4
-
-		y = height - 40 * mm
-		c.setFont("Helvetica-Bold", 16)
-		c.drawString(25 * mm, y, "Dental Clinic Invoice")
-		y -= 10 * mm
-		c.setFont("Helvetica", 10)
-		c.drawString(25 * mm, y, f"Invoice ID: {invoice.id}")
-		y -= 6 * mm
-		c.drawString(25 * mm, y, f"Date: {invoice.invoice_date}")
-		y -= 6 * mm
-		c.drawString(25 * mm, y, f"Patient: {patient_name}")
-		y -= 12 * mm
-
-		# Table header
-		c.setFont("Helvetica-Bold", 11)
-		c.drawString(25 * mm, y, "Description")
-		c.drawRightString(180 * mm, y, "Amount ($)")
-		y -= 5 * mm
-		c.setStrokeColor(colors.grey)
-		c.line(25 * mm, y, 180 * mm, y)
-		y -= 5 * mm
-
-		c.setFont("Helvetica", 10)
-		for item in items:
-			if y < 30 * mm:
-				c.showPage()
-				y = height - 30 * mm
-			c.drawString(25 * mm, y, item.description)
-			c.drawRightString(180 * mm, y, f"{item.amount:.2f}")
-			y -= 6 * mm
-
-		# Total
+		return render_invoice_pdf(self.get_invoice(invoice_id), self.list_invoice_items(invoice_id), patient_name, output_path)
+
+	def export_invoices_pdf(
+		self, output_dir: str, invoice_ids: Optional[Sequence[int]] = None, date_from: Optional[str] = None,
+		date_to: Optional[str] = None, workers: Optional[int] = None,
+	) -> BatchExportResult:
+		"""Render many invoices to ``output_dir`` across a process pool.
+
+		Files are named by invoice_filename(), so re-running a batch overwrites
+		the same files. A failing invoice is recorded and the rest carry on.
+		"""
+		started = time.perf_counter()
+		bundles = self.prefetch_invoices(invoice_ids, date_from, date_to)
+		os.makedirs(output_dir, exist_ok=True)
+		jobs = [(b.invoice, b.items, b.patient_name, os.path.join(output_dir, invoice_filename(b.invoice))) for b in bundles]
+		result = BatchExportResult()
+		if invoice_ids is not None:
+			found = {b.invoice.id for b in bundles}
+			result.failures.update({i: "invoice not found" for i in invoice_ids if i not in found})
+		workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+		with ExitStack() as stack:
+			if workers > 1:
+				from concurrent.futures import ProcessPoolExecutor  # multiprocessing is slow to import
+
+				pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+				outcomes = pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+			else:
+				outcomes = map(_render_job, jobs)
+			for invoice_id, path, error in outcomes:
+				if error is None:
+					result.written.append(path)
+				else:
+					result.failures[invoice_id] = error
+		result.seconds = time.perf_counter() - started
+		return result
+
+
+def invoice_filename(invoice: Invoice) -> str:
+	return f"invoice_{invoice.id:06d}_{invoice.invoice_date}.pdf"
+
+
+def _render_job(job: Tuple[Invoice, List[InvoiceItem], str, str]) -> Tuple[int, str, Optional[str]]:
+	# Runs in a worker process; errors come back as text so one bad invoice does not stop the batch
+	invoice, items, patient_name, path = job
+	try:
+		render_invoice_pdf(invoice, items, patient_name, path)
+		return invoice.id, path, None
+	except Exception as e:
+		return invoice.id, path, f"{type(e).__name__}: {e}"
+
+
+# Layout, all in mm from the left edge / top of an A4 page
+_LEFT, _RIGHT = 25, 180
+_TITLE_Y = 40  # below the top edge
+_TABLE_Y = _TITLE_Y + 34
+_ITEMS_Y = _TABLE_Y + 10
+_CONTINUED_Y = 30
+_BOTTOM = 30  # above the bottom edge
+
+
+def _draw_letterhead(c, height: float) -> None:
+	"""Title and table header; identical on every invoice."""
+	from reportlab.lib.units import mm
+	from reportlab.lib import colors
+
+	c.setFont("Helvetica-Bold", 16)
+	c.drawString(_LEFT * mm, height - _TITLE_Y * mm, "Dental Clinic Invoice")
+	c.setFont("Helvetica-Bold", 11)
+	c.drawString(_LEFT * mm, height - _TABLE_Y * mm, "Description")
+	c.drawRightString(_RIGHT * mm, height - _TABLE_Y * mm, "Amount ($)")
+	c.setStrokeColor(colors.grey)
+	c.line(_LEFT * mm, height - (_TABLE_Y + 5) * mm, _RIGHT * mm, height - (_TABLE_Y + 5) * mm)
+
+
+def _draw_invoice(c, height: float, invoice: Invoice, items: Iterable[InvoiceItem], patient_name: str, letterhead: Callable[[], None]) -> int:
+	"""Draw one invoice from a fresh page; returns the number of pages used."""
+	from reportlab.lib.units import mm
+
+	letterhead()
+	c.setFont("Helvetica", 10)
+	y = height - (_TITLE_Y + 10) * mm
+	c.drawString(_LEFT * mm, y, f"Invoice ID: {invoice.id}")
+	c.drawString(_LEFT * mm, y - 6 * mm, f"Date: {invoice.invoice_date}")
+	c.drawString(_LEFT * mm, y - 12 * mm, f"Patient: {patient_name}")
+
+	pages = 1
+	y = height - _ITEMS_Y * mm
+	for item in items:
+		if y < _BOTTOM * mm:
+			c.showPage()
+			c.setFont("Helvetica", 10)
+			pages += 1
+			y = height - _CONTINUED_Y * mm
+		c.drawString(_LEFT * mm, y, item.description)
+		c.drawRightString(_RIGHT * mm, y, f"{item.amount:.2f}")
 		y -= 6 * mm
-		c.setFont("Helvetica-Bold", 12)
-		c.drawRightString(180 * mm, y, f"Total: ${invoice.total:.2f}")
 
-		c.showPage()
-		c.save()
-		return output_path
\ No newline at end of file
+	# Total
+	y -= 6 * mm
+	c.setFont("Helvetica-Bold", 12)
+	c.drawRightString(_RIGHT * mm, y, f"Total: ${invoice.total:.2f}")
+	c.showPage()
+	return pages
+
+
+def render_invoice_pdf(invoice: Invoice, items: List[InvoiceItem], patient_name: str, output_path: str) -> str:
+	from reportlab.lib.pagesizes import A4
+	from reportlab.pdfgen import canvas
+
+	folder = os.path.dirname(output_path)
+	if folder:
+		os.makedirs(folder, exist_ok=True)
+	c = canvas.Canvas(output_path, pagesize=A4)
+	height = A4[1]
+	_draw_invoice(c, height, invoice, items, patient_name, lambda: _draw_letterhead(c, height))
+	c.save()
+	return output_path
+
+
+def render_invoices_document(bundles: Iterable[InvoiceBundle], output_path: str) -> Tuple[int, int]:
+	"""Write many invoices into one PDF, e.g. for a print run; returns (invoices, pages).
+
+	The letterhead is drawn once into a form XObject and each invoice page
+	references it, so it is stored in the file once. Bundles and their items
+	are consumed as they come, so they can stream from iter_invoice_bundles().
+	"""
+	from reportlab.lib.pagesizes import A4
+	from reportlab.pdfgen import canvas
+
+	folder = os.path.dirname(output_path)
+	if folder:
+		os.makedirs(folder, exist_ok=True)
+	c = canvas.Canvas(output_path, pagesize=A4, pageCompression=1)
+	height = A4[1]
+	c.beginForm("letterhead")
+	_draw_letterhead(c, height)
+	c.endForm()
+	invoices = pages = 0
+	for bundle in bundles:
+		pages += _draw_invoice(c, height, bundle.invoice, bundle.items, bundle.patient_name, lambda: c.doForm("letterhead"))
+		invoices += 1
+	c.save()
+	return invoices, pages
@@ -0,0 +1,57 @@
+"""Map cursor tuples straight onto model dataclasses.
+
+Building a ``sqlite3.Row`` per row and then copying it field by field into a
+model allocates every result twice. Instead the cursor yields plain tuples and
+a per-query-shape mapper picks the model's fields out by position.
+"""
+from dataclasses import fields
+from operator import itemgetter
+import threading
+from typing import Any, Callable, Dict, Sequence, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+Mapper = Callable[[Sequence[Any]], Any]
+
+_cache: Dict[Tuple[type, Tuple[str, ...]], Mapper] = {}
+_lock = threading.Lock()
+
+
+def _build_mapper(model: Type[T], columns: Tuple[str, ...]) -> Callable[[Sequence[Any]], T]:
+	position = {name: i for i, name in enumerate(columns)}
+	names = [f.name for f in fields(model)]
+	missing = [n for n in names if n not in position]
+	if missing:
+		raise ValueError(f"{model.__name__} query is missing columns: {', '.join(missing)}")
+	indices = [position[n] for n in names]
+	if len(indices) == 1:
+		idx = indices[0]
+		return lambda row: model(row[idx])
+	getter = itemgetter(*indices)
+	return lambda row: model(*getter(row))
+
+
+def mapper_for(model: Type[T], description: Sequence[Sequence[Any]]) -> Callable[[Sequence[Any]], T]:
+	"""Return a cached tuple -> model mapper for a cursor description."""
+	columns = tuple(d[0] for d in description)
+	key = (model, columns)
+	mapper = _cache.get(key)
+	if mapper is None:
+		mapper = _build_mapper(model, columns)
+		with _lock:
+			_cache[key] = mapper
+	return mapper
+
+
+def model_row_factory(model: Type[T]) -> Callable[[Any, Tuple[Any, ...]], T]:
+	"""A ``row_factory`` for cursors that should produce ``model`` instances."""
+	state: Dict[str, Any] = {"description": None, "mapper": None}
+
+	def factory(cursor: Any, row: Tuple[Any, ...]) -> T:
+		description = cursor.description
+		if description is not state["description"]:
+			state["description"] = description
+			state["mapper"] = mapper_for(model, description)
+		return state["mapper"](row)
+
+	return factory
@@ -0,0 +1,298 @@
+"""Ordered schema migrations keyed on ``PRAGMA user_version``.
+
+``Database.initialize_schema`` creates the original tables, then
+``migrate`` applies every step whose version is above the database's
+``user_version``, each in its own transaction together with the version
+bump. Steps are written to be idempotent so databases created before
+versioning (which may already carry some of these objects) upgrade cleanly.
+Append new steps at the end; never renumber or edit a released one.
+"""
+import sqlite3
+from typing import TYPE_CHECKING, Callable, List, Tuple
+
+if TYPE_CHECKING:
+	from services.database import Database
+
+Migration = Tuple[int, str, Callable[[sqlite3.Connection], None]]
+
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+	existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+	if column not in existing:
+		conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _listing_indexes(conn: sqlite3.Connection) -> None:
+	# rowid is implicit in every index, so these also serve (name, id)-style keyset seeks
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(name)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date_time ON appointments(date, time)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_treatments_patient_date ON treatments(patient_id, date)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_patient ON invoices(patient_id)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items(invoice_id)")
+
+
+def _appointment_minute_ranges(conn: sqlite3.Connection) -> None:
+	# Minutes since 1970-01-01 00:00; conflict checks become one range seek per doctor
+	_ensure_column(conn, "appointments", "start_min", "INTEGER")
+	_ensure_column(conn, "appointments", "end_min", "INTEGER")
+	conn.execute(
+		"""
+		UPDATE appointments
+		SET start_min = CAST(julianday(date) - 2440587.5 AS INTEGER) * 1440
+				+ CAST(substr(time, 1, instr(time, ':') - 1) AS INTEGER) * 60
+				+ CAST(substr(time, instr(time, ':') + 1) AS INTEGER)
+		WHERE start_min IS NULL
+		"""
+	)
+	conn.execute("UPDATE appointments SET end_min = start_min + duration_minutes WHERE end_min IS NULL")
+	# end_min rides along so the index covers the overlap query
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_doctor_range ON appointments(doctor, start_min, end_min)")
+
+
+def _appointment_series(conn: sqlite3.Connection) -> None:
+	conn.execute(
+		"""
+		CREATE TABLE IF NOT EXISTS appointment_series (
+			id INTEGER PRIMARY KEY AUTOINCREMENT,
+			patient_id INTEGER NOT NULL,
+			start_date TEXT NOT NULL,
+			time TEXT NOT NULL,
+			duration_minutes INTEGER NOT NULL DEFAULT 30,
+			doctor TEXT NOT NULL,
+			notes TEXT,
+			frequency TEXT NOT NULL CHECK(frequency IN ('daily','weekly','monthly')),
+			interval INTEGER NOT NULL DEFAULT 1,
+			count INTEGER,
+			until TEXT,
+			exceptions TEXT,              -- comma-separated YYYY-MM-DD dates to skip
+			created_at TEXT DEFAULT (datetime('now')),
+			FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
+		);
+		"""
+	)
+	# Occurrences are ordinary appointments tagged with their series
+	_ensure_column(conn, "appointments", "series_id", "INTEGER")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_series ON appointments(series_id)")
+
+
+def _patient_search(conn: sqlite3.Connection) -> None:
+	"""Full-text index over patients kept in sync by triggers (skipped without FTS5)."""
+	if conn.execute("SELECT 1 FROM sqlite_master WHERE name='patients_fts'").fetchone():
+		return
+	try:
+		conn.execute(
+			"""
+			CREATE VIRTUAL TABLE patients_fts USING fts5(
+				name, phone, address,
+				content='patients', content_rowid='id',
+				tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+			)
+			"""
+		)
+	except sqlite3.OperationalError:  # SQLite built without FTS5; PatientService falls back to LIKE
+		return
+	conn.execute(
+		"""
+		CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN
+			INSERT INTO patients_fts(rowid, name, phone, address) VALUES (new.id, new.name, new.phone, new.address);
+		END
+		"""
+	)
+	conn.execute(
+		"""
+		CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN
+			INSERT INTO patients_fts(patients_fts, rowid, name, phone, address) VALUES ('delete', old.id, old.name, old.phone, old.address);
+		END
+		"""
+	)
+	conn.execute(
+		"""
+		CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF name, phone, address ON patients BEGIN
+			INSERT INTO patients_fts(patients_fts, rowid, name, phone, address) VALUES ('delete', old.id, old.name, old.phone, old.address);
+			INSERT INTO patients_fts(rowid, name, phone, address) VALUES (new.id, new.name, new.phone, new.address);
+		END
+		"""
+	)
+	# Index patients that existed before the search table
+	conn.execute("INSERT INTO patients_fts(patients_fts) VALUES ('rebuild')")
+
+
+def _monthly_summaries(conn: sqlite3.Connection) -> None:
+	"""Summary tables for reports, kept current by triggers at O(1) per write."""
+	conn.execute(
+		"""
+		CREATE TABLE IF NOT EXISTS revenue_by_month (
+			ym TEXT PRIMARY KEY,          -- YYYY-MM
+			revenue_cents INTEGER NOT NULL DEFAULT 0,
+			treatments INTEGER NOT NULL DEFAULT 0
+		)
+		"""
+	)
+	conn.execute(
+		"""
+		CREATE TABLE IF NOT EXISTS revenue_by_month_type (
+			ym TEXT NOT NULL,
+			type TEXT NOT NULL,
+			revenue_cents INTEGER NOT NULL DEFAULT 0,
+			treatments INTEGER NOT NULL DEFAULT 0,
+			PRIMARY KEY (ym, type)
+		)
+		"""
+	)
+	conn.execute(
+		"""
+		CREATE TABLE IF NOT EXISTS new_patients_by_month (
+			ym TEXT PRIMARY KEY,
+			patients INTEGER NOT NULL DEFAULT 0
+		)
+		"""
+	)
+	# Money is summed in integer cents so incremental updates never drift
+	add_treatment = """
+		INSERT INTO revenue_by_month(ym, revenue_cents, treatments)
+		VALUES (substr(new.date, 1, 7), CAST(round(new.cost * 100) AS INTEGER), 1)
+		ON CONFLICT(ym) DO UPDATE SET revenue_cents = revenue_cents + excluded.revenue_cents, treatments = treatments + 1;
+		INSERT INTO revenue_by_month_type(ym, type, revenue_cents, treatments)
+		VALUES (substr(new.date, 1, 7), new.type, CAST(round(new.cost * 100) AS INTEGER), 1)
+		ON CONFLICT(ym, type) DO UPDATE SET revenue_cents = revenue_cents + excluded.revenue_cents, treatments = treatments + 1;
+	"""
+	remove_treatment = """
+		UPDATE revenue_by_month
+		SET revenue_cents = revenue_cents - CAST(round(old.cost * 100) AS INTEGER), treatments = treatments - 1
+		WHERE ym = substr(old.date, 1, 7);
+		DELETE FROM revenue_by_month WHERE ym = substr(old.date, 1, 7) AND treatments <= 0;
+		UPDATE revenue_by_month_type
+		SET revenue_cents = revenue_cents - CAST(round(old.cost * 100) AS INTEGER), treatments = treatments - 1
+		WHERE ym = substr(old.date, 1, 7) AND type = old.type;
+		DELETE FROM revenue_by_month_type WHERE ym = substr(old.date, 1, 7) AND type = old.type AND treatments <= 0;
+	"""
+	add_patient = """
+		INSERT INTO new_patients_by_month(ym, patients) VALUES (substr(new.created_at, 1, 7), 1)
+		ON CONFLICT(ym) DO UPDATE SET patients = patients + 1;
+	"""
+	remove_patient = """
+		UPDATE new_patients_by_month SET patients = patients - 1 WHERE ym = substr(old.created_at, 1, 7);
+		DELETE FROM new_patients_by_month WHERE ym = substr(old.created_at, 1, 7) AND patients <= 0;
+	"""
+	triggers = [
+		("treatments_summary_ai", "AFTER INSERT ON treatments", add_treatment),
+		("treatments_summary_ad", "AFTER DELETE ON treatments", remove_treatment),
+		("treatments_summary_au", "AFTER UPDATE OF date, type, cost ON treatments", remove_treatment + add_treatment),
+		("patients_summary_ai", "AFTER INSERT ON patients", add_patient),
+		("patients_summary_ad", "AFTER DELETE ON patients", remove_patient),
+		("patients_summary_au", "AFTER UPDATE OF created_at ON patients", remove_patient + add_patient),
+	]
+	for name, event, body in triggers:
+		conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+	rebuild_summaries(conn)
+
+
+def rebuild_summaries(conn: sqlite3.Connection) -> None:
+	"""Recompute the monthly summary tables from the base tables."""
+	conn.execute("DELETE FROM revenue_by_month")
+	conn.execute("DELETE FROM revenue_by_month_type")
+	conn.execute("DELETE FROM new_patients_by_month")
+	conn.execute(
+		"""
+		INSERT INTO revenue_by_month_type(ym, type, revenue_cents, treatments)
+		SELECT substr(date, 1, 7), type, SUM(CAST(round(cost * 100) AS INTEGER)), COUNT(*)
+		FROM treatments GROUP BY 1, 2
+		"""
+	)
+	conn.execute(
+		"""
+		INSERT INTO revenue_by_month(ym, revenue_cents, treatments)
+		SELECT ym, SUM(revenue_cents), SUM(treatments) FROM revenue_by_month_type GROUP BY ym
+		"""
+	)
+	conn.execute(
+		"""
+		INSERT INTO new_patients_by_month(ym, patients)
+		SELECT substr(created_at, 1, 7), COUNT(*) FROM patients GROUP BY 1
+		"""
+	)
+
+
+def _invoice_dates(conn: sqlite3.Connection) -> None:
+	# Month-end batch export selects invoices by date range
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date)")
+
+
+def _payments_ledger(conn: sqlite3.Connection) -> None:
+	# Balances in integer cents; invoices.paid_cents is always SUM(payments.amount_cents)
+	conn.execute(
+		"""
+		CREATE TABLE IF NOT EXISTS payments (
+			id INTEGER PRIMARY KEY AUTOINCREMENT,
+			invoice_id INTEGER NOT NULL,
+			date TEXT NOT NULL,
+			amount_cents INTEGER NOT NULL CHECK(amount_cents > 0),
+			method TEXT,
+			note TEXT,
+			FOREIGN KEY(invoice_id) REFERENCES invoices(id) ON DELETE CASCADE
+		)
+		"""
+	)
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_invoice_date ON payments(invoice_id, date)")
+	_ensure_column(conn, "invoices", "total_cents", "INTEGER")
+	_ensure_column(conn, "invoices", "paid_cents", "INTEGER NOT NULL DEFAULT 0")
+	conn.execute("UPDATE invoices SET total_cents = CAST(round(total * 100) AS INTEGER) WHERE total_cents IS NULL")
+	# Amounts already in the old REAL column become opening payments so the ledger adds up
+	conn.execute(
+		"""
+		INSERT INTO payments(invoice_id, date, amount_cents, method, note)
+		SELECT id, invoice_date, CAST(round(paid * 100) AS INTEGER), NULL, 'carried over'
+		FROM invoices
+		WHERE paid > 0 AND NOT EXISTS (SELECT 1 FROM payments WHERE invoice_id = invoices.id)
+		"""
+	)
+	conn.execute("UPDATE invoices SET paid_cents = COALESCE((SELECT SUM(amount_cents) FROM payments WHERE invoice_id = invoices.id), 0)")
+	# Only invoices with money owed; the aging report walks just these
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_open ON invoices(invoice_date) WHERE total_cents > paid_cents")
+
+	paid = "paid_cents = paid_cents {op} {amount}, paid = (paid_cents {op} {amount}) / 100.0"
+	triggers = [
+		("invoices_cents_ai", "AFTER INSERT ON invoices WHEN NEW.total_cents IS NULL",
+		 "UPDATE invoices SET total_cents = CAST(round(NEW.total * 100) AS INTEGER) WHERE id = NEW.id;"),
+		("invoices_cents_au", "AFTER UPDATE OF total ON invoices",
+		 "UPDATE invoices SET total_cents = CAST(round(NEW.total * 100) AS INTEGER) WHERE id = NEW.id;"),
+		("payments_ai", "AFTER INSERT ON payments",
+		 f"UPDATE invoices SET {paid.format(op='+', amount='NEW.amount_cents')} WHERE id = NEW.invoice_id;"),
+		("payments_ad", "AFTER DELETE ON payments",
+		 f"UPDATE invoices SET {paid.format(op='-', amount='OLD.amount_cents')} WHERE id = OLD.invoice_id;"),
+		("payments_au", "AFTER UPDATE OF invoice_id, amount_cents ON payments",
+		 f"UPDATE invoices SET {paid.format(op='-', amount='OLD.amount_cents')} WHERE id = OLD.invoice_id; "
+		 f"UPDATE invoices SET {paid.format(op='+', amount='NEW.amount_cents')} WHERE id = NEW.invoice_id;"),
+	]
+	for name, event, body in triggers:
+		conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+
+MIGRATIONS: List[Migration] = [
+	(1, "indexes for patient, appointment, treatment and invoice listings", _listing_indexes),
+	(2, "integer minute ranges for appointment conflict checks", _appointment_minute_ranges),
+	(3, "recurring appointment series", _appointment_series),
+	(4, "FTS5 patient search", _patient_search),
+	(5, "trigger-maintained monthly summary tables for reports", _monthly_summaries),
+	(6, "invoice date index for batch export", _invoice_dates),
+	(7, "payments ledger with integer-cent invoice balances", _payments_ledger),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(db: "Database") -> int:
+	return int(db.scalar("PRAGMA user_version") or 0)
+
+
+def migrate(db: "Database") -> List[int]:
+	"""Apply pending migrations in order; returns the versions applied."""
+	applied: List[int] = []
+	for version, _description, step in MIGRATIONS:
+		if version <= schema_version(db):
+			continue
+		with db.transaction() as conn:
+			step(conn)
+			conn.execute(f"PRAGMA user_version = {version}")
+		applied.append(version)
+	return applied
@@ -0,0 +1,38 @@
+"""Keyset (seek) pagination helpers shared by the listing services.
+
+A page token is the sort key of the last row on the previous page, so the
+next page is a single ``WHERE (key) > (?)`` index seek no matter how deep the
+caller has paged. Tokens are opaque URL-safe strings tagged with the listing
+they belong to.
+"""
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 100
+
+
+@dataclass
+class Page(Generic[T]):
+	items: List[T] = field(default_factory=list)
+	next_token: Optional[str] = None
+	estimated_total: Optional[int] = None
+
+
+def encode_token(kind: str, key: Sequence[Any]) -> str:
+	raw = json.dumps([kind, *key], separators=(",", ":")).encode("utf-8")
+	return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_token(kind: str, token: str) -> Tuple[Any, ...]:
+	try:
+		padded = token + "=" * (-len(token) % 4)
+		data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+	except (ValueError, TypeError) as e:
+		raise ValueError("Invalid page token") from e
+	if not isinstance(data, list) or not data or data[0] != kind:
+		raise ValueError(f"Page token does not belong to {kind} listing")
+	return tuple(data[1:])
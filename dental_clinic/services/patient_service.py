@@ -1,19 +1,72 @@
-from typing import List, Optional
+import re
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import asdict
 
 from services.database import Database
 from models import Patient
+from services.events import DELETED, INSERTED, RELOAD, UPDATED, Observable
+from services.pagination import DEFAULT_PAGE_SIZE, Page, decode_token, encode_token
 
+PATIENT_COLUMNS = "id, name, age, gender, phone, address"
+PATIENT_COLUMNS_QUALIFIED = "p.id, p.name, p.age, p.gender, p.phone, p.address"
 
-class PatientService:
+
+def fts_query(text: str) -> Optional[str]:
+	"""Turn free text into an FTS5 query: every token must match as a prefix."""
+	tokens = re.findall(r"\w+", text)
+	if not tokens:
+		return None
+	return " ".join(f'"{t}"*' for t in tokens)
+
+
+class PatientService(Observable):
 	def __init__(self, db: Database) -> None:
+		super().__init__("patient")
 		self.db = db
+		self._fts: Optional[bool] = None
 
 	def create_patient(self, patient: Patient) -> int:
-		return self.db.execute(
+		patient_id = self.db.execute(
 			"INSERT INTO patients(name, age, gender, phone, address) VALUES(?,?,?,?,?)",
 			(patient.name, patient.age, patient.gender, patient.phone, patient.address),
 		)
+		self._notify(INSERTED, patient_id)
+		return patient_id
+
+	def create_patients(self, patients: Iterable[Patient]) -> int:
+		"""Insert many patients in one transaction; returns the number of rows written."""
+		count = self.db.bulk_insert(
+			"patients",
+			("name", "age", "gender", "phone", "address"),
+			((p.name, p.age, p.gender, p.phone, p.address) for p in patients),
+		)
+		self._notify(RELOAD)
+		return count
+
+	@contextmanager
+	def deferred_search_index(self) -> Iterator[None]:
+		"""Index patients inserted inside the block in one statement instead of one trigger per row.
+
+		The insert trigger is dropped and recreated within the same
+		transaction, so other connections never see it missing.
+		"""
+		with self.db.transaction():
+			if not self._fts_enabled():
+				yield
+				return
+			trigger_sql = self.db.scalar("SELECT sql FROM sqlite_master WHERE type='trigger' AND name='patients_fts_ai'")
+			if trigger_sql is None:
+				yield
+				return
+			last_id = self.db.scalar("SELECT COALESCE(MAX(id), 0) FROM patients")
+			self.db.execute("DROP TRIGGER patients_fts_ai")
+			yield
+			self.db.execute(
+				"INSERT INTO patients_fts(rowid, name, phone, address) SELECT id, name, phone, address FROM patients WHERE id > ?",
+				(last_id,),
+			)
+			self.db.execute(trigger_sql)
 
 	def update_patient(self, patient: Patient) -> None:
 		assert patient.id is not None, "Patient ID is required for update"
@@ -25,41 +78,93 @@ class PatientService:
 			""",
 			(patient.name, patient.age, patient.gender, patient.phone, patient.address, patient.id),
 		)
+		self._notify(UPDATED, patient.id)
 
 	def delete_patient(self, patient_id: int) -> None:
-		self.db.execute("DELETE FROM patients WHERE id=?", (patient_id,))
+		# foreign_keys is off, so remove dependent rows explicitly and atomically
+		with self.db.transaction():
+			self.db.execute(
+				"DELETE FROM invoice_items WHERE invoice_id IN (SELECT id FROM invoices WHERE patient_id=?)",
+				(patient_id,),
+			)
+			self.db.execute("DELETE FROM payments WHERE invoice_id IN (SELECT id FROM invoices WHERE patient_id=?)", (patient_id,))
+			self.db.execute("DELETE FROM invoices WHERE patient_id=?", (patient_id,))
+			self.db.execute("DELETE FROM treatments WHERE patient_id=?", (patient_id,))
+			self.db.execute("DELETE FROM appointments WHERE patient_id=?", (patient_id,))
+			self.db.execute("DELETE FROM patients WHERE id=?", (patient_id,))
+		self._notify(DELETED, patient_id)
 
 	def get_patient(self, patient_id: int) -> Optional[Patient]:
-		rows = self.db.query("SELECT * FROM patients WHERE id=?", (patient_id,))
-		if not rows:
-			return None
-		row = rows[0]
-		return Patient(
-			id=row["id"],
-			name=row["name"],
-			age=row["age"],
-			gender=row["gender"],
-			phone=row["phone"],
-			address=row["address"],
-		)
+		rows = self.db.query_models(Patient, f"SELECT {PATIENT_COLUMNS} FROM patients WHERE id=?", (patient_id,))
+		return rows[0] if rows else None
 
-	def list_patients(self, query_text: str = "") -> List[Patient]:
+	def _fts_enabled(self) -> bool:
+		if self._fts is None:
+			self._fts = self.db.has_table("patients_fts")
+		return self._fts
+
+	def _list_sql(self, query_text: str) -> Tuple[str, Tuple[Any, ...]]:
+		match = fts_query(query_text) if self._fts_enabled() else None
+		if match:
+			# Best bm25 match first; name breaks ties so equal ranks stay stable
+			return (
+				f"""
+				SELECT {PATIENT_COLUMNS_QUALIFIED} FROM patients_fts
+				JOIN patients p ON p.id = patients_fts.rowid
+				WHERE patients_fts MATCH ? ORDER BY patients_fts.rank, p.name ASC
+				""",
+				(match,),
+			)
 		if query_text:
 			like = f"%{query_text.strip()}%"
-			rows = self.db.query(
-				"SELECT * FROM patients WHERE name LIKE ? OR phone LIKE ? ORDER BY name ASC",
+			return (
+				f"SELECT {PATIENT_COLUMNS} FROM patients WHERE name LIKE ? OR phone LIKE ? ORDER BY name ASC",
 				(like, like),
 			)
-		else:
-			rows = self.db.query("SELECT * FROM patients ORDER BY name ASC")
-		return [
-			Patient(
-				id=r["id"],
-				name=r["name"],
-				age=r["age"],
-				gender=r["gender"],
-				phone=r["phone"],
-				address=r["address"],
-			)
-			for r in rows
-		]
\ No newline at end of file
+		return f"SELECT {PATIENT_COLUMNS} FROM patients ORDER BY name ASC", ()
+
+	def _search_filter(self, query_text: str) -> Tuple[str, List[Any]]:
+		match = fts_query(query_text) if self._fts_enabled() else None
+		if match:
+			return "id IN (SELECT rowid FROM patients_fts WHERE patients_fts MATCH ?)", [match]
+		like = f"%{query_text.strip()}%"
+		return "(name LIKE ? OR phone LIKE ?)", [like, like]
+
+	def list_patients(self, query_text: str = "") -> List[Patient]:
+		sql, params = self._list_sql(query_text)
+		return self.db.query_models(Patient, sql, params)
+
+	def page_patients(self, query_text: str = "", page_token: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE) -> Page[Patient]:
+		"""One page of list_patients, seeking on (name, id) after ``page_token``."""
+		where: List[str] = []
+		params: List[Any] = []
+		if query_text:
+			clause, clause_params = self._search_filter(query_text)
+			where.append(clause)
+			params += clause_params
+		if page_token:
+			where.append("(name, id) > (?, ?)")
+			params += list(decode_token("patients", page_token))
+		sql = f"SELECT {PATIENT_COLUMNS} FROM patients"
+		if where:
+			sql += " WHERE " + " AND ".join(where)
+		sql += " ORDER BY name ASC, id ASC LIMIT ?"
+		params.append(page_size + 1)
+		rows = self.db.query_models(Patient, sql, params)
+		page: Page[Patient] = Page(items=rows[:page_size])
+		if len(rows) > page_size:
+			last = page.items[-1]
+			page.next_token = encode_token("patients", (last.name, last.id))
+		if page_token is None and not query_text:
+			page.estimated_total = self.db.estimate_rows("patients")
+		return page
+
+	def matches(self, patient_id: int, query_text: str) -> bool:
+		"""Whether a patient would appear in the results of a search for ``query_text``."""
+		clause, params = self._search_filter(query_text)
+		return self.db.scalar(f"SELECT 1 FROM patients WHERE id=? AND {clause}", [patient_id, *params]) is not None
+
+	def iter_patients(self, query_text: str = "", chunk_size: int = 500) -> Iterator[Patient]:
+		"""Streaming variant of list_patients for exports and incremental loaders."""
+		sql, params = self._list_sql(query_text)
+		return self.db.iter_query_models(Patient, sql, params, chunk_size)
\ No newline at end of file
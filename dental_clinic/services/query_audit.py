@@ -0,0 +1,80 @@
+"""Check that the SQL issued by the services is served by indexes.
+
+Each read path of the services is invoked with representative arguments
+while the connection traces its statements; every traced statement is then
+run through EXPLAIN QUERY PLAN. A plan step that scans a table without an
+index is reported.
+"""
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+from services.database import Database
+from services.patient_service import PatientService
+from services.appointment_service import AppointmentService
+from services.treatment_service import TreatmentService
+from services.invoice_service import InvoiceService
+from services.pagination import encode_token
+
+
+def _service_calls(db: Database) -> List[Tuple[str, Callable[[], object]]]:
+	patients = PatientService(db)
+	appointments = AppointmentService(db)
+	treatments = TreatmentService(db)
+	invoices = InvoiceService(db)
+	today = date.today().isoformat()
+	return [
+		("PatientService.get_patient", lambda: patients.get_patient(1)),
+		("PatientService.list_patients", lambda: patients.list_patients()),
+		("PatientService.list_patients(search)", lambda: patients.list_patients("smith 07")),
+		("PatientService.page_patients", lambda: patients.page_patients(page_token=encode_token("patients", ("M", 1)))),
+		("PatientService.page_patients(search)", lambda: patients.page_patients("smith", page_token=encode_token("patients", ("M", 1)))),
+		("AppointmentService.list_appointments", lambda: appointments.list_appointments(upcoming_only=True)),
+		("AppointmentService.list_appointments_for_patient", lambda: appointments.list_appointments_for_patient(1)),
+		("AppointmentService.page_appointments", lambda: appointments.page_appointments(page_token=encode_token("appointments", (today, "09:00", 1)))),
+		("AppointmentService.find_conflicts", lambda: appointments.find_conflicts(today, "09:00", 30, "Dr")),
+		("AppointmentService.find_free_slots", lambda: appointments.find_free_slots("Dr", today, today, 30)),
+		("TreatmentService.list_treatments_for_patient", lambda: treatments.list_treatments_for_patient(1)),
+		("TreatmentService.page_treatments_for_patient", lambda: treatments.page_treatments_for_patient(1, page_token=encode_token("treatments", (today, 1)))),
+		("TreatmentService.revenue_summary_by_month", lambda: treatments.revenue_summary_by_month()),
+		("InvoiceService.get_invoice", lambda: invoices.get_invoice(1)),
+		("InvoiceService.list_invoice_items", lambda: invoices.list_invoice_items(1)),
+		("InvoiceService.list_payments", lambda: invoices.list_payments(1)),
+		("InvoiceService.list_outstanding", lambda: invoices.list_outstanding()),
+		("InvoiceService.aging_report", lambda: invoices.aging_report(today)),
+		("InvoiceService.prefetch_invoices(ids)", lambda: invoices.prefetch_invoices(invoice_ids=[1, 2])),
+		("InvoiceService.prefetch_invoices(dates)", lambda: invoices.prefetch_invoices(date_from=today, date_to=today)),
+	]
+
+
+def _is_full_scan(detail: str) -> bool:
+	# "SCAN patients USING INDEX ..." is an ordered index walk; "SCAN x VIRTUAL TABLE" is FTS
+	if not detail.startswith("SCAN ") or detail.startswith("SCAN sqlite_"):
+		return False
+	return " USING " not in detail and "VIRTUAL TABLE" not in detail
+
+
+def audit_query_plans(db: Database) -> Dict[str, List[str]]:
+	"""Map each service call to the full-table-scan plan steps of its queries.
+
+	An empty list means every statement the call issued used an index.
+	"""
+	conn = db._get_connection()
+	report: Dict[str, List[str]] = {}
+	for label, call in _service_calls(db):
+		statements: List[str] = []
+		conn.set_trace_callback(statements.append)
+		try:
+			call()
+		except (IndexError, ValueError):  # empty database: e.g. get_invoice on a missing id
+			pass
+		finally:
+			conn.set_trace_callback(None)
+		scans: List[str] = []
+		for sql in statements:
+			if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+				continue
+			if "'main'." in sql:  # FTS5 reading its own shadow tables on first use
+				continue
+			scans += [f"{d}  <- {' '.join(sql.split())[:80]}" for d in db.query_plan(sql) if _is_full_scan(d)]
+		report[label] = scans
+	return report
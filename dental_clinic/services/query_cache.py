@@ -0,0 +1,117 @@
+"""Opt-in LRU cache for read query results, invalidated per table.
+
+Each table has a generation counter. A cached result remembers the
+generations of every table its query read; any write through ``Database``
+bumps the counters of the tables it touched (including tables written by
+triggers), which makes exactly the dependent entries stale. Only immutable
+rows are stored; ``Database`` builds fresh model instances on every hit.
+
+Generations only see writes made through one ``Database`` (from any of its
+threads). Commits by writers outside it, such as another process, are
+caught by ``Database`` through ``PRAGMA data_version`` and clear the whole
+cache.
+"""
+from collections import OrderedDict
+import sys
+import threading
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Tuple
+
+# Marker for "every table", used for schema changes and unknown footprints
+ALL_TABLES = "*"
+
+Snapshot = Tuple[Tuple[str, int], ...]
+
+
+def estimate_size(value: Any) -> int:
+	"""Rough in-memory size of a query result, sampling large row lists."""
+	# query_models results hold their row list in .rows
+	value = getattr(value, "rows", value)
+	if not isinstance(value, list):
+		return sys.getsizeof(value)
+	if not value:
+		return sys.getsizeof(value)
+	sample = value[:32]
+	per_row = 0
+	for row in sample:
+		slots = getattr(type(row), "__slots__", None)
+		cells = [getattr(row, s) for s in slots] if slots else list(row)
+		per_row += sys.getsizeof(row) + sum(sys.getsizeof(c) for c in cells)
+	return sys.getsizeof(value) + per_row * len(value) // len(sample)
+
+
+class QueryCache:
+	def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024) -> None:
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self._entries: "OrderedDict[Hashable, Tuple[FrozenSet[str], Snapshot, Any, int]]" = OrderedDict()
+		self._generations: Dict[str, int] = {}
+		self._epoch = 0  # bumped by ALL_TABLES invalidations
+		self._bytes = 0
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.invalidations = 0
+
+	def snapshot(self, tables: Iterable[str]) -> Snapshot:
+		"""Current generations of ``tables``; take it *before* running the query."""
+		with self._lock:
+			return ((ALL_TABLES, self._epoch),) + tuple(sorted((t, self._generations.get(t, 0)) for t in tables))
+
+	def get(self, key: Hashable) -> Tuple[bool, Any]:
+		"""(True, value) for a fresh entry, else (False, None)."""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				tables, snapshot, value, size = entry
+				if snapshot == self._snapshot_locked(tables):
+					self._entries.move_to_end(key)
+					self.hits += 1
+					return True, value
+				del self._entries[key]
+				self._bytes -= size
+				self.invalidations += 1
+			self.misses += 1
+			return False, None
+
+	def put(self, key: Hashable, tables: FrozenSet[str], snapshot: Snapshot, value: Any) -> None:
+		size = estimate_size(value)
+		if size > self.max_bytes:
+			return
+		with self._lock:
+			old = self._entries.pop(key, None)
+			if old is not None:
+				self._bytes -= old[3]
+			self._entries[key] = (tables, snapshot, value, size)
+			self._bytes += size
+			while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+				_, evicted = self._entries.popitem(last=False)
+				self._bytes -= evicted[3]
+				self.evictions += 1
+
+	def bump(self, tables: Iterable[str]) -> None:
+		with self._lock:
+			for t in tables:
+				if t == ALL_TABLES:
+					self._epoch += 1
+					self.invalidations += len(self._entries)
+					self._entries.clear()
+					self._bytes = 0
+					return
+				self._generations[t] = self._generations.get(t, 0) + 1
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"hits": self.hits,
+				"misses": self.misses,
+				"hit_rate_pct": round(100 * self.hits / lookups) if lookups else 0,
+				"evictions": self.evictions,
+				"invalidations": self.invalidations,
+				"entries": len(self._entries),
+				"bytes": self._bytes,
+			}
+
+	def _snapshot_locked(self, tables: Iterable[str]) -> Snapshot:
+		return ((ALL_TABLES, self._epoch),) + tuple(sorted((t, self._generations.get(t, 0)) for t in tables))
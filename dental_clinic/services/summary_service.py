@@ -0,0 +1,69 @@
+from typing import Dict, List, Tuple
+
+from services.database import Database
+from services.migrations import rebuild_summaries
+
+
+class SummaryService:
+	"""Reads the trigger-maintained monthly summary tables used by reports."""
+
+	def __init__(self, db: Database) -> None:
+		self.db = db
+
+	def revenue_by_month(self) -> List[Tuple[str, float]]:
+		rows = self.db.query("SELECT ym, revenue_cents FROM revenue_by_month ORDER BY ym ASC")
+		return [(r[0], r[1] / 100.0) for r in rows]
+
+	def revenue_by_type(self, ym: str = "") -> List[Tuple[str, float, int]]:
+		"""(type, revenue, treatment count), for one YYYY-MM or across all months."""
+		if ym:
+			rows = self.db.query(
+				"SELECT type, revenue_cents, treatments FROM revenue_by_month_type WHERE ym=? ORDER BY revenue_cents DESC",
+				(ym,),
+			)
+		else:
+			rows = self.db.query(
+				"""
+				SELECT type, SUM(revenue_cents), SUM(treatments) FROM revenue_by_month_type
+				GROUP BY type ORDER BY 2 DESC
+				"""
+			)
+		return [(r[0], r[1] / 100.0, r[2]) for r in rows]
+
+	def new_patients_by_month(self) -> List[Tuple[str, int]]:
+		rows = self.db.query("SELECT ym, patients FROM new_patients_by_month ORDER BY ym ASC")
+		return [(r[0], r[1]) for r in rows]
+
+	def rebuild(self) -> None:
+		with self.db.transaction() as conn:
+			rebuild_summaries(conn)
+		self.db.invalidate(("revenue_by_month", "revenue_by_month_type", "new_patients_by_month"))
+
+	def verify(self) -> Dict[str, List[str]]:
+		"""Compare each summary with a fresh aggregate; returns mismatching keys per table."""
+		checks = {
+			"revenue_by_month": (
+				"SELECT ym, revenue_cents, treatments FROM revenue_by_month",
+				"""
+				SELECT substr(date, 1, 7), SUM(CAST(round(cost * 100) AS INTEGER)), COUNT(*)
+				FROM treatments GROUP BY 1
+				""",
+			),
+			"revenue_by_month_type": (
+				"SELECT ym || ' ' || type, revenue_cents, treatments FROM revenue_by_month_type",
+				"""
+				SELECT substr(date, 1, 7) || ' ' || type, SUM(CAST(round(cost * 100) AS INTEGER)), COUNT(*)
+				FROM treatments GROUP BY substr(date, 1, 7), type
+				""",
+			),
+			"new_patients_by_month": (
+				"SELECT ym, patients FROM new_patients_by_month",
+				"SELECT substr(created_at, 1, 7), COUNT(*) FROM patients GROUP BY 1",
+			),
+		}
+		mismatches: Dict[str, List[str]] = {}
+		for table, (summary_sql, fresh_sql) in checks.items():
+			stored = {r[0]: tuple(r)[1:] for r in self.db.query(summary_sql)}
+			fresh = {r[0]: tuple(r)[1:] for r in self.db.query(fresh_sql)}
+			mismatches[table] = sorted(str(k) for k in set(stored) | set(fresh) if stored.get(k) != fresh.get(k))
+		return mismatches
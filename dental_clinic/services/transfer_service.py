@@ -0,0 +1,450 @@
+"""Streaming CSV / JSON Lines import and export for every entity.
+
+Export reads through ``Database.iter_chunks`` and writes as it goes, so a
+table is never held in memory. Import validates each row and writes
+CHUNK_SIZE rows per transaction with executemany. Ids are assigned
+explicitly, so each file's ``id`` column can be mapped to the ids rows got
+here and later files (appointments, invoices, ...) can be re-pointed at
+them. Rows that fail validation, reference an unknown parent or
+double-book a doctor are skipped and reported with their line number.
+"""
+from bisect import bisect_left
+import csv
+from dataclasses import dataclass, field
+from datetime import date as date_cls, datetime, timezone
+import json
+import math
+import os
+import time
+from contextlib import ExitStack
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from models import Appointment
+from services.appointment_service import AppointmentService, MAX_DURATION_MINUTES, slot_range
+from services.invoice_service import InvoiceService, to_cents
+from services.patient_service import PatientService
+from services.treatment_service import TreatmentService
+
+FORMATS = ("csv", "jsonl")
+CHUNK_SIZE = 10000
+MAX_INTEGER = 2 ** 63  # SQLite INTEGER is signed 64-bit
+GENDERS = ("Male", "Female", "Other")
+
+Raw = Dict[str, Any]
+Pending = Tuple[Optional[int], Tuple[Any, ...], int, Raw]  # (id in the file, insert values, line, raw row)
+
+
+# Field parsing: CSV gives strings ("" for missing), JSONL gives typed values ----
+
+def _value(raw: Raw, key: str) -> Any:
+	value = raw.get(key)
+	if isinstance(value, str):
+		value = value.strip()
+		return value or None
+	return value
+
+
+def _text(raw: Raw, key: str, required: bool = False) -> Optional[str]:
+	value = _value(raw, key)
+	if value is None:
+		if required:
+			raise ValueError(f"{key} is required")
+		return None
+	return str(value)
+
+
+def _int(raw: Raw, key: str, required: bool = False) -> Optional[int]:
+	value = _value(raw, key)
+	if value is None:
+		if required:
+			raise ValueError(f"{key} is required")
+		return None
+	try:
+		number = float(value)
+	except (TypeError, ValueError):
+		raise ValueError(f"{key} is not a number: {value!r}") from None
+	# inf and 1e400 parse as floats, but int() of them overflows
+	if not math.isfinite(number) or abs(number) >= MAX_INTEGER:
+		raise ValueError(f"{key} is out of range: {value!r}")
+	if number != int(number):
+		raise ValueError(f"{key} is not a whole number: {value!r}")
+	return int(number)
+
+
+def _money(raw: Raw, key: str, required: bool = False) -> float:
+	value = _value(raw, key)
+	if value is None:
+		if required:
+			raise ValueError(f"{key} is required")
+		return 0.0
+	try:
+		cents = to_cents(value)
+	except Exception:
+		raise ValueError(f"{key} is not an amount: {value!r}") from None
+	if cents < 0:
+		raise ValueError(f"{key} is negative")
+	return cents / 100.0
+
+
+def _date(raw: Raw, key: str) -> str:
+	value = _text(raw, key, required=True)
+	try:
+		return date_cls.fromisoformat(value).isoformat()
+	except ValueError:
+		pass
+	# Spreadsheets may add a time of day; anything else after the date is an error
+	try:
+		return datetime.fromisoformat(value).date().isoformat()
+	except ValueError:
+		raise ValueError(f"{key} is not a YYYY-MM-DD date: {value!r}") from None
+
+
+def _time(raw: Raw, key: str) -> str:
+	value = _text(raw, key, required=True)
+	try:
+		return datetime.strptime(value, "%H:%M").strftime("%H:%M")
+	except ValueError:
+		raise ValueError(f"{key} is not an HH:MM time: {value!r}") from None
+
+
+# Row validators: raw row -> values for Entity.insert_columns, or ValueError --------
+
+def _patient_values(raw: Raw, now: str) -> Tuple[Any, ...]:
+	age = _int(raw, "age")
+	if age is not None and not 0 <= age <= 150:
+		raise ValueError(f"age out of range: {age}")
+	gender = _text(raw, "gender")
+	if gender is not None:
+		gender = gender.capitalize()
+		if gender not in GENDERS:
+			raise ValueError(f"gender must be one of {', '.join(GENDERS)}")
+	created_at = _text(raw, "created_at")
+	if created_at is not None:
+		try:
+			created_at = datetime.fromisoformat(created_at).strftime("%Y-%m-%d %H:%M:%S")
+		except ValueError:
+			raise ValueError(f"created_at is not a date/time: {created_at!r}") from None
+	return (_text(raw, "name", required=True), age, gender, _text(raw, "phone"), _text(raw, "address"), created_at or now)
+
+
+def _appointment_values(raw: Raw, now: str) -> Tuple[Any, ...]:
+	day, start = _date(raw, "date"), _time(raw, "time")
+	duration = _int(raw, "duration_minutes")
+	duration = 30 if duration is None else duration
+	if not 0 < duration <= MAX_DURATION_MINUTES:
+		raise ValueError(f"duration_minutes must be between 1 and {MAX_DURATION_MINUTES}")
+	start_min, end_min = slot_range(day, start, duration)
+	return (
+		_int(raw, "patient_id", required=True), day, start, duration,
+		_text(raw, "doctor", required=True), _text(raw, "notes"), start_min, end_min,
+	)
+
+
+def _treatment_values(raw: Raw, now: str) -> Tuple[Any, ...]:
+	return (
+		_int(raw, "patient_id", required=True), _date(raw, "date"), _text(raw, "type", required=True),
+		_text(raw, "description"), _money(raw, "cost"),
+	)
+
+
+def _invoice_values(raw: Raw, now: str) -> Tuple[Any, ...]:
+	total = _money(raw, "total")
+	paid = _money(raw, "paid")
+	# InvoiceService.record_payment refuses overpayments too
+	if to_cents(paid) > to_cents(total):
+		raise ValueError("paid exceeds total")
+	# Paid amounts become a payment row after the invoice is written, like migration 7 does
+	return (_int(raw, "patient_id", required=True), _date(raw, "invoice_date"), total, 0.0, to_cents(total), paid)
+
+
+def _invoice_item_values(raw: Raw, now: str) -> Tuple[Any, ...]:
+	return (_int(raw, "invoice_id", required=True), _text(raw, "description", required=True), _money(raw, "amount", required=True))
+
+
+@dataclass(slots=True)
+class Entity:
+	name: str
+	table: str
+	columns: Tuple[str, ...]  # exported, id first
+	insert_columns: Tuple[str, ...]  # without id; the first is the parent reference when there is a parent
+	validate: Callable[[Raw, str], Tuple[Any, ...]]
+	parent: Optional[str] = None  # entity whose ids insert_columns[0] refers to
+
+
+# In dependency order: parents before children
+ENTITIES: Dict[str, Entity] = {e.name: e for e in [
+	Entity(
+		"patients", "patients", ("id", "name", "age", "gender", "phone", "address", "created_at"),
+		("name", "age", "gender", "phone", "address", "created_at"), _patient_values,
+	),
+	Entity(
+		"appointments", "appointments", ("id", "patient_id", "date", "time", "duration_minutes", "doctor", "notes"),
+		("patient_id", "date", "time", "duration_minutes", "doctor", "notes", "start_min", "end_min"), _appointment_values, "patients",
+	),
+	Entity(
+		"treatments", "treatments", ("id", "patient_id", "date", "type", "description", "cost"),
+		("patient_id", "date", "type", "description", "cost"), _treatment_values, "patients",
+	),
+	Entity(
+		"invoices", "invoices", ("id", "patient_id", "invoice_date", "total", "paid"),
+		("patient_id", "invoice_date", "total", "paid", "total_cents"), _invoice_values, "patients",
+	),
+	Entity(
+		"invoice_items", "invoice_items", ("id", "invoice_id", "description", "amount"),
+		("invoice_id", "description", "amount"), _invoice_item_values, "invoices",
+	),
+]}
+
+
+@dataclass(slots=True)
+class BadRow:
+	line: int
+	error: str
+	row: Raw
+
+
+@dataclass(slots=True)
+class ImportResult:
+	entity: str
+	inserted: int = 0
+	bad_rows: List[BadRow] = field(default_factory=list)
+	seconds: float = 0.0
+
+	def summary(self) -> str:
+		rate = self.inserted / self.seconds if self.seconds else 0.0
+		return f"{self.entity}: {self.inserted} rows in {self.seconds:.2f}s ({rate:,.0f}/s), {len(self.bad_rows)} rejected"
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+	fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+	if fmt == "json":
+		fmt = "jsonl"
+	if fmt not in FORMATS:
+		raise ValueError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+	return fmt
+
+
+def read_rows(f: IO[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+	"""(line number, row) pairs; a JSONL line that does not parse yields its error message instead of a dict."""
+	if fmt == "csv":
+		reader = csv.DictReader(f)
+		for row in reader:
+			yield reader.line_num, row
+		return
+	for line_no, line in enumerate(f, 1):
+		if not line.strip():
+			continue
+		try:
+			row = json.loads(line)
+		except ValueError as e:
+			yield line_no, f"not JSON: {e}"
+			continue
+		yield line_no, row if isinstance(row, dict) else "not a JSON object"
+
+
+def write_rows(f: IO[str], fmt: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+	count = 0
+	if fmt == "csv":
+		writer = csv.writer(f)
+		writer.writerow(columns)
+		for row in rows:
+			writer.writerow(row)
+			count += 1
+		return count
+	for row in rows:
+		f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+		f.write("\n")
+		count += 1
+	return count
+
+
+def write_bad_rows(path: str, bad_rows: Iterable[BadRow]) -> None:
+	with open(path, "w", newline="", encoding="utf-8") as f:
+		writer = csv.writer(f)
+		writer.writerow(("line", "error", "row"))
+		for bad in bad_rows:
+			writer.writerow((bad.line, bad.error, json.dumps(bad.row, ensure_ascii=False, default=str)))
+
+
+class TransferService:
+	"""Import/export over the entity services; one instance is one import session.
+
+	Ids mapped by an import stay known to the instance, so import patients
+	first and their appointments, treatments and invoices afterwards. Files
+	for an entity whose parents were not imported in the session must use
+	ids that already exist in the database.
+	"""
+
+	def __init__(
+		self,
+		patient_service: PatientService,
+		appointment_service: AppointmentService,
+		treatment_service: TreatmentService,
+		invoice_service: InvoiceService,
+	) -> None:
+		self.db = patient_service.db
+		self.patient_service = patient_service
+		self.appointment_service = appointment_service
+		self.treatment_service = treatment_service
+		self.invoice_service = invoice_service
+		self.id_maps: Dict[str, Dict[int, int]] = {}  # entity -> {id in the file: id here}
+
+	# Export ----------------------------------------------------------------
+
+	def iter_export(self, entity: str) -> Iterator[Tuple[Any, ...]]:
+		"""Rows of ``entity`` in id order, CHUNK_SIZE at a time from SQLite."""
+		spec = ENTITIES[entity]
+		for chunk in self.db.iter_chunks(f"SELECT {', '.join(spec.columns)} FROM {spec.table} ORDER BY id", chunk_size=CHUNK_SIZE):
+			yield from chunk
+
+	def export(self, entity: str, f: IO[str], fmt: str) -> int:
+		return write_rows(f, fmt, ENTITIES[entity].columns, self.iter_export(entity))
+
+	def export_file(self, entity: str, path: str, fmt: Optional[str] = None) -> int:
+		fmt = detect_format(path, fmt)
+		tmp = f"{path}.part"
+		try:
+			with open(tmp, "w", newline="", encoding="utf-8") as f:
+				count = self.export(entity, f, fmt)
+			os.replace(tmp, path)
+		finally:
+			if os.path.exists(tmp):
+				os.remove(tmp)
+		return count
+
+	# Import ----------------------------------------------------------------
+
+	def import_file(self, entity: str, path: str, fmt: Optional[str] = None, progress: Optional[Callable[[int], None]] = None) -> ImportResult:
+		fmt = detect_format(path, fmt)
+		# utf-8-sig: spreadsheets often save CSV with a byte order mark
+		with open(path, newline="", encoding="utf-8-sig") as f:
+			return self.import_rows(entity, read_rows(f, fmt), progress)
+
+	def import_rows(self, entity: str, rows: Iterable[Tuple[int, Any]], progress: Optional[Callable[[int], None]] = None) -> ImportResult:
+		"""Validate and insert (line, row) pairs; ``progress(rows inserted so far)`` runs after each chunk."""
+		spec = ENTITIES[entity]
+		result = ImportResult(entity)
+		started = time.perf_counter()
+		now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+		id_map = self.id_maps.setdefault(entity, {})
+		chunk: List[Pending] = []
+		seen: Set[int] = set()
+		try:
+			for line, raw in rows:
+				if not isinstance(raw, dict):
+					result.bad_rows.append(BadRow(line, raw, {}))
+					continue
+				try:
+					source_id = _int(raw, "id")
+					if source_id is not None and (source_id in seen or source_id in id_map):
+						raise ValueError(f"duplicate id {source_id}")
+					chunk.append((source_id, spec.validate(raw, now), line, raw))
+					if source_id is not None:
+						seen.add(source_id)
+				except (ValueError, OverflowError) as e:
+					result.bad_rows.append(BadRow(line, str(e), raw))
+					continue
+				if len(chunk) >= CHUNK_SIZE:
+					self._write_chunk(spec, chunk, id_map, result)
+					chunk = []
+					if progress:
+						progress(result.inserted)
+			if chunk:
+				self._write_chunk(spec, chunk, id_map, result)
+				if progress:
+					progress(result.inserted)
+		finally:
+			result.seconds = time.perf_counter() - started
+			# Unknown parents are found per chunk, after that chunk's validation errors
+			result.bad_rows.sort(key=lambda bad: bad.line)
+			if result.inserted:
+				self._notify(entity)
+		return result
+
+	def _resolve_parents(self, spec: Entity, chunk: List[Pending], result: ImportResult) -> List[Pending]:
+		"""Swap file parent ids for ids here; rows whose parent is unknown become bad rows."""
+		if spec.parent is None:
+			return chunk
+		parent_map = self.id_maps.get(spec.parent)
+		if parent_map is None:
+			# Parents were not imported in this session: the ids must already exist here
+			existing = self._existing_ids(ENTITIES[spec.parent].table, {values[0] for _s, values, _l, _r in chunk})
+			parent_map = {i: i for i in existing}
+		resolved = []
+		for source_id, values, line, raw in chunk:
+			parent_id = parent_map.get(values[0])
+			if parent_id is None:
+				result.bad_rows.append(BadRow(line, f"unknown {spec.insert_columns[0]} {values[0]}", raw))
+				continue
+			resolved.append((source_id, (parent_id, *values[1:]), line, raw))
+		return resolved
+
+	def _reject_overlaps(self, chunk: List[Pending], result: ImportResult) -> List[Pending]:
+		"""Appointments that double-book a doctor become bad rows.
+
+		Each row is checked against the database (earlier chunks included) with
+		find_conflicts_batch, then against the rows before it in this chunk.
+		Runs under the chunk's write lock, so nothing can be booked in between.
+		"""
+		slots = [Appointment(None, *values[:6]) for _s, values, _l, _r in chunk]
+		clashes = self.appointment_service.find_conflicts_batch(slots)
+		booked: Dict[str, Tuple[List[int], List[Tuple[int, int]]]] = {}  # doctor -> sorted starts, (end, line) per start
+		accepted = []
+		for i, (source_id, values, line, raw) in enumerate(chunk):
+			if i in clashes:
+				a = clashes[i][0]
+				result.bad_rows.append(BadRow(line, f"overlaps appointment {a.id} ({a.date} {a.time}, {a.doctor})", raw))
+				continue
+			doctor, start, end = values[4], values[6], values[7]
+			starts, spans = booked.setdefault(doctor, ([], []))
+			# Accepted slots never overlap, so only the last one starting before ``end`` can
+			j = bisect_left(starts, end)
+			if j and spans[j - 1][0] > start:
+				result.bad_rows.append(BadRow(line, f"overlaps line {spans[j - 1][1]} ({doctor})", raw))
+				continue
+			starts.insert(j, start)
+			spans.insert(j, (end, line))
+			accepted.append((source_id, values, line, raw))
+		return accepted
+
+	def _existing_ids(self, table: str, ids: Set[int]) -> Set[int]:
+		rows = self.db.iter_chunks(f"SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(sorted(ids)),))
+		return {r[0] for chunk in rows for r in chunk}
+
+	def _write_chunk(self, spec: Entity, chunk: List[Pending], id_map: Dict[int, int], result: ImportResult) -> None:
+		rows = self._resolve_parents(spec, chunk, result)
+		if not rows:
+			return
+		with ExitStack() as stack:
+			stack.enter_context(self.db.transaction())
+			if spec.name == "patients":
+				stack.enter_context(self.patient_service.deferred_search_index())
+			if spec.name == "appointments":
+				rows = self._reject_overlaps(rows, result)
+			# The write lock is held, so nobody else can take these ids
+			first_id = 1 + int(self.db.scalar(
+				f"SELECT max(COALESCE((SELECT seq FROM sqlite_sequence WHERE name=?), 0), COALESCE((SELECT MAX(id) FROM {spec.table}), 0))",
+				(spec.table,),
+			))
+			if spec.name == "invoices":
+				values = [(first_id + i, *v[:-1]) for i, (_s, v, _l, _r) in enumerate(rows)]
+				payments = [(first_id + i, v[1], to_cents(v[-1]), "imported") for i, (_s, v, _l, _r) in enumerate(rows) if v[-1] > 0]
+			else:
+				values = [(first_id + i, *v) for i, (_s, v, _l, _r) in enumerate(rows)]
+				payments = []
+			self.db.bulk_insert(spec.table, ("id", *spec.insert_columns), values)
+			if payments:
+				self.db.bulk_insert("payments", ("invoice_id", "date", "amount_cents", "note"), payments)
+		for i, (source_id, _v, _l, _r) in enumerate(rows):
+			if source_id is not None:
+				id_map[source_id] = first_id + i
+		result.inserted += len(rows)
+
+	def _notify(self, entity: str) -> None:
+		service = {
+			"patients": self.patient_service,
+			"appointments": self.appointment_service,
+			"treatments": self.treatment_service,
+		}.get(entity)
+		if service is not None:
+			service.notify_reload()
@@ -1,18 +1,35 @@
-from typing import List, Optional, Tuple
+from typing import Any, Iterable, List, Optional, Tuple
 
 from services.database import Database
 from models import Treatment
+from services.events import DELETED, INSERTED, RELOAD, UPDATED, Observable
+from services.pagination import DEFAULT_PAGE_SIZE, Page, decode_token, encode_token
 
+TREATMENT_COLUMNS = "id, patient_id, date, type, description, cost"
 
-class TreatmentService:
+
+class TreatmentService(Observable):
 	def __init__(self, db: Database) -> None:
+		super().__init__("treatment")
 		self.db = db
 
 	def add_treatment(self, treatment: Treatment) -> int:
-		return self.db.execute(
+		treatment_id = self.db.execute(
 			"INSERT INTO treatments(patient_id, date, type, description, cost) VALUES(?,?,?,?,?)",
 			(treatment.patient_id, treatment.date, treatment.type, treatment.description, treatment.cost),
 		)
+		self._notify(INSERTED, treatment_id)
+		return treatment_id
+
+	def add_treatments(self, treatments: Iterable[Treatment]) -> int:
+		"""Insert many treatments in one transaction; returns the number of rows written."""
+		count = self.db.bulk_insert(
+			"treatments",
+			("patient_id", "date", "type", "description", "cost"),
+			((t.patient_id, t.date, t.type, t.description, t.cost) for t in treatments),
+		)
+		self._notify(RELOAD)
+		return count
 
 	def update_treatment(self, treatment: Treatment) -> None:
 		assert treatment.id is not None
@@ -23,21 +40,41 @@ class TreatmentService:
 			""",
 			(treatment.patient_id, treatment.date, treatment.type, treatment.description, treatment.cost, treatment.id),
 		)
+		self._notify(UPDATED, treatment.id)
 
 	def delete_treatment(self, treatment_id: int) -> None:
 		self.db.execute("DELETE FROM treatments WHERE id=?", (treatment_id,))
+		self._notify(DELETED, treatment_id)
+
+	def get_treatment(self, treatment_id: int) -> Optional[Treatment]:
+		rows = self.db.query_models(Treatment, f"SELECT {TREATMENT_COLUMNS} FROM treatments WHERE id=?", (treatment_id,))
+		return rows[0] if rows else None
 
 	def list_treatments_for_patient(self, patient_id: int) -> List[Treatment]:
-		rows = self.db.query("SELECT * FROM treatments WHERE patient_id=? ORDER BY date DESC", (patient_id,))
-		return [
-			Treatment(
-				id=r["id"], patient_id=r["patient_id"], date=r["date"], type=r["type"], description=r["description"], cost=r["cost"]
-			)
-			for r in rows
-		]
+		return self.db.query_models(
+			Treatment, f"SELECT {TREATMENT_COLUMNS} FROM treatments WHERE patient_id=? ORDER BY date DESC", (patient_id,)
+		)
+
+	def page_treatments_for_patient(self, patient_id: int, page_token: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE) -> Page[Treatment]:
+		"""Newest first, seeking on (date, id) below ``page_token``."""
+		sql = f"SELECT {TREATMENT_COLUMNS} FROM treatments WHERE patient_id=?"
+		params: List[Any] = [patient_id]
+		if page_token:
+			sql += " AND (date, id) < (?, ?)"
+			params += list(decode_token("treatments", page_token))
+		sql += " ORDER BY date DESC, id DESC LIMIT ?"
+		params.append(page_size + 1)
+		rows = self.db.query_models(Treatment, sql, params)
+		page: Page[Treatment] = Page(items=rows[:page_size])
+		if len(rows) > page_size:
+			last = page.items[-1]
+			page.next_token = encode_token("treatments", (last.date, last.id))
+		if page_token is None:
+			# Counting one patient's treatments is a bounded range on idx_treatments_patient_date
+			page.estimated_total = int(self.db.scalar("SELECT COUNT(*) FROM treatments WHERE patient_id=?", (patient_id,)) or 0)
+		return page
 
 	def revenue_summary_by_month(self) -> List[Tuple[str, float]]:
-		rows = self.db.query(
-			"SELECT substr(date,1,7) AS ym, SUM(cost) FROM treatments GROUP BY ym ORDER BY ym ASC"
-		)
-		return [(r["ym"], r[1] if r[1] is not None else 0.0) for r in rows]
\ No newline at end of file
+		# Maintained by triggers on treatments (see migrations._monthly_summaries)
+		rows = self.db.query("SELECT ym, revenue_cents FROM revenue_by_month ORDER BY ym ASC")
+		return [(r["ym"], r["revenue_cents"] / 100.0) for r in rows]
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The application uses script-style imports (services.*, models) rooted at dental_clinic/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,56 @@
+import sqlite3
+import threading
+
+import pytest
+
+from models import Appointment
+from services.appointment_service import AppointmentService
+from services.database import Database
+from services.patient_service import PatientService
+
+
+@pytest.fixture
+def db(tmp_path):
+	database = Database(str(tmp_path / "clinic.db"))
+	database.initialize_schema()
+	database.enable_cache()
+	database.execute("INSERT INTO patients(name) VALUES('Ann')")
+	return database
+
+
+def on_thread(fn):
+	result = []
+	thread = threading.Thread(target=lambda: result.append(fn()))
+	thread.start()
+	thread.join()
+	return result[0]
+
+
+def test_own_write_on_another_thread_keeps_unrelated_entries(db):
+	patients = PatientService(db)
+	on_thread(patients.list_patients)
+	# A write on this thread, then a read of an untouched table on a worker thread
+	AppointmentService(db).create_appointment(Appointment(None, 1, "2030-01-02", "10:00", 30, "Dr A", None))
+	before = db.cache_stats()
+	assert [p.name for p in on_thread(patients.list_patients)] == ["Ann"]
+	after = db.cache_stats()
+	assert after["hits"] == before["hits"] + 1
+	assert after["invalidations"] == before["invalidations"]
+
+
+def test_own_write_invalidates_its_tables_across_threads(db):
+	patients = PatientService(db)
+	on_thread(patients.list_patients)
+	db.execute("INSERT INTO patients(name) VALUES('Bob')")
+	assert [p.name for p in on_thread(patients.list_patients)] == ["Ann", "Bob"]
+
+
+def test_foreign_write_drops_every_entry(db):
+	patients = PatientService(db)
+	patients.list_patients()
+	other = sqlite3.connect(db.db_path)
+	other.execute("INSERT INTO patients(name) VALUES('Cy')")
+	other.commit()
+	other.close()
+	assert [p.name for p in on_thread(patients.list_patients)] == ["Ann", "Cy"]
+	assert db.cache_stats()["entries"] == 1
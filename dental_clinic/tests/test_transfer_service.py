@@ -0,0 +1,75 @@
+import io
+
+import pytest
+
+from services.appointment_service import AppointmentService
+from services.database import Database
+from services.invoice_service import InvoiceService
+from services.patient_service import PatientService
+from services.transfer_service import TransferService, read_rows
+from services.treatment_service import TreatmentService
+
+
+@pytest.fixture
+def transfer(tmp_path):
+	db = Database(str(tmp_path / "clinic.db"))
+	db.initialize_schema()
+	return TransferService(PatientService(db), AppointmentService(db), TreatmentService(db), InvoiceService(db))
+
+
+def import_csv(transfer, entity, text):
+	return transfer.import_rows(entity, read_rows(io.StringIO(text), "csv"))
+
+
+def rejected(result):
+	return [(bad.line, bad.error) for bad in result.bad_rows]
+
+
+@pytest.fixture
+def patient(transfer):
+	import_csv(transfer, "patients", "id,name\n1,Ann\n")
+	return 1
+
+
+def test_rejects_numbers_that_overflow(transfer):
+	result = import_csv(transfer, "patients", "id,name,age\n1,Ann,30\n2,Bob,inf\n3,Cy,1e400\n")
+	assert result.inserted == 1
+	assert [line for line, _ in rejected(result)] == [3, 4]
+
+
+def test_rejects_dates_with_trailing_text(transfer, patient):
+	result = import_csv(
+		transfer, "treatments",
+		"patient_id,date,type,cost\n1,2024-01-01,Filling,10\n1,2024-01-01garbage,Filling,10\n1,2024-01-02 09:30,Filling,10\n",
+	)
+	assert result.inserted == 2
+	assert rejected(result) == [(3, "date is not a YYYY-MM-DD date: '2024-01-01garbage'")]
+
+
+def test_rejects_unknown_parent(transfer, patient):
+	result = import_csv(transfer, "treatments", "patient_id,date,type\n1,2024-01-01,Filling\n7,2024-01-01,Filling\n")
+	assert result.inserted == 1
+	assert rejected(result) == [(3, "unknown patient_id 7")]
+
+
+def test_rejects_double_bookings(transfer, patient):
+	result = import_csv(
+		transfer, "appointments",
+		"patient_id,date,time,duration_minutes,doctor\n1,2030-01-01,10:00,30,Dr A\n1,2030-01-01,10:15,30,Dr A\n1,2030-01-01,10:15,30,Dr B\n",
+	)
+	assert result.inserted == 2
+	assert rejected(result) == [(3, "overlaps line 2 (Dr A)")]
+
+
+def test_rejects_invoice_paid_over_total(transfer, patient):
+	result = import_csv(transfer, "invoices", "patient_id,invoice_date,total,paid\n1,2024-01-01,100,40\n1,2024-01-01,100,120\n")
+	assert result.inserted == 1
+	assert rejected(result) == [(3, "paid exceeds total")]
+	assert transfer.invoice_service.balance_cents(1) == 6000
+
+
+def test_rejects_invoice_item_without_amount(transfer, patient):
+	import_csv(transfer, "invoices", "id,patient_id,invoice_date,total\n1,1,2024-01-01,10\n")
+	result = import_csv(transfer, "invoice_items", "invoice_id,description,amount\n1,Filling,10\n1,Nothing,\n")
+	assert result.inserted == 1
+	assert rejected(result) == [(3, "amount is required")]
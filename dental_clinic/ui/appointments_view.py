@@ -1,20 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from typing import Optional
+from datetime import date as date_cls, timedelta
+from typing import Dict, List, Optional, Tuple
 
-from models import Appointment, Patient
+from models import Appointment, AppointmentSeries, Patient
+from services.events import DELETED, RELOAD, UPDATED, ChangeEvent
 from services.patient_service import PatientService
 from services.appointment_service import AppointmentService
+from ui.task_runner import TaskRunner
+from ui.tree_sync import TreeSync
+
+LOAD_TASK = "appointments.load"
+FORM_TASK = "appointments.form"
+SLOTS_TASK = "appointments.slots"
 
 
 class AppointmentsView(ttk.Frame):
-	def __init__(self, parent, patient_service: PatientService, appointment_service: AppointmentService) -> None:
+	def __init__(self, parent, patient_service: PatientService, appointment_service: AppointmentService, tasks: TaskRunner) -> None:
 		super().__init__(parent)
 		self.patient_service = patient_service
 		self.appointment_service = appointment_service
+		self.tasks = tasks
+		self._filter_patient: Optional[int] = None
+		self._patient_of: Dict[int, int] = {}
+		self._names: Dict[int, str] = {}
 
 		self._build_ui()
-		self.refresh()
+		self.appointment_service.subscribe(self.tasks.ui_listener(self._on_appointment_changed))
+		self.patient_service.subscribe(self.tasks.ui_listener(self._on_patient_changed))
 
 	def _build_ui(self) -> None:
 		top = ttk.Frame(self)
@@ -33,14 +46,92 @@ class AppointmentsView(ttk.Frame):
 			self.tree.column(c, width=120, anchor=tk.W)
 		self.tree.column("notes", width=260)
 		self.tree.pack(fill=tk.BOTH, expand=True, padx=8, pady=(0, 8))
+		# Same (date, time) order as list_appointments
+		self.rows = TreeSync(self.tree, sort_key=lambda v: (v[2], v[3]))
 
 	def refresh(self) -> None:
-		for i in self.tree.get_children(""):
-			self.tree.delete(i)
-		rows = self.appointment_service.list_appointments()
-		patient_cache = {p.id: p.name for p in self.patient_service.list_patients()}
+		self._filter_patient = None
+		self._reload()
+
+	def _reload(self) -> None:
+		self.tasks.submit(self._fetch, self._filter_patient, on_done=self._show_all, key=LOAD_TASK)
+
+	def _fetch(self, patient_id: Optional[int]) -> Tuple[List[Appointment], Dict[int, str]]:
+		"""Appointments to list and the names of their patients (worker thread)."""
+		if patient_id is None:
+			rows = self.appointment_service.list_appointments()
+			return rows, {p.id: p.name for p in self.patient_service.list_patients()}
+		rows = self.appointment_service.list_appointments_for_patient(patient_id)
+		patient = self.patient_service.get_patient(patient_id)
+		return rows, {patient.id: patient.name} if patient else {}
+
+	def _show_all(self, result: Tuple[List[Appointment], Dict[int, str]]) -> None:
+		rows, self._names = result
+		self.rows.clear()
+		self._patient_of.clear()
 		for a in rows:
-			self.tree.insert("", tk.END, values=(a.id, patient_cache.get(a.patient_id, a.patient_id), a.date, a.time, a.duration_minutes, a.doctor, a.notes or ""))
+			self._show(a)
+
+	def _row_values(self, a: Appointment) -> Tuple:
+		return (a.id, self._names.get(a.patient_id, a.patient_id), a.date, a.time, a.duration_minutes, a.doctor, a.notes or "")
+
+	def _show(self, a: Appointment) -> None:
+		self._patient_of[a.id] = a.patient_id
+		self.rows.upsert(a.id, self._row_values(a))
+
+	def _hide(self, appointment_id: int) -> None:
+		self._patient_of.pop(appointment_id, None)
+		self.rows.remove(appointment_id)
+
+	def _on_appointment_changed(self, event: ChangeEvent) -> None:
+		if event.kind == RELOAD or self.tasks.pending(LOAD_TASK):
+			self._reload()
+			return
+		row_task = f"appointments.row.{event.id}"
+		if event.kind == DELETED:
+			self.tasks.cancel(row_task)
+			self._hide(event.id)
+			return
+		self.tasks.submit(
+			self._fetch_one, event.id, self._filter_patient, set(self._names),
+			on_done=lambda result: self._apply_appointment(event.id, result), key=row_task,
+		)
+
+	def _fetch_one(self, appointment_id: int, patient_id: Optional[int], known: set) -> Tuple[Optional[Appointment], Optional[Patient]]:
+		"""The appointment if it belongs in the listing, plus its patient when not yet named (worker thread)."""
+		a = self.appointment_service.get_appointment(appointment_id)
+		if a is None or (patient_id is not None and a.patient_id != patient_id):
+			return None, None
+		return a, None if a.patient_id in known else self.patient_service.get_patient(a.patient_id)
+
+	def _apply_appointment(self, appointment_id: int, result: Tuple[Optional[Appointment], Optional[Patient]]) -> None:
+		a, patient = result
+		if patient is not None:
+			self._names[patient.id] = patient.name
+		if a is None:
+			self._hide(appointment_id)
+		else:
+			self._show(a)
+
+	def _on_patient_changed(self, event: ChangeEvent) -> None:
+		if event.kind == RELOAD:
+			self._reload()
+		elif event.kind == DELETED:
+			# The cascade in delete_patient removes appointments without per-row events
+			self._names.pop(event.id, None)
+			for aid in [aid for aid, pid in self._patient_of.items() if pid == event.id]:
+				self._hide(aid)
+		elif event.kind == UPDATED and event.id in self._names:
+			self.tasks.submit(self.patient_service.get_patient, event.id, on_done=self._rename_patient, key=f"appointments.patient.{event.id}")
+
+	def _rename_patient(self, patient: Optional[Patient]) -> None:
+		if patient is None:
+			return
+		self._names[patient.id] = patient.name
+		for aid, pid in list(self._patient_of.items()):
+			if pid == patient.id:
+				v = self.rows.values(aid)
+				self.rows.upsert(aid, (v[0], patient.name) + v[2:])
 
 	def _on_add(self) -> None:
 		self._open_form()
@@ -51,9 +142,7 @@ class AppointmentsView(ttk.Frame):
 			messagebox.showwarning("Edit Appointment", "Select an appointment to edit.")
 			return
 		v = self.tree.item(item, "values")
-		# Need to map back to patient_id from name. Do a lookup.
-		patients = self.patient_service.list_patients()
-		patient_id = next((p.id for p in patients if p.name == v[1]), None)
+		patient_id = self._patient_of.get(int(v[0]))
 		appt = Appointment(id=int(v[0]), patient_id=patient_id or 0, date=v[2], time=v[3], duration_minutes=int(v[4]), doctor=v[5], notes=v[6])
 		self._open_form(appt)
 
@@ -65,14 +154,16 @@ class AppointmentsView(ttk.Frame):
 		v = self.tree.item(item, "values")
 		if messagebox.askyesno("Confirm", "Delete selected appointment?"):
 			self.appointment_service.delete_appointment(int(v[0]))
-			self.refresh()
 
 	def _open_form(self, appt: Optional[Appointment] = None) -> None:
+		# The dialog opens once its patient choices have loaded on a worker
+		self.tasks.submit(self.patient_service.list_patients, on_done=lambda patients: self._show_form(patients, appt), key=FORM_TASK)
+
+	def _show_form(self, patients: List[Patient], appt: Optional[Appointment] = None) -> None:
 		dlg = tk.Toplevel(self)
 		dlg.title("Appointment" + (" - Edit" if appt else " - Add"))
 		dlg.grab_set()
 
-		patients = self.patient_service.list_patients()
 		patient_names = [p.name for p in patients]
 		patient_name_to_id = {p.name: p.id for p in patients}
 
@@ -103,8 +194,69 @@ class AppointmentsView(ttk.Frame):
 		entry_notes = ttk.Entry(form, textvariable=notes_var)
 		entry_notes.grid(row=5, column=1, sticky=tk.EW, pady=4, padx=4)
 
+		# Free slots for the doctor over the week starting at the entered date
+		ttk.Label(form, text="Free slots").grid(row=6, column=0, sticky=tk.W, pady=4, padx=4)
+		slots_var = tk.StringVar()
+		slots_combo = ttk.Combobox(form, textvariable=slots_var, state="readonly")
+		slots_combo.grid(row=6, column=1, sticky=tk.EW, pady=4, padx=4)
+		find_btn = ttk.Button(form, text="Find", command=lambda: on_find_slots())
+		find_btn.grid(row=6, column=2, pady=4, padx=4)
+		found_slots: list = []
+
+		# Recurrence (new appointments only)
+		repeat_var = tk.StringVar(value="none")
+		interval_var = tk.StringVar(value="1")
+		count_var = tk.StringVar()
+		until_var = tk.StringVar()
+		skip_var = tk.StringVar()
+		if not appt:
+			repeat_labels = ["Repeat", "Every (n)", "Occurrences", "Until (YYYY-MM-DD)", "Skip dates (comma-separated)"]
+			for i, label in enumerate(repeat_labels, start=7):
+				ttk.Label(form, text=label).grid(row=i, column=0, sticky=tk.W, pady=4, padx=4)
+			ttk.Combobox(form, values=["none", "daily", "weekly", "monthly"], textvariable=repeat_var, state="readonly").grid(row=7, column=1, sticky=tk.EW, pady=4, padx=4)
+			for row, var in ((8, interval_var), (9, count_var), (10, until_var), (11, skip_var)):
+				ttk.Entry(form, textvariable=var).grid(row=row, column=1, sticky=tk.EW, pady=4, padx=4)
+
 		form.columnconfigure(1, weight=1)
 
+		def on_find_slots() -> None:
+			try:
+				doctor = doctor_var.get().strip()
+				if not doctor:
+					raise ValueError("Enter a doctor first")
+				start = date_cls.fromisoformat(date_var.get().strip() or date_cls.today().isoformat())
+				end = start + timedelta(days=6)
+				duration = int(duration_var.get().strip() or 30)
+			except Exception as e:
+				messagebox.showerror("Free Slots", str(e), parent=dlg)
+				return
+			find_btn.state(["disabled"])
+			self.tasks.submit(
+				self.appointment_service.find_free_slots, doctor, start.isoformat(), end.isoformat(), duration,
+				on_done=show_slots, on_error=slots_failed, key=SLOTS_TASK,
+			)
+
+		def show_slots(slots: List[Tuple[str, str, int]]) -> None:
+			if not dlg.winfo_exists():
+				return
+			find_btn.state(["!disabled"])
+			found_slots[:] = slots
+			slots_combo["values"] = [f"{d} {t} ({free} min free)" for d, t, free in found_slots]
+			slots_var.set("" if found_slots else "No free slots this week")
+
+		def slots_failed(error: BaseException) -> None:
+			if dlg.winfo_exists():
+				find_btn.state(["!disabled"])
+				messagebox.showerror("Free Slots", str(error), parent=dlg)
+
+		def on_slot_selected(_event=None) -> None:
+			idx = slots_combo.current()
+			if 0 <= idx < len(found_slots):
+				date_var.set(found_slots[idx][0])
+				time_var.set(found_slots[idx][1])
+
+		slots_combo.bind("<<ComboboxSelected>>", on_slot_selected)
+
 		btns = ttk.Frame(dlg)
 		btns.pack(pady=8)
 		ok = ttk.Button(btns, text="Save", command=lambda: on_save())
@@ -127,20 +279,26 @@ class AppointmentsView(ttk.Frame):
 				if appt:
 					upd = Appointment(id=appt.id, patient_id=pid, date=date, time=time, duration_minutes=duration, doctor=doctor, notes=notes)
 					self.appointment_service.update_appointment(upd)
+				elif repeat_var.get() != "none":
+					count_txt = count_var.get().strip()
+					series = AppointmentSeries(
+						id=None, patient_id=pid, start_date=date, time=time, duration_minutes=duration, doctor=doctor, notes=notes,
+						frequency=repeat_var.get(), interval=int(interval_var.get().strip() or 1),
+						count=int(count_txt) if count_txt else None, until=until_var.get().strip() or None,
+						exceptions=[d.strip() for d in skip_var.get().split(",") if d.strip()],
+					)
+					result = self.appointment_service.create_series(series)
+					if result.conflicts:
+						clashes = "\n".join(sorted(result.conflicts))
+						messagebox.showwarning("Recurring Appointments", f"Booked {len(result.created)} visits. Skipped conflicting dates:\n{clashes}", parent=dlg)
 				else:
 					new_appt = Appointment(id=None, patient_id=pid, date=date, time=time, duration_minutes=duration, doctor=doctor, notes=notes)
 					self.appointment_service.create_appointment(new_appt)
 				dlg.destroy()
-				self.refresh()
 			except Exception as e:
 				messagebox.showerror("Save Appointment", str(e))
 
 	def focus_patient(self, patient_id: int) -> None:
 		# Filter to this patient's appointments
-		for i in self.tree.get_children(""):
-			self.tree.delete(i)
-		rows = self.appointment_service.list_appointments_for_patient(patient_id)
-		patient = self.patient_service.get_patient(patient_id)
-		name = patient.name if patient else str(patient_id)
-		for a in rows:
-			self.tree.insert("", tk.END, values=(a.id, name, a.date, a.time, a.duration_minutes, a.doctor, a.notes or ""))
\ No newline at end of file
+		self._filter_patient = patient_id
+		self._reload()
\ No newline at end of file
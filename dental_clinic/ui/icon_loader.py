@@ -1,6 +1,20 @@
-from typing import Dict
-from PIL import Image, ImageDraw, ImageTk
+"""Navbar and button icons, drawn with PIL once and cached on disk as a sprite atlas.
+
+The atlas is a PNG with one row per size and one column per icon. Its file
+name is a hash of everything that affects the pixels (icon set, palette,
+sizes, DPI scale and the source of ``icon_drawers``), so editing a drawer
+or a colour simply produces a new file. Tk reads the PNG and slices it
+itself, which keeps PIL out of the import path on every start after the first.
+"""
+import hashlib
+import importlib.util
+import os
+import sys
 import tkinter as tk
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ICON_SET = "default"
+SIZES = (16, 18, 24, 32)
 
 
 _DEF_COLORS = {
@@ -14,114 +28,117 @@ _DEF_COLORS = {
 }
 
 
-def _new_canvas(size: int) -> Image.Image:
-	img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
-	return img
-
-
-def _draw_patients(size: int, color: str) -> Image.Image:
-	img = _new_canvas(size)
-	d = ImageDraw.Draw(img)
-	# Two simple heads and shoulders
-	r = size // 5
-	d.ellipse((size*0.18 - r, size*0.30 - r, size*0.18 + r, size*0.30 + r), outline=color, width=max(1, size//18))
-	d.ellipse((size*0.52 - r, size*0.30 - r, size*0.52 + r, size*0.30 + r), outline=color, width=max(1, size//18))
-	d.rounded_rectangle((size*0.07, size*0.50, size*0.63, size*0.85), radius=size//10, outline=color, width=max(1, size//18))
-	return img
-
-
-def _draw_calendar(size: int, color: str) -> Image.Image:
-	img = _new_canvas(size)
-	d = ImageDraw.Draw(img)
-	pad = size*0.12
-	d.rectangle((pad, pad*0.9, size-pad, size-pad), outline=color, width=max(1, size//18))
-	d.line((pad, pad*1.6, size-pad, pad*1.6), fill=color, width=max(1, size//22))
-	# Rings
-	d.line((size*0.35, pad*0.5, size*0.35, pad*1.0), fill=color, width=max(1, size//18))
-	d.line((size*0.65, pad*0.5, size*0.65, pad*1.0), fill=color, width=max(1, size//18))
-	return img
-
-
-def _draw_cross(size: int, color: str) -> Image.Image:
-	img = _new_canvas(size)
-	d = ImageDraw.Draw(img)
-	w = max(2, size//6)
-	cx = cy = size/2
-	d.line((cx - size*0.32, cy, cx + size*0.32, cy), fill=color, width=w)
-	d.line((cx, cy - size*0.32, cx, cy + size*0.32), fill=color, width=w)
-	return img
-
-
-def _draw_chart(size: int, color: str) -> Image.Image:
-	img = _new_canvas(size)
-	d = ImageDraw.Draw(img)
-	pad = size*0.15
-	# axes
-	d.line((pad, size - pad, size - pad, size - pad), fill=color, width=max(1, size//20))
-	d.line((pad, size - pad, pad, pad), fill=color, width=max(1, size//20))
-	# line
-	points = [
-		(pad, size - pad*1.4),
-		(size*0.45, size*0.55),
-		(size*0.65, size*0.40),
-		(size - pad, size*0.30),
-	]
-	d.line(points, fill=color, width=max(1, size//18), joint="curve")
-	return img
-
-
-def _draw_magnifier(size: int, color: str) -> Image.Image:
-	img = _new_canvas(size)
-	d = ImageDraw.Draw(img)
-	r = size*0.28
-	cx = cy = size*0.45
-	d.ellipse((cx - r, cy - r, cx + r, cy + r), outline=color, width=max(1, size//18))
-	d.line((cx + r*0.6, cy + r*0.6, size*0.92, size*0.92), fill=color, width=max(1, size//18))
-	return img
-
-
-def _draw_backup(size: int, color: str) -> Image.Image:
-	img = _new_canvas(size)
-	d = ImageDraw.Draw(img)
-	pad = size*0.18
-	# box
-	d.rectangle((pad, size*0.55, size-pad, size-pad), outline=color, width=max(1, size//18))
-	# arrow up
-	arrow = [
-		(size*0.5, size*0.15), (size*0.75, size*0.40), (size*0.60, size*0.40), (size*0.60, size*0.62), (size*0.40, size*0.62), (size*0.40, size*0.40), (size*0.25, size*0.40)
-	]
-	d.line(arrow + [arrow[0]], fill=color, width=max(1, size//20))
-	return img
-
-
-def _draw_restore(size: int, color: str) -> Image.Image:
-	img = _new_canvas(size)
-	d = ImageDraw.Draw(img)
-	pad = size*0.18
-	# box
-	d.rectangle((pad, size*0.15, size-pad, size*0.45), outline=color, width=max(1, size//18))
-	# arrow down
-	arrow = [
-		(size*0.5, size*0.85), (size*0.75, size*0.60), (size*0.60, size*0.60), (size*0.60, size*0.38), (size*0.40, size*0.38), (size*0.40, size*0.60), (size*0.25, size*0.60)
-	]
-	d.line(arrow + [arrow[0]], fill=color, width=max(1, size//20))
-	return img
-
-
-_DRAWERS = {
-	"patients": _draw_patients,
-	"appointments": _draw_calendar,
-	"treatments": _draw_cross,
-	"reports": _draw_chart,
-	"search": _draw_magnifier,
-	"backup": _draw_backup,
-	"restore": _draw_restore,
-}
-
-
-def load_icons(root: tk.Misc, size: int = 18) -> Dict[str, ImageTk.PhotoImage]:
-	icons: Dict[str, ImageTk.PhotoImage] = {}
-	for name, drawer in _DRAWERS.items():
-		img = drawer(size, _DEF_COLORS.get(name, "#444"))
-		icons[name] = ImageTk.PhotoImage(img, master=root)
-	return icons
\ No newline at end of file
+def dpi_scale(root: tk.Misc) -> float:
+	"""Screen scale relative to 96 DPI, rounded to quarter steps (1.0, 1.25, 1.5, ...)."""
+	try:
+		pixels_per_point = float(root.tk.call("tk", "scaling"))
+	except (tk.TclError, ValueError):
+		return 1.0
+	return max(1.0, round(pixels_per_point * 72 / 96 * 4) / 4)
+
+
+def cache_dir() -> str:
+	if sys.platform == "win32":
+		base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+	else:
+		base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+	return os.path.join(base, "dental_clinic", "icons")
+
+
+def _drawer_hash() -> str:
+	# Hash the file rather than the functions so the check needs no PIL import
+	spec = importlib.util.find_spec("ui.icon_drawers")
+	with open(spec.origin, "rb") as f:
+		return hashlib.sha1(f.read()).hexdigest()
+
+
+def atlas_key(icon_set: str, colors: Dict[str, str], sizes: Iterable[int], scale: float) -> str:
+	parts = [icon_set, repr(sorted(colors.items())), repr(list(colors)), repr(list(sizes)), repr(scale), _drawer_hash()]
+	return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:16]
+
+
+def _layout(sizes: Iterable[int], scale: float) -> Tuple[List[Tuple[int, int, int]], int, int]:
+	"""[(size, pixels, y)] per row, plus the atlas width and height."""
+	rows = []
+	y = 0
+	for size in sizes:
+		px = round(size * scale)
+		rows.append((size, px, y))
+		y += px
+	width = max((px for _size, px, _y in rows), default=0) * len(_DEF_COLORS)
+	return rows, width, y
+
+
+def render_atlas(path: str, colors: Dict[str, str], sizes: Iterable[int], scale: float) -> None:
+	from PIL import Image
+	from ui.icon_drawers import DRAWERS
+	rows, width, height = _layout(sizes, scale)
+	atlas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+	for _size, px, y in rows:
+		for col, name in enumerate(_DEF_COLORS):
+			atlas.paste(DRAWERS[name](px, colors.get(name, "#444")), (col * px, y))
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	tmp = f"{path}.{os.getpid()}.tmp"
+	atlas.save(tmp, "PNG")
+	os.replace(tmp, path)
+
+
+class IconAtlas:
+	"""Slices PhotoImages out of the cached atlas; each icon is copied from it at most once."""
+
+	def __init__(
+		self,
+		root: tk.Misc,
+		icon_set: str = ICON_SET,
+		colors: Optional[Dict[str, str]] = None,
+		sizes: Iterable[int] = SIZES,
+		scale: Optional[float] = None,
+		directory: Optional[str] = None,
+	) -> None:
+		self.root = root
+		self.colors = dict(_DEF_COLORS if colors is None else colors)
+		self.scale = dpi_scale(root) if scale is None else scale
+		self._rows = {size: (px, y) for size, px, y in _layout(sizes, self.scale)[0]}
+		key = atlas_key(icon_set, self.colors, list(self._rows), self.scale)
+		self.path = os.path.join(directory or cache_dir(), f"{icon_set}-{key}.png")
+		self._sheet: Optional[tk.PhotoImage] = None
+		self._icons: Dict[Tuple[str, int], tk.PhotoImage] = {}
+
+	def _load_sheet(self) -> tk.PhotoImage:
+		if self._sheet is None:
+			if not os.path.exists(self.path):
+				render_atlas(self.path, self.colors, list(self._rows), self.scale)
+			try:
+				self._sheet = tk.PhotoImage(master=self.root, file=self.path)
+			except tk.TclError:
+				# Damaged file (e.g. a crash mid-write on an older copy): draw it again
+				render_atlas(self.path, self.colors, list(self._rows), self.scale)
+				self._sheet = tk.PhotoImage(master=self.root, file=self.path)
+		return self._sheet
+
+	def icon(self, name: str, size: int) -> tk.PhotoImage:
+		cached = self._icons.get((name, size))
+		if cached is not None:
+			return cached
+		if size not in self._rows:
+			raise KeyError(f"size {size} is not in the atlas (have {sorted(self._rows)})")
+		px, y = self._rows[size]
+		x = list(_DEF_COLORS).index(name) * px
+		image = tk.PhotoImage(master=self.root, width=px, height=px)
+		image.tk.call(image, "copy", self._load_sheet(), "-from", x, y, x + px, y + px, "-to", 0, 0)
+		self._icons[(name, size)] = image
+		return image
+
+	def icons(self, size: int) -> Dict[str, tk.PhotoImage]:
+		return {name: self.icon(name, size) for name in _DEF_COLORS}
+
+
+def load_icons(root: tk.Misc, size: int = 18) -> Dict[str, tk.PhotoImage]:
+	try:
+		return IconAtlas(root).icons(size)
+	except (OSError, tk.TclError, KeyError):
+		# No writable cache directory, or a Tk without PNG support: draw in memory
+		from PIL import ImageTk
+		from ui.icon_drawers import DRAWERS
+		px = round(size * dpi_scale(root))
+		return {name: ImageTk.PhotoImage(DRAWERS[name](px, color), master=root) for name, color in _DEF_COLORS.items()}
@@ -1,7 +1,7 @@
 import os
 import tkinter as tk
 from tkinter import ttk, messagebox
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 
 try:
 	import ttkbootstrap as ttkb
@@ -13,12 +13,12 @@ from services.patient_service import PatientService
 from services.appointment_service import AppointmentService
 from services.treatment_service import TreatmentService
 from services.invoice_service import InvoiceService
+from services.summary_service import SummaryService
+from services.transfer_service import TransferService
 
 from ui.patients_view import PatientsView
-from ui.appointments_view import AppointmentsView
-from ui.treatments_view import TreatmentsView
-from ui.reports_view import ReportsView
 from ui.icon_loader import load_icons
+from ui.task_runner import TaskRunner
 
 
 class DentalClinicApp(tk.Tk):
@@ -40,8 +40,16 @@ class DentalClinicApp(tk.Tk):
 		self.appointment_service = AppointmentService(db)
 		self.treatment_service = TreatmentService(db)
 		self.invoice_service = InvoiceService(db)
+		self.summary_service = SummaryService(db)
+		self.tasks = TaskRunner(self)
+		self._first_paint_callbacks: List[Callable[[], None]] = []
 
 		self._build_ui()
+		self.tasks.on_busy(self._on_busy)
+
+	def destroy(self) -> None:
+		self.tasks.shutdown()
+		super().destroy()
 
 	def _build_ui(self) -> None:
 		# Top navigation
@@ -75,41 +83,106 @@ class DentalClinicApp(tk.Tk):
 			except Exception:
 				pass
 
+		# Busy indicator while any view waits on a background query
+		self.busy_bar = ttk.Progressbar(navbar, mode="indeterminate", length=80)
+
 		# Container for views
 		self.container = ttk.Frame(self)
 		self.container.pack(fill=tk.BOTH, expand=True)
 
-		self.views = {
-			"patients": PatientsView(self.container, self.patient_service, self.treatment_service, self.invoice_service, on_open_appointments=lambda pid: self._show_view("appointments", pid)),
-			"appointments": AppointmentsView(self.container, self.patient_service, self.appointment_service),
-			"treatments": TreatmentsView(self.container, self.patient_service, self.treatment_service, self.invoice_service),
-			"reports": ReportsView(self.container, self.patient_service, self.treatment_service),
+		# Views are built the first time they are shown
+		self.views: Dict[str, ttk.Frame] = {}
+		self._view_factories: Dict[str, Callable[[], ttk.Frame]] = {
+			"patients": self._make_patients_view,
+			"appointments": self._make_appointments_view,
+			"treatments": self._make_treatments_view,
+			"reports": self._make_reports_view,
 		}
-		for v in self.views.values():
-			v.place(relx=0, rely=0, relwidth=1, relheight=1)
+		self._show_view("patients")
+
+	def _make_patients_view(self) -> ttk.Frame:
+		return PatientsView(
+			self.container, self.patient_service, self.treatment_service, self.invoice_service, self.tasks,
+			on_open_appointments=lambda pid: self._show_view("appointments", pid),
+			make_transfer=lambda: TransferService(self.patient_service, self.appointment_service, self.treatment_service, self.invoice_service),
+		)
+
+	def _make_appointments_view(self) -> ttk.Frame:
+		from ui.appointments_view import AppointmentsView
+		return AppointmentsView(self.container, self.patient_service, self.appointment_service, self.tasks)
 
+	def _make_treatments_view(self) -> ttk.Frame:
+		from ui.treatments_view import TreatmentsView
+		return TreatmentsView(self.container, self.patient_service, self.treatment_service, self.invoice_service, self.tasks)
+
+	def _make_reports_view(self) -> ttk.Frame:
+		from ui.reports_view import ReportsView
+		view = ReportsView(self.container, self.patient_service, self.treatment_service, self.summary_service, self.tasks, on_restored=self._on_database_replaced)
 		# Provide icons to reports view for button images
 		try:
-			getattr(self.views["reports"], "set_icons")(self.icons)
+			view.set_icons(self.icons)
 		except Exception:
 			pass
+		return view
 
-		self._show_view("patients")
+	def _view(self, name: str, initial_load: Optional[Callable[[ttk.Frame], None]] = None) -> ttk.Frame:
+		view = self.views.get(name)
+		if view is None:
+			view = self.views[name] = self._view_factories[name]()
+			view.place(relx=0, rely=0, relwidth=1, relheight=1)
+			load = initial_load or (lambda v: v.refresh())
+
+			def on_first_expose(_event=None) -> None:
+				# Queue the load behind the redraw so the frame paints before any data work
+				view.unbind("<Expose>", binding)
+				self.after_idle(lambda: load(view))
+				self._first_paint()
+
+			binding = view.bind("<Expose>", on_first_expose, add="+")
+		return view
 
 	def _show_view(self, name: str, patient_id: Optional[int] = None) -> None:
-		for key, view in self.views.items():
-			if key == name:
-				view.lift()
-				if patient_id is not None and hasattr(view, "focus_patient"):
-					try:
-						view.focus_patient(patient_id)
-					except Exception:
-						pass
-			else:
-				view.lower()
+		focus = None
+		if patient_id is not None:
+			focus = lambda v: getattr(v, "focus_patient", lambda _pid: v.refresh())(patient_id)
+		is_new = name not in self.views
+		view = self._view(name, focus)
+		view.lift()
+		for key, other in self.views.items():
+			if key != name:
+				other.lower()
+		if focus is not None and not is_new:
+			try:
+				focus(view)
+			except Exception:
+				pass
+
+	def on_first_paint(self, callback: Callable[[], None]) -> None:
+		"""Run ``callback`` once, right after the first view has been drawn."""
+		self._first_paint_callbacks.append(callback)
+
+	def _first_paint(self) -> None:
+		callbacks, self._first_paint_callbacks = self._first_paint_callbacks, []
+		for callback in callbacks:
+			self.after_idle(callback)
 
 	def _on_quick_search(self) -> None:
 		text = self.quick_search_var.get().strip()
-		patients_view: PatientsView = self.views["patients"]  # type: ignore
+		patients_view: PatientsView = self._view("patients")  # type: ignore
 		patients_view.set_search(text)
-		self._show_view("patients")
\ No newline at end of file
+		self._show_view("patients")
+
+	def _on_database_replaced(self) -> None:
+		# Every listing is stale after a restore
+		for service in (self.patient_service, self.appointment_service, self.treatment_service):
+			service.notify_reload()
+
+	def _on_busy(self, busy: bool) -> None:
+		if busy:
+			self.busy_bar.pack(side=tk.RIGHT, padx=8)
+			self.busy_bar.start(15)
+			self.configure(cursor="watch")
+		else:
+			self.busy_bar.stop()
+			self.busy_bar.pack_forget()
+			self.configure(cursor="")
@@ -1,24 +1,40 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from typing import Callable, Optional
+from tkinter import ttk, filedialog, messagebox
+from typing import Any, Callable, Optional, Tuple
 
 from models import Patient
+from services.events import DELETED, RELOAD, ChangeEvent
+from services.pagination import Page
 from services.patient_service import PatientService
 from services.treatment_service import TreatmentService
 from services.invoice_service import InvoiceService
+from services.transfer_service import ImportResult
+from ui.task_runner import TaskRunner
+from ui.tree_sync import TreeSync
+
+PAGE_TASK = "patients.page"
+TRANSFER_FILETYPES = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("All", "*.*")]
+SHOWN_BAD_ROWS = 10
 
 
 class PatientsView(ttk.Frame):
-	def __init__(self, parent, patient_service: PatientService, treatment_service: TreatmentService, invoice_service: InvoiceService, on_open_appointments: Optional[Callable[[int], None]] = None) -> None:
+	def __init__(self, parent, patient_service: PatientService, treatment_service: TreatmentService, invoice_service: InvoiceService, tasks: TaskRunner, on_open_appointments: Optional[Callable[[int], None]] = None, make_transfer: Optional[Callable[[], Any]] = None) -> None:
 		super().__init__(parent)
 		self.patient_service = patient_service
 		self.treatment_service = treatment_service
 		self.invoice_service = invoice_service
+		self.tasks = tasks
 		self.on_open_appointments = on_open_appointments
+		# Returns a fresh TransferService; each import is its own id-mapping session
+		self.make_transfer = make_transfer
 
 		self.search_var = tk.StringVar()
+		self._next_token: Optional[str] = None
+		self._last_key: Optional[Tuple[str, int]] = None
+		self._estimated_total: Optional[int] = None
+		self._pending_focus: Optional[int] = None
 		self._build_ui()
-		self.refresh()
+		self.patient_service.subscribe(self.tasks.ui_listener(self._on_patient_changed))
 
 	def _build_ui(self) -> None:
 		top = ttk.Frame(self)
@@ -36,33 +52,127 @@ class PatientsView(ttk.Frame):
 		appt_btn = ttk.Button(top, text="Appointments", command=self._on_open_appointments)
 		for b in (add_btn, edit_btn, del_btn, appt_btn):
 			b.pack(side=tk.RIGHT, padx=4)
+		if self.make_transfer is not None:
+			self.import_btn = ttk.Button(top, text="Import...", command=self._on_import)
+			self.export_btn = ttk.Button(top, text="Export...", command=self._on_export)
+			for b in (self.import_btn, self.export_btn):
+				b.pack(side=tk.RIGHT, padx=4)
+
+		self.count_var = tk.StringVar()
+		ttk.Label(top, textvariable=self.count_var).pack(side=tk.LEFT, padx=8)
 
 		columns = ("id", "name", "age", "gender", "phone", "address")
-		self.tree = ttk.Treeview(self, columns=columns, show="headings")
+		body = ttk.Frame(self)
+		body.pack(fill=tk.BOTH, expand=True, padx=8, pady=(0, 8))
+		self.tree = ttk.Treeview(body, columns=columns, show="headings")
 		for col in columns:
 			self.tree.heading(col, text=col.title(), command=lambda c=col: self._sort_by(c))
 			self.tree.column(col, width=120 if col != "address" else 220, anchor=tk.W)
-		self.tree.pack(fill=tk.BOTH, expand=True, padx=8, pady=(0, 8))
+		scroll = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self.tree.yview)
+		self.tree.configure(yscrollcommand=lambda first, last: (scroll.set(first, last), self._on_tree_scrolled(last)))
+		scroll.pack(side=tk.RIGHT, fill=tk.Y)
+		self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
+		self._columns = columns
 		self._sort_dir = {c: True for c in columns}
+		# Same order as page_patients (name, id) so new rows land where paging would put them
+		self.rows = TreeSync(self.tree, sort_key=lambda v: v[1])
 
 	def _sort_by(self, column: str) -> None:
-		items = [(self.tree.set(k, column), k) for k in self.tree.get_children("")]
-		is_numeric = column in {"id", "age"}
-		try:
-			items.sort(key=lambda x: (float(x[0]) if x[0] != "" else -1) if is_numeric else x[0].lower(), reverse=self._sort_dir[column])
-		except Exception:
-			items.sort(key=lambda x: x[0], reverse=self._sort_dir[column])
-		for index, (_, k) in enumerate(items):
-			self.tree.move(k, "", index)
+		idx = self._columns.index(column)
+		if column in {"id", "age"}:
+			key = lambda v: float(v[idx]) if v[idx] != "" else -1.0
+		else:
+			key = lambda v: str(v[idx]).lower()
+		self.rows.resort(key, reverse=self._sort_dir[column])
 		self._sort_dir[column] = not self._sort_dir[column]
 
+	@staticmethod
+	def _row_values(p: Patient) -> Tuple:
+		return (p.id, p.name, p.age or "", p.gender or "", p.phone or "", p.address or "")
+
 	def refresh(self) -> None:
-		for i in self.tree.get_children(""):
-			self.tree.delete(i)
-		patients = self.patient_service.list_patients(self.search_var.get())
-		for p in patients:
-			self.tree.insert("", tk.END, values=(p.id, p.name, p.age or "", p.gender or "", p.phone or "", p.address or ""))
+		# Rows stay on screen until the first page of the new listing arrives
+		self.tasks.submit(
+			self.patient_service.page_patients, self.search_var.get(), None,
+			on_done=lambda page: self._show_page(page, first=True), key=PAGE_TASK,
+		)
+
+	def _load_page(self) -> None:
+		self.tasks.submit(
+			self.patient_service.page_patients, self.search_var.get(), self._next_token,
+			on_done=lambda page: self._show_page(page, first=False), key=PAGE_TASK,
+		)
+
+	def _show_page(self, page: Page[Patient], first: bool) -> None:
+		if first:
+			self.rows.clear()
+			self._last_key = None
+			self._estimated_total = None
+		for p in page.items:
+			self.rows.upsert(p.id, self._row_values(p))
+		if page.items:
+			self._last_key = (page.items[-1].name, page.items[-1].id)
+		self._next_token = page.next_token
+		if page.estimated_total is not None:
+			self._estimated_total = page.estimated_total
+		self._update_count()
+
+	def _update_count(self) -> None:
+		loaded = len(self.rows)
+		if self._next_token is None:
+			self.count_var.set(f"{loaded} patients")
+		elif self._estimated_total:
+			self.count_var.set(f"{loaded} of ~{self._estimated_total}")
+		else:
+			self.count_var.set(f"{loaded}+")
+
+	def _on_patient_changed(self, event: ChangeEvent) -> None:
+		if event.kind == RELOAD or self.tasks.pending(PAGE_TASK):
+			# A page still in flight may predate this write
+			self.refresh()
+			return
+		row_task = f"patients.row.{event.id}"
+		if event.kind == DELETED:
+			self.tasks.cancel(row_task)
+			self._apply_patient(event.id, None)
+			return
+		window_end = self._last_key if self._next_token is not None else None
+		self.tasks.submit(
+			self._visible_patient, event.id, self.search_var.get(), window_end,
+			on_done=lambda patient: self._apply_patient(event.id, patient), key=row_task,
+		)
+
+	def _visible_patient(self, patient_id: int, query_text: str, window_end: Optional[Tuple[str, int]]) -> Optional[Patient]:
+		"""The patient if it belongs in the current listing (worker thread)."""
+		patient = self.patient_service.get_patient(patient_id)
+		if patient is None:
+			return None
+		if query_text and not self.patient_service.matches(patient_id, query_text):
+			return None
+		if window_end is not None and (patient.name, patient.id) > window_end:
+			# Rows past the loaded window arrive with a later page
+			return None
+		return patient
+
+	def _apply_patient(self, patient_id: int, patient: Optional[Patient]) -> None:
+		if patient is not None:
+			self.rows.upsert(patient.id, self._row_values(patient))
+		else:
+			self.rows.remove(patient_id)
+		self._update_count()
+		if patient_id == self._pending_focus:
+			self._pending_focus = None
+			self.focus_patient(patient_id)
+
+	def _on_tree_scrolled(self, last: str) -> None:
+		# Fetch the next page once the user scrolls to the bottom of what is loaded
+		if self._next_token and float(last) >= 1.0:
+			self.after_idle(self._load_more)
+
+	def _load_more(self) -> None:
+		if self._next_token and not self.tasks.pending(PAGE_TASK):
+			self._load_page()
 
 	def _on_search(self) -> None:
 		self.refresh()
@@ -92,7 +202,6 @@ class PatientsView(ttk.Frame):
 		pid = int(values[0])
 		if messagebox.askyesno("Confirm", "Delete selected patient? This removes related appointments and treatments."):
 			self.patient_service.delete_patient(pid)
-			self.refresh()
 
 	def _open_form(self, patient: Optional[Patient] = None) -> None:
 		dlg = tk.Toplevel(self)
@@ -138,10 +247,8 @@ class PatientsView(ttk.Frame):
 				upd = Patient(id=patient.id, name=name, age=age, gender=gender, phone=phone, address=addr)
 				self.patient_service.update_patient(upd)
 			else:
-				pid = self.patient_service.create_patient(Patient(id=None, name=name, age=age, gender=gender, phone=phone, address=addr))
-				# Select new patient possibly
+				self._pending_focus = self.patient_service.create_patient(Patient(id=None, name=name, age=age, gender=gender, phone=phone, address=addr))
 			dlg.destroy()
-			self.refresh()
 
 	def _on_open_appointments(self) -> None:
 		item = self.tree.focus()
@@ -152,16 +259,48 @@ class PatientsView(ttk.Frame):
 		if self.on_open_appointments:
 			self.on_open_appointments(pid)
 
+	def _on_import(self) -> None:
+		path = filedialog.askopenfilename(filetypes=TRANSFER_FILETYPES)
+		if not path:
+			return
+		self.import_btn.state(["disabled"])
+		self.tasks.submit(
+			self.make_transfer().import_file, "patients", path,
+			on_done=self._imported,
+			on_error=lambda e: (self.import_btn.state(["!disabled"]), messagebox.showerror("Import", str(e))),
+		)
+
+	def _imported(self, result: ImportResult) -> None:
+		# The list reloads through the RELOAD event the import raised
+		self.import_btn.state(["!disabled"])
+		message = result.summary()
+		if result.bad_rows:
+			lines = [f"line {bad.line}: {bad.error}" for bad in result.bad_rows[:SHOWN_BAD_ROWS]]
+			if len(result.bad_rows) > SHOWN_BAD_ROWS:
+				lines.append(f"... {len(result.bad_rows) - SHOWN_BAD_ROWS} more")
+			messagebox.showwarning("Import", message + "\n\nSkipped rows:\n" + "\n".join(lines))
+		else:
+			messagebox.showinfo("Import", message)
+
+	def _on_export(self) -> None:
+		path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=TRANSFER_FILETYPES, initialfile="patients.csv")
+		if not path:
+			return
+		self.export_btn.state(["disabled"])
+		self.tasks.submit(
+			self.make_transfer().export_file, "patients", path,
+			on_done=lambda count: (self.export_btn.state(["!disabled"]), messagebox.showinfo("Export", f"{count} patients written to {path}")),
+			on_error=lambda e: (self.export_btn.state(["!disabled"]), messagebox.showerror("Export", str(e))),
+		)
+
 	def set_search(self, text: str) -> None:
 		self.search_var.set(text)
 		self.refresh()
 
 	def focus_patient(self, patient_id: int) -> None:
-		# Try to select patient in table
-		for iid in self.tree.get_children(""):
-			vals = self.tree.item(iid, "values")
-			if int(vals[0]) == patient_id:
-				self.tree.selection_set(iid)
-				self.tree.focus(iid)
-				self.tree.see(iid)
-				break
\ No newline at end of file
+		# Rows are keyed by patient id
+		if patient_id in self.rows:
+			iid = str(patient_id)
+			self.tree.selection_set(iid)
+			self.tree.focus(iid)
+			self.tree.see(iid)
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""The Reports charts, drawn off the Tk thread.
+
+One matplotlib Figure lives for the whole session. Each render updates its
+artists in place and rasterizes with Agg on a worker thread. The Tk side
+only loads the finished pixels (as PPM data) into a PhotoImage. Rendering is skipped when
+the data and the canvas size match what is already on screen.
+"""
+import threading
+from typing import Any, List, Optional, Tuple
+
+# (new patients per month, revenue per month, revenue trend per month; may be empty)
+ChartData = Tuple[List[Tuple[str, int]], List[Tuple[str, float]], List[Tuple[str, float]]]
+Size = Tuple[int, int]
+RenderKey = Tuple[ChartData, Size]
+Pixels = Tuple[int, int, bytes]  # width, height, binary PPM image
+
+PATIENTS_COLOR = "#4e79a7"
+REVENUE_COLOR = "#f28e2b"
+TREND_COLOR = "#9c755f"
+
+
+def _set_months(ax: Any, months: List[str]) -> None:
+	ax.set_xticks(range(len(months)))
+	ax.set_xticklabels(months, rotation=45)
+
+
+def _digits(rows: List[Tuple[str, float]]) -> int:
+	return len(str(int(max((abs(r[1]) for r in rows), default=0))))
+
+
+def _to_ppm(rgba: Any, width: int, height: int) -> bytes:
+	"""Binary PPM (P6) from an RGBA buffer; Tk photo images read it natively."""
+	rgba = memoryview(rgba).cast("B")
+	rgb = bytearray(width * height * 3)
+	# The figure background is opaque, so alpha can be dropped
+	for channel in range(3):
+		rgb[channel::3] = rgba[channel::4]
+	return b"P6 %d %d 255\n" % (width, height) + rgb
+
+
+class ReportChart:
+	def __init__(self, dpi: int = 100) -> None:
+		self.dpi = dpi
+		# Only one worker may touch the figure at a time
+		self._lock = threading.Lock()
+		self._figure: Any = None
+		self._bars: Any = None
+		self._layout: Any = None
+		# Set by the Tk thread once a render is actually on screen
+		self.shown: Optional[RenderKey] = None
+
+	def _build(self) -> None:
+		# Lazy import to avoid requiring matplotlib unless the reports are viewed
+		from matplotlib.figure import Figure
+		from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+		self._figure = Figure(dpi=self.dpi)
+		FigureCanvasAgg(self._figure)
+		self._patients_ax, self._revenue_ax = self._figure.subplots(1, 2)
+		self._patients_ax.set_title("Patients / Month")
+		self._revenue_ax.set_title("Revenue / Month")
+		(self._revenue_line,) = self._revenue_ax.plot([], [], marker="o", color=REVENUE_COLOR)
+		(self._trend_line,) = self._revenue_ax.plot([], [], linestyle="--", color=TREND_COLOR)
+
+	def _update(self, data: ChartData) -> None:
+		rows, rev, trend = data
+		ax = self._patients_ax
+		heights = [r[1] for r in rows]
+		if self._bars is not None and len(self._bars) == len(heights):
+			for rect, height in zip(self._bars, heights):
+				rect.set_height(height)
+		else:
+			# The number of months changed; bars cannot be added to a container
+			if self._bars is not None:
+				self._bars.remove()
+			self._bars = ax.bar(range(len(heights)), heights, color=PATIENTS_COLOR)
+		_set_months(ax, [r[0] for r in rows])
+		ax.relim()
+		ax.autoscale_view()
+
+		ax = self._revenue_ax
+		self._revenue_line.set_data(range(len(rev)), [r[1] for r in rev])
+		self._trend_line.set_data(range(len(trend)), [r[1] for r in trend])
+		_set_months(ax, [r[0] for r in rev])
+		ax.relim()
+		ax.autoscale_view()
+
+	def render(self, data: ChartData, size: Size) -> Optional[Tuple[RenderKey, Pixels]]:
+		"""(key, pixels) for ``data`` at ``size``, or None if that is already shown.
+
+		Runs on a worker thread.
+		"""
+		key = (data, size)
+		if key == self.shown:
+			return None
+		with self._lock:
+			if self._figure is None:
+				self._build()
+			width, height = size
+			self._figure.set_size_inches(width / self.dpi, height / self.dpi)
+			self._update(data)
+			# Margins depend on the size and tick labels: the months and the widest y value
+			layout = (size, [r[0] for r in data[0]], [r[0] for r in data[1]], [_digits(rows) for rows in data[:2]])
+			if layout != self._layout:
+				self._figure.tight_layout()
+				self._layout = layout
+			canvas = self._figure.canvas
+			canvas.draw()
+			# Converted under the lock: the buffer is reused by the next draw
+			width, height = canvas.get_width_height()
+			return key, (width, height, _to_ppm(canvas.buffer_rgba(), width, height))
+
+	@staticmethod
+	def blit(photo: Any, pixels: Pixels) -> None:
+		"""Load rendered pixels into a Tk PhotoImage of the same size (Tk thread)."""
+		photo.configure(data=pixels[2], format="ppm")
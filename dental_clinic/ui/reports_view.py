@@ -1,17 +1,42 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+from datetime import date as date_cls
+from typing import Callable, List, Optional, Tuple
 
+from services.analytics import AnalyticsService, AnalyticsSnapshot, rolling_average
 from services.patient_service import PatientService
 from services.treatment_service import TreatmentService
+from services.summary_service import SummaryService
 from services.backup_service import backup_database, restore_database
+from ui.report_chart import ChartData, Pixels, RenderKey, ReportChart, Size
+from ui.task_runner import TaskRunner
+
+LOAD_TASK = "reports.load"
+FILTER_TASK = "reports.filter"
+DEFAULT_SIZE = (500, 300)
+RESIZE_DELAY_MS = 150
+TREND_MONTHS = 3
+ALL_TYPES = "All types"
+
+Filters = Tuple[Optional[str], Optional[str], Optional[List[str]]]  # from, to, treatment types
+Report = Tuple[str, Optional[Tuple[RenderKey, Pixels]]]  # summary text, rendered chart
 
 
 class ReportsView(ttk.Frame):
-	def __init__(self, parent, patient_service: PatientService, treatment_service: TreatmentService) -> None:
+	def __init__(self, parent, patient_service: PatientService, treatment_service: TreatmentService, summary_service: SummaryService, tasks: TaskRunner, on_restored: Optional[Callable[[], None]] = None) -> None:
 		super().__init__(parent)
 		self.patient_service = patient_service
 		self.treatment_service = treatment_service
+		self.summary_service = summary_service
+		self.tasks = tasks
+		self.on_restored = on_restored
 		self._icons = None
+		self.analytics = AnalyticsService(patient_service.db)
+		self._snapshot: Optional[AnalyticsSnapshot] = None
+		self.chart = ReportChart()
+		self._photo: Optional[tk.PhotoImage] = None
+		self._size: Size = DEFAULT_SIZE
+		self._resize_job: Optional[str] = None
 		self._build_ui()
 
 	def set_icons(self, icons: dict) -> None:
@@ -26,64 +51,150 @@ class ReportsView(ttk.Frame):
 	def _build_ui(self) -> None:
 		top = ttk.Frame(self)
 		top.pack(fill=tk.X, padx=8, pady=8)
-		self.refresh_btn = ttk.Button(top, text="Refresh", command=self._render)
+		self.refresh_btn = ttk.Button(top, text="Refresh", command=self.refresh)
 		self.refresh_btn.pack(side=tk.RIGHT, padx=4)
 		self.backup_btn = ttk.Button(top, text="Backup DB", command=self._on_backup)
 		self.restore_btn = ttk.Button(top, text="Restore DB", command=self._on_restore)
 		self.backup_btn.pack(side=tk.RIGHT, padx=4)
 		self.restore_btn.pack(side=tk.RIGHT, padx=4)
+		self.progress = ttk.Progressbar(top, mode="determinate", length=160)
+		self.progress.pack(side=tk.RIGHT, padx=4)
+		self.status_var = tk.StringVar()
+		ttk.Label(top, textvariable=self.status_var).pack(side=tk.RIGHT, padx=4)
+
+		filters = ttk.Frame(self)
+		filters.pack(fill=tk.X, padx=8)
+		ttk.Label(filters, text="From").pack(side=tk.LEFT)
+		self.from_var = tk.StringVar()
+		self.from_entry = ttk.Entry(filters, textvariable=self.from_var, width=11)
+		self.from_entry.pack(side=tk.LEFT, padx=4)
+		ttk.Label(filters, text="To").pack(side=tk.LEFT)
+		self.to_var = tk.StringVar()
+		self.to_entry = ttk.Entry(filters, textvariable=self.to_var, width=11)
+		self.to_entry.pack(side=tk.LEFT, padx=4)
+		self.type_var = tk.StringVar(value=ALL_TYPES)
+		self.type_combo = ttk.Combobox(filters, textvariable=self.type_var, values=[ALL_TYPES], state="readonly", width=18)
+		self.type_combo.pack(side=tk.LEFT, padx=4)
+		self.type_combo.bind("<<ComboboxSelected>>", lambda _e: self._apply_filters())
+		self.apply_btn = ttk.Button(filters, text="Apply", command=self._apply_filters)
+		self.apply_btn.pack(side=tk.LEFT, padx=4)
+		for entry in (self.from_entry, self.to_entry):
+			entry.bind("<Return>", lambda _e: self._apply_filters())
+		self.summary_var = tk.StringVar()
+		ttk.Label(self, textvariable=self.summary_var, anchor=tk.W).pack(fill=tk.X, padx=8, pady=(4, 0))
 
 		self.canvas_container = ttk.Frame(self)
 		self.canvas_container.pack(fill=tk.BOTH, expand=True)
+		self.canvas = tk.Canvas(self.canvas_container, width=DEFAULT_SIZE[0], height=DEFAULT_SIZE[1], highlightthickness=0)
+		self.canvas.pack(fill=tk.BOTH, expand=True)
+		self._image_item = self.canvas.create_image(0, 0, anchor=tk.NW)
+		self.canvas.bind("<Configure>", self._on_resize)
+
+	def refresh(self) -> None:
+		"""Reload everything from the database; filter changes reuse the loaded snapshot."""
+		filters = self._filters()
+		if filters is None:
+			return
+		self.tasks.cancel(FILTER_TASK)
+		self.tasks.submit(self._load, filters, self._size, on_done=self._loaded, key=LOAD_TASK)
+
+	def _load(self, filters: Filters, size: Size) -> Tuple[AnalyticsSnapshot, Filters, Report]:
+		snapshot = self.analytics.load()
+		return snapshot, filters, self._report(snapshot, filters, size)
+
+	def _loaded(self, result: Tuple[AnalyticsSnapshot, Filters, Report]) -> None:
+		snapshot, filters, report = result
+		self._snapshot = snapshot
+		self.type_combo.configure(values=[ALL_TYPES, *snapshot.types])
+		self._show_report(report)
+		# The filters may have changed while loading
+		if self._filters() != filters:
+			self._apply_filters()
+
+	def _apply_filters(self) -> None:
+		filters = self._filters()
+		if filters is None or self._snapshot is None:
+			# A running load picks the filters up when it finishes
+			return
+		self.tasks.submit(self._report, self._snapshot, filters, self._size, on_done=self._show_report, key=FILTER_TASK)
+
+	def _filters(self) -> Optional[Filters]:
+		bounds = []
+		for var in (self.from_var, self.to_var):
+			text = var.get().strip()
+			try:
+				bounds.append(date_cls.fromisoformat(text).isoformat() if text else None)
+			except ValueError:
+				self.summary_var.set(f"Dates must be YYYY-MM-DD: {text}")
+				return None
+		kind = self.type_var.get()
+		return bounds[0], bounds[1], None if kind == ALL_TYPES else [kind]
+
+	def _report(self, snapshot: AnalyticsSnapshot, filters: Filters, size: Size) -> Report:
+		"""Summary text and chart for the filters (worker thread)."""
+		date_from, date_to, types = filters
+		revenue = snapshot.revenue_by_month(date_from, date_to, types)
+		trend = rolling_average([r[1] for r in revenue], TREND_MONTHS).tolist()
+		data: ChartData = (snapshot.new_patients_by_month(date_from, date_to), revenue, [(r[0], t) for r, t in zip(revenue, trend)])
+
+		parts = []
+		yoy = snapshot.year_over_year(date_from, date_to, types)
+		current = sum(r[1] for r in yoy)
+		prior = sum(r[2] for r in yoy)
+		change = f" ({(current - prior) / prior * 100:+.1f}% vs a year earlier)" if prior else ""
+		parts.append(f"Revenue {current:,.2f}{change}")
+		mix = snapshot.treatment_mix(date_from, date_to)
+		if mix:
+			total = sum(m[2] for m in mix) or 1
+			parts.append("Mix: " + ", ".join(f"{name} {amount / total:.0%}" for name, _n, amount in mix[:4]))
+		visits = snapshot.visits_per_doctor(date_from, date_to)
+		if visits:
+			parts.append("Visits: " + ", ".join(f"{doctor} {n}" for doctor, n in visits[:4]))
+		return "  ·  ".join(parts), self.chart.render(data, size)
 
-		self._render()
-
-	def _render(self) -> None:
-		for w in self.canvas_container.winfo_children():
-			w.destroy()
-		# Lazy import to avoid requiring matplotlib for headless tests unless viewing
-		import matplotlib
-		matplotlib.use("Agg")
-		from matplotlib.figure import Figure
-		from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-		# Patients per month - using created_at in patients
-		fig = Figure(figsize=(5, 3), dpi=100)
-		ax1 = fig.add_subplot(121)
-		ax2 = fig.add_subplot(122)
-
-		# Patients per month
-		rows = self.patient_service.db.query("SELECT substr(created_at,1,7) ym, COUNT(*) c FROM patients GROUP BY ym ORDER BY ym")
-		x1 = [r["ym"] for r in rows]
-		y1 = [r["c"] for r in rows]
-		ax1.bar(x1, y1, color="#4e79a7")
-		ax1.set_title("Patients / Month")
-		ax1.tick_params(axis='x', rotation=45)
-
-		# Revenue by month from treatments
-		rev = self.treatment_service.revenue_summary_by_month()
-		x2 = [r[0] for r in rev]
-		y2 = [r[1] for r in rev]
-		ax2.plot(x2, y2, marker='o', color="#f28e2b")
-		ax2.set_title("Revenue / Month")
-		ax2.tick_params(axis='x', rotation=45)
-
-		fig.tight_layout()
-
-		canvas = FigureCanvasTkAgg(fig, master=self.canvas_container)
-		canvas.draw()
-		widget = canvas.get_tk_widget()
-		widget.pack(fill=tk.BOTH, expand=True)
+	def _show_report(self, report: Report) -> None:
+		summary, chart = report
+		self.summary_var.set(summary)
+		self._show_chart(chart)
+
+	def _show_chart(self, result: Optional[Tuple[RenderKey, Pixels]]) -> None:
+		if result is None:
+			return
+		key, pixels = result
+		width, height = pixels[:2]
+		if self._photo is None or (self._photo.width(), self._photo.height()) != (width, height):
+			self._photo = tk.PhotoImage(master=self, width=width, height=height)
+			self.canvas.itemconfigure(self._image_item, image=self._photo)
+		self.chart.blit(self._photo, pixels)
+		self.chart.shown = key
+
+	def _on_resize(self, event: tk.Event) -> None:
+		size = (event.width, event.height)
+		if size == self._size or min(size) <= 1:
+			return
+		self._size = size
+		# Re-render once the user stops dragging
+		if self._resize_job is not None:
+			self.after_cancel(self._resize_job)
+		self._resize_job = self.after(RESIZE_DELAY_MS, self._resized)
+
+	def _resized(self) -> None:
+		self._resize_job = None
+		if self._snapshot is not None:
+			self._apply_filters()
+		elif not self.tasks.pending(LOAD_TASK):
+			self.refresh()
 
 	def _on_backup(self) -> None:
 		path = filedialog.asksaveasfilename(defaultextension=".db", filetypes=[("SQLite DB", "*.db")], initialfile="dental_clinic_backup.db")
 		if not path:
 			return
-		try:
-			backup_database(self.patient_service.db, path)
-			messagebox.showinfo("Backup", f"Database saved to {path}")
-		except Exception as e:
-			messagebox.showerror("Backup", str(e))
+		self._start_copy("Backing up")
+		self.tasks.submit(
+			backup_database, self.patient_service.db, path, self._progress_callback(),
+			on_done=lambda _: self._end_copy("Backup", f"Database saved to {path}"),
+			on_error=lambda e: self._end_copy("Backup", str(e), failed=True),
+		)
 
 	def _on_restore(self) -> None:
 		path = filedialog.askopenfilename(filetypes=[("SQLite DB", "*.db"), ("All", "*.*")])
@@ -91,8 +202,41 @@ class ReportsView(ttk.Frame):
 			return
 		if not messagebox.askyesno("Restore", "Restoring will overwrite current data. Continue?"):
 			return
-		try:
-			restore_database(self.patient_service.db, path)
-			messagebox.showinfo("Restore", "Database restored. Please restart the application.")
-		except Exception as e:
-			messagebox.showerror("Restore", str(e))
\ No newline at end of file
+		self._start_copy("Restoring")
+		self.tasks.submit(
+			restore_database, self.patient_service.db, path, self._progress_callback(),
+			on_done=lambda _: self._restored(),
+			on_error=lambda e: self._end_copy("Restore", str(e), failed=True),
+		)
+
+	def _restored(self) -> None:
+		self._end_copy("Restore", "Database restored.")
+		if self.on_restored:
+			self.on_restored()
+		self.refresh()
+
+	def _start_copy(self, label: str) -> None:
+		self.backup_btn.state(["disabled"])
+		self.restore_btn.state(["disabled"])
+		self.progress["value"] = 0
+		self.status_var.set(f"{label}...")
+
+	def _progress_callback(self) -> Callable[[int, int], None]:
+		# Called on the worker thread once per batch of pages
+		def report(done: int, total: int) -> None:
+			self.tasks.call_in_ui(self._show_progress, done, total)
+		return report
+
+	def _show_progress(self, done: int, total: int) -> None:
+		self.progress["maximum"] = max(total, 1)
+		self.progress["value"] = done
+
+	def _end_copy(self, title: str, message: str, failed: bool = False) -> None:
+		self.backup_btn.state(["!disabled"])
+		self.restore_btn.state(["!disabled"])
+		self.status_var.set("")
+		self.progress["value"] = 0
+		if failed:
+			messagebox.showerror(title, message)
+		else:
+			messagebox.showinfo(title, message)
\ No newline at end of file
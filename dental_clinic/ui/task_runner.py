@@ -0,0 +1,133 @@
+"""Runs service calls on worker threads and hands results back to the Tk thread.
+
+Tk widgets may only be touched from the thread that created them, so
+workers never call back directly: finished calls (and anything passed to
+call_in_ui) are queued and drained by an ``after()`` poll on the Tk thread.
+Each worker thread gets its own SQLite connection from ``Database``.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+import queue
+import sys
+import threading
+import tkinter as tk
+from tkinter import messagebox
+from typing import Any, Callable, Dict, List, Optional
+
+POLL_MS = 15  # while calls are in flight
+IDLE_POLL_MS = 100  # otherwise; still picks up events raised on other threads
+
+
+class Task:
+	"""Handle for a submitted call; cancel() drops its callbacks even if it already started."""
+
+	__slots__ = ("key", "future", "cancelled")
+
+	def __init__(self, key: Optional[str], future: Future) -> None:
+		self.key = key
+		self.future = future
+		self.cancelled = False
+
+	def cancel(self) -> None:
+		self.cancelled = True
+		self.future.cancel()
+
+
+class TaskRunner:
+	def __init__(self, root: tk.Misc, max_workers: int = 3) -> None:
+		self.root = root
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+		self._ui_thread = threading.get_ident()
+		self._inbox: "queue.SimpleQueue[Callable[[], None]]" = queue.SimpleQueue()
+		self._latest: Dict[str, Task] = {}
+		self._pending = 0
+		self._busy_listeners: List[Callable[[bool], None]] = []
+		self._closed = False
+		self.root.after(IDLE_POLL_MS, self._poll)
+
+	def submit(
+		self,
+		fn: Callable[..., Any],
+		*args: Any,
+		on_done: Optional[Callable[[Any], None]] = None,
+		on_error: Optional[Callable[[BaseException], None]] = None,
+		key: Optional[str] = None,
+	) -> Task:
+		"""Run ``fn(*args)`` on a worker; ``on_done``/``on_error`` run later on the Tk thread.
+
+		Submitting with a ``key`` cancels the previous call with the same key,
+		so only the most recent search or load for a view reaches the screen.
+		"""
+		if key is not None:
+			self.cancel(key)
+		task = Task(key, self._executor.submit(fn, *args))
+		if key is not None:
+			self._latest[key] = task
+		self._set_pending(self._pending + 1)
+		task.future.add_done_callback(lambda _f: self._inbox.put(lambda: self._finish(task, on_done, on_error)))
+		return task
+
+	def cancel(self, key: str) -> None:
+		task = self._latest.pop(key, None)
+		if task is not None:
+			task.cancel()
+
+	def pending(self, key: str) -> bool:
+		return key in self._latest
+
+	def call_in_ui(self, fn: Callable[..., Any], *args: Any) -> None:
+		"""Run ``fn`` on the Tk thread: now if already there, else at the next poll."""
+		if threading.get_ident() == self._ui_thread:
+			fn(*args)
+		else:
+			self._inbox.put(lambda: fn(*args))
+
+	def ui_listener(self, listener: Callable[[Any], None]) -> Callable[[Any], None]:
+		"""Wrap a service change listener so it always runs on the Tk thread."""
+		return lambda event: self.call_in_ui(listener, event)
+
+	def on_busy(self, callback: Callable[[bool], None]) -> None:
+		"""``callback(True)`` when the first call starts, ``callback(False)`` when the last ends."""
+		self._busy_listeners.append(callback)
+		if self._pending:
+			callback(True)
+
+	def shutdown(self) -> None:
+		self._closed = True
+		self._executor.shutdown(wait=False, cancel_futures=True)
+
+	def _finish(self, task: Task, on_done: Optional[Callable[[Any], None]], on_error: Optional[Callable[[BaseException], None]]) -> None:
+		self._set_pending(self._pending - 1)
+		if task.key is not None and self._latest.get(task.key) is task:
+			del self._latest[task.key]
+		if task.cancelled or task.future.cancelled():
+			return
+		error = task.future.exception()
+		if error is not None:
+			(on_error or self._show_error)(error)
+		elif on_done is not None:
+			on_done(task.future.result())
+
+	@staticmethod
+	def _show_error(error: BaseException) -> None:
+		messagebox.showerror("Error", str(error))
+
+	def _set_pending(self, count: int) -> None:
+		was_busy = self._pending > 0
+		self._pending = count
+		if was_busy != (count > 0):
+			for callback in list(self._busy_listeners):
+				callback(count > 0)
+
+	def _poll(self) -> None:
+		if self._closed:
+			return
+		while True:
+			try:
+				callback = self._inbox.get_nowait()
+			except queue.Empty:
+				break
+			try:
+				callback()
+			except Exception:
+				self.root.report_callback_exception(*sys.exc_info())
+		self.root.after(POLL_MS if self._pending else IDLE_POLL_MS, self._poll)
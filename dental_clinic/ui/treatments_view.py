@@ -1,30 +1,39 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from models import Treatment, Patient
+from services.events import DELETED, RELOAD, ChangeEvent
 from services.patient_service import PatientService
 from services.treatment_service import TreatmentService
 from services.invoice_service import InvoiceService
+from ui.task_runner import TaskRunner
+from ui.tree_sync import TreeSync
+
+LOAD_TASK = "treatments.load"
+PATIENTS_TASK = "treatments.patients"
 
 
 class TreatmentsView(ttk.Frame):
-	def __init__(self, parent, patient_service: PatientService, treatment_service: TreatmentService, invoice_service: InvoiceService) -> None:
+	def __init__(self, parent, patient_service: PatientService, treatment_service: TreatmentService, invoice_service: InvoiceService, tasks: TaskRunner) -> None:
 		super().__init__(parent)
 		self.patient_service = patient_service
 		self.treatment_service = treatment_service
 		self.invoice_service = invoice_service
+		self.tasks = tasks
+		self._patients: List[Patient] = []
 
 		self._build_ui()
+		self.treatment_service.subscribe(self.tasks.ui_listener(self._on_treatment_changed))
+		self.patient_service.subscribe(self.tasks.ui_listener(self._on_patient_changed))
+		self._patients_loaded = False
 
 	def _build_ui(self) -> None:
 		top = ttk.Frame(self)
 		top.pack(fill=tk.X, padx=8, pady=8)
 
 		self.patient_combo_var = tk.StringVar()
-		self._reload_patients()
 		self.patient_combo = ttk.Combobox(top, textvariable=self.patient_combo_var, state="readonly")
-		self.patient_combo["values"] = [p.name for p in self._patients]
 		self.patient_combo.pack(side=tk.LEFT, padx=(0, 8))
 		self.patient_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh())
 
@@ -41,21 +50,70 @@ class TreatmentsView(ttk.Frame):
 			self.tree.heading(c, text=c.title())
 			self.tree.column(c, width=130 if c != "description" else 300, anchor=tk.W)
 		self.tree.pack(fill=tk.BOTH, expand=True, padx=8, pady=(0, 8))
+		# Newest first, as list_treatments_for_patient returns them
+		self.rows = TreeSync(self.tree, sort_key=lambda v: v[1], reverse=True)
 
 	def _reload_patients(self) -> None:
-		self._patients = self.patient_service.list_patients()
-		if self._patients:
-			self.patient_combo_var.set(self._patients[0].name)
+		self.tasks.submit(self.patient_service.list_patients, on_done=self._show_patients, key=PATIENTS_TASK)
+
+	def _show_patients(self, patients: List[Patient]) -> None:
+		# Keep the current selection if that patient still exists, else fall back to the first
+		self._patients_loaded = True
+		selected = self._get_selected_patient()
+		self._patients = patients
+		self.patient_combo["values"] = [p.name for p in patients]
+		current = next((p for p in patients if selected and p.id == selected.id), None)
+		if current is None and patients:
+			current = patients[0]
+		self.patient_combo_var.set(current.name if current else "")
+		if current is None or selected is None or current.id != selected.id:
+			self.refresh()
 
 	def refresh(self) -> None:
-		for i in self.tree.get_children(""):
-			self.tree.delete(i)
+		if not self._patients_loaded:
+			# First load: the patient list comes first, then this patient's rows
+			self._reload_patients()
+			return
 		patient = self._get_selected_patient()
 		if not patient:
+			self.tasks.cancel(LOAD_TASK)
+			self.rows.clear()
 			return
-		treatments = self.treatment_service.list_treatments_for_patient(patient.id)
+		self.tasks.submit(self.treatment_service.list_treatments_for_patient, patient.id, on_done=self._show_treatments, key=LOAD_TASK)
+
+	def _show_treatments(self, treatments: List[Treatment]) -> None:
+		self.rows.clear()
 		for t in treatments:
-			self.tree.insert("", tk.END, values=(t.id, t.date, t.type, t.description or "", f"{t.cost:.2f}"))
+			self.rows.upsert(t.id, self._row_values(t))
+
+	@staticmethod
+	def _row_values(t: Treatment) -> Tuple:
+		return (t.id, t.date, t.type, t.description or "", f"{t.cost:.2f}")
+
+	def _on_treatment_changed(self, event: ChangeEvent) -> None:
+		if event.kind == RELOAD or self.tasks.pending(LOAD_TASK):
+			self.refresh()
+			return
+		row_task = f"treatments.row.{event.id}"
+		if event.kind == DELETED:
+			self.tasks.cancel(row_task)
+			self.rows.remove(event.id)
+			return
+		self.tasks.submit(
+			self.treatment_service.get_treatment, event.id,
+			on_done=lambda t: self._apply_treatment(event.id, t), key=row_task,
+		)
+
+	def _apply_treatment(self, treatment_id: int, t: Optional[Treatment]) -> None:
+		patient = self._get_selected_patient()
+		if t is None or patient is None or t.patient_id != patient.id:
+			self.rows.remove(treatment_id)
+		else:
+			self.rows.upsert(t.id, self._row_values(t))
+
+	def _on_patient_changed(self, event: ChangeEvent) -> None:
+		# Keep the patient picker current; rows reload only if the selection changes
+		self._reload_patients()
 
 	def _get_selected_patient(self) -> Optional[Patient]:
 		name = self.patient_combo_var.get()
@@ -92,7 +150,6 @@ class TreatmentsView(ttk.Frame):
 		v = self.tree.item(item, "values")
 		if messagebox.askyesno("Confirm", "Delete selected treatment?"):
 			self.treatment_service.delete_treatment(int(v[0]))
-			self.refresh()
 
 	def _open_form(self, patient: Patient, treatment: Optional[Treatment] = None) -> None:
 		dlg = tk.Toplevel(self)
@@ -143,7 +200,6 @@ class TreatmentsView(ttk.Frame):
 					new_t = Treatment(id=None, patient_id=patient.id, date=date, type=type_, description=desc, cost=cost)
 					self.treatment_service.add_treatment(new_t)
 				dlg.destroy()
-				self.refresh()
 			except Exception as e:
 				messagebox.showerror("Save Treatment", str(e))
 
@@ -166,6 +222,12 @@ class TreatmentsView(ttk.Frame):
 		if not path:
 			return
 		from datetime import date
-		invoice_id = self.invoice_service.create_invoice(patient.id, items, date.today().isoformat())
-		out = self.invoice_service.export_invoice_pdf(invoice_id, path, patient.name)
-		messagebox.showinfo("Invoice", f"Saved PDF: {out}")
\ No newline at end of file
+		self.tasks.submit(
+			self._create_invoice_pdf, patient, items, date.today().isoformat(), path,
+			on_done=lambda out: messagebox.showinfo("Invoice", f"Saved PDF: {out}"),
+			on_error=lambda e: messagebox.showerror("Invoice", str(e)),
+		)
+
+	def _create_invoice_pdf(self, patient: Patient, items: List[Tuple[str, float]], invoice_date: str, path: str) -> str:
+		invoice_id = self.invoice_service.create_invoice(patient.id, items, invoice_date)
+		return self.invoice_service.export_invoice_pdf(invoice_id, path, patient.name)
\ No newline at end of file
@@ -0,0 +1,78 @@
+from bisect import bisect_left
+from tkinter import ttk
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+SortKey = Callable[[Sequence[Any]], Any]
+
+
+class TreeSync:
+	"""Keeps a Treeview in step with database rows, using the row id as item iid.
+
+	Rows are inserted, updated, moved and removed one at a time at their
+	sorted position, so a single edit touches a single item instead of
+	clearing and re-filling the whole tree.
+	"""
+
+	def __init__(self, tree: ttk.Treeview, sort_key: SortKey, reverse: bool = False) -> None:
+		self.tree = tree
+		self.sort_key = sort_key
+		self.reverse = reverse
+		self._values: Dict[int, Tuple[Any, ...]] = {}
+		self._order: List[Tuple[Any, int]] = []  # ascending (key, id)
+
+	def __contains__(self, row_id: int) -> bool:
+		return row_id in self._values
+
+	def __len__(self) -> int:
+		return len(self._values)
+
+	def ids(self) -> Iterator[int]:
+		return iter(list(self._values))
+
+	def values(self, row_id: int) -> Tuple[Any, ...]:
+		return self._values[row_id]
+
+	def clear(self) -> None:
+		children = self.tree.get_children("")
+		if children:
+			self.tree.delete(*children)
+		self._values.clear()
+		self._order.clear()
+
+	def upsert(self, row_id: int, values: Sequence[Any]) -> None:
+		values = tuple(values)
+		iid = str(row_id)
+		exists = row_id in self._values
+		if exists:
+			if self._values[row_id] == values:
+				return
+			self._order.pop(self._position(row_id))
+		entry = (self.sort_key(values), row_id)
+		pos = bisect_left(self._order, entry)
+		self._order.insert(pos, entry)
+		self._values[row_id] = values
+		index = len(self._order) - 1 - pos if self.reverse else pos
+		if exists:
+			self.tree.item(iid, values=values)
+			self.tree.move(iid, "", index)
+		else:
+			self.tree.insert("", index, iid=iid, values=values)
+
+	def remove(self, row_id: int) -> None:
+		if row_id not in self._values:
+			return
+		self._order.pop(self._position(row_id))
+		del self._values[row_id]
+		self.tree.delete(str(row_id))
+
+	def resort(self, sort_key: SortKey, reverse: bool = False) -> None:
+		"""Switch ordering (e.g. a column header click) and move items to match."""
+		self.sort_key = sort_key
+		self.reverse = reverse
+		self._order = sorted((sort_key(v), row_id) for row_id, v in self._values.items())
+		ordered = reversed(self._order) if reverse else iter(self._order)
+		for index, (_, row_id) in enumerate(ordered):
+			self.tree.move(str(row_id), "", index)
+
+	def _position(self, row_id: int) -> int:
+		return bisect_left(self._order, (self.sort_key(self._values[row_id]), row_id))